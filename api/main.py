@@ -1,28 +1,59 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from typing import Optional
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import shap
 import base64
+import threading
 import os
 import io
-import joblib
-import pickle
 import json
 
-from src.preprocessing import (
-    imputer_valeurs_manquantes,
-    convertir_binaires_en_object,
-    reduire_types,
-    nettoyer_colonnes_categorielles_application,
-    nettoyer_colonnes_categorielles_bureau,
-    nettoyer_colonnes_categorielles_previous
+from src.modele import (
+    DOSSIER_MODELES,
+    SEUIL_DECISION,
+    ModeleServi,
+    charger_colonnes
 )
-from src.feature_engineering import fusionner_et_agreger_donnees
+from src.pipeline import (
+    pretraiter,
+    preparer_application,
+    construire_features,
+    construire_features_depuis_agregats,
+    SchemaFeatures,
+    APP_COLONNES_A_CONSERVER,
+    BUREAU_COLONNES_A_CONSERVER,
+    PREV_COLONNES_A_CONSERVER
+)
+from src.preprocessing import format_fichier, lire_table
+from src.preprocesseur import charger_preprocesseur
+from src.scoring_rapide import PlanScoring, extraire_enregistrements, filtrer_csv
+from src.batch_scoring import types_lecture
+from src.magasin_features import charger_magasin
+from src.cache_resultats import CacheLRU, empreinte_flux
+from src.explications import TOP_K, explication_locale, resume_global
+from src.explication_globale import charger_explication_globale, extraire
+from src.pool_calcul import PoolCalcul, PoolSature, THREADS_PAR_CALCUL
+from src.regroupement import Regroupeur
+from api.schemas import (
+    Demandeur,
+    LotDemandeurs,
+    APP_COLONNES_TEXTE,
+    BUREAU_COLONNES_TEXTE,
+    PREV_COLONNES_TEXTE
+)
+
+@asynccontextmanager
+async def cycle_de_vie(app):
+    # Le modèle est chargé en arrière-plan : l'API répond dès le démarrage et /ready
+    # indique quand le modèle est prêt (une requête de scoring arrivée avant l'attend)
+    threading.Thread(target=lambda: modele_servi.model, daemon=True).start()
+    yield
 
-app = FastAPI()
+
+app = FastAPI(lifespan=cycle_de_vie)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,181 +63,732 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Chargement initial des modèles
-base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "models"))
-with open(os.path.join(base_dir, "best_model_lightgbm.pkl"), "rb") as f:
-    model = pickle.load(f)
-colonnes_utiles = joblib.load(os.path.join(base_dir, "columns_used.pkl"))
-colonnes_types = joblib.load(os.path.join(base_dir, "columns_dtypes.pkl"))
-explainer = shap.TreeExplainer(model)
+# Chargement initial des artefacts légers ; le modèle et l'explicateur SHAP sont chargés
+# à la demande (booster natif models/best_model_lightgbm.txt si exporté, cf. src/modele.py) ;
+# appels LightGBM limités à THREADS_PAR_CALCUL threads OpenMP (cf. src/pool_calcul.py)
+base_dir = DOSSIER_MODELES
+modele_servi = ModeleServi(base_dir, threads_lightgbm=THREADS_PAR_CALCUL)
+colonnes_utiles, colonnes_types = modele_servi.mesurer("colonnes", lambda: charger_colonnes(base_dir))
+# Schéma compilé des features : alignement en une passe, colonnes inconnues / absentes comptées
+schema_features = SchemaFeatures(colonnes_utiles, colonnes_types)
+preprocesseur = modele_servi.mesurer("preprocesseur", lambda: charger_preprocesseur(base_dir))
+# Plan compilé pour scorer un seul client sans pandas (nécessite le préprocesseur ajusté)
+plan_scoring = modele_servi.mesurer(
+    "plan_scoring",
+    lambda: PlanScoring(colonnes_utiles, colonnes_types, preprocesseur) if preprocesseur is not None else None
+)
+# Agrégats bureau / previous_application précalculés (models/magasin_features.sqlite, optionnel)
+magasin_features = modele_servi.mesurer("magasin_features", lambda: charger_magasin(base_dir, preprocesseur))
+# Explication globale précalculée sur la population de référence (models/explication_globale.json,
+# cf. src/explication_globale.py), servie si elle correspond à la version du modèle
+explication_globale = modele_servi.mesurer("explication_globale", lambda: charger_explication_globale(base_dir))
 
-@app.post("/upload")
-async def upload_files(
-    application_test: UploadFile = File(...),
-    bureau: UploadFile = File(...),
-    previous_application: UploadFile = File(...),
-    sk_id_curr: int = Form(...)
-):
+# Cache des lots envoyés (cf. LotPrepare) : nombre de lots, durée de vie et taille totale
+TAILLE_CACHE_LOTS = 8
+TTL_CACHE_LOTS_S = 15 * 60
+OCTETS_CACHE_LOTS = 1024 ** 3
+
+# Travail CPU des requêtes exécuté hors de la boucle asyncio, dans un pool borné (cf. src/pool_calcul.py)
+pool_calcul = PoolCalcul()
+
+# Scorings d'un client et des demandeurs JSON scorés par lots avec ceux des requêtes arrivées
+# dans la même fenêtre (cf. src/regroupement.py) ; fenêtre et taille réglables par variables
+# d'environnement (ou options de api/serveur.py)
+FENETRE_REGROUPEMENT_S = float(os.environ.get("FENETRE_REGROUPEMENT_S", 0.002))
+TAILLE_MAX_REGROUPEMENT = int(os.environ.get("TAILLE_MAX_REGROUPEMENT", 256))
+regroupeur = Regroupeur(
+    lambda X: modele_servi.moteur.predict(X),
+    fenetre_s=FENETRE_REGROUPEMENT_S, taille_max=TAILLE_MAX_REGROUPEMENT
+)
+
+def preparer_donnees(contenu_app, contenu_bureau=None, contenu_prev=None):
+    """
+    Lit les trois fichiers envoyés (CSV, Parquet ou Arrow IPC, colonnes conservées
+    uniquement), applique le prétraitement (paramètres appris à
+    l'entraînement si models/preprocesseur.pkl existe) et le feature engineering,
+    puis aligne les colonnes sur celles du modèle.
+
+    Sans fichiers bureau / previous_application, les agrégats sont lus dans le magasin
+    de features.
+
+    Retourne le DataFrame application prétraité, les identifiants clients et la matrice X.
+    """
+    df_app = lire_table(io.BytesIO(contenu_app), APP_COLONNES_A_CONSERVER)
+    if contenu_bureau is None or contenu_prev is None:
+        return preparer_donnees_magasin(df_app)
+
+    df_bureau = lire_table(io.BytesIO(contenu_bureau), BUREAU_COLONNES_A_CONSERVER)
+    df_prev = lire_table(io.BytesIO(contenu_prev), PREV_COLONNES_A_CONSERVER)
+    return preparer_tables(df_app, df_bureau, df_prev)
+
+
+def modalites_one_hot():
+    """Vocabulaires one-hot du préprocesseur ajusté (None sans préprocesseur ou s'il est antérieur)."""
+    return preprocesseur.modalites if preprocesseur is not None else None
+
+
+def preparer_tables(df_app, df_bureau, df_prev, drop_first=True):
+    """Prétraitement, feature engineering et alignement de tables déjà lues."""
+    df_app, df_bureau, df_prev = pretraiter(df_app, df_bureau, df_prev, preprocesseur, categoriel=True)
+    df = construire_features(df_app, df_bureau, df_prev, drop_first=drop_first, modalites=modalites_one_hot())
+    ids_clients, X = schema_features.aligner(df)
+
+    return df_app, ids_clients, X
+
+
+def preparer_donnees_magasin(df_app, drop_first=True):
+    """Prépare application et lit les agrégats bureau / previous_application de ses clients dans le magasin."""
+    if magasin_features is None:
+        raise ValueError("Fichiers bureau et previous_application requis (aucun magasin de features disponible)")
+    df_app, _ = preparer_application(df_app, preprocesseur.parametres['application'], categoriel=True)
+    bureau_agg, previous_agg = magasin_features.lire(df_app['SK_ID_CURR'])
+    df = construire_features_depuis_agregats(
+        df_app, bureau_agg, previous_agg, drop_first=drop_first, modalites=modalites_one_hot()
+    )
+    ids_clients, X = schema_features.aligner(df)
+
+    return df_app, ids_clients, X
+
+
+def lire_fichiers(*fichiers):
+    """Contenu des fichiers envoyés (None pour un fichier absent), lu depuis le début."""
+    contenus = []
+    for fichier in fichiers:
+        if fichier is not None:
+            fichier.file.seek(0)
+        contenus.append(None if fichier is None else fichier.file.read())
+    return contenus
+
+
+def ids_demandes(sk_id_curr=None, filtrer=False, ids_clients=None):
+    """
+    Clients à garder dans les fichiers envoyés : `sk_id_curr` si `filtrer`, et la liste
+    `ids_clients` ("id1,id2,...", à laquelle `sk_id_curr` est ajouté). None : tous les clients.
+    """
+    ids = {int(i) for i in ids_clients.split(",") if i.strip()} if ids_clients else set()
+    if sk_id_curr is not None and (filtrer or ids):
+        ids.add(sk_id_curr)
+    return ids or None
+
+
+def preparer_donnees_filtrees(fichiers, ids):
+    """
+    Comme `preparer_donnees`, en ne lisant dans les fichiers envoyés que les lignes des clients
+    `ids` (filtrage au fil de la lecture pour un CSV, avant conversion en DataFrame pour
+    Parquet / Arrow ; colonnes conservées uniquement) : le travail dépend du nombre de
+    clients demandés et non de la taille des fichiers.
+
+    Les modalités sont encodées sans drop_first (comme le scoring par lots) pour que
+    l'encodage ne dépende pas des quelques clients gardés.
+
+    Sans préprocesseur ajusté, les statistiques de prétraitement dépendent du lot (un
+    identifiant unique serait pris pour une colonne binaire) : tous les clients sont
+    alors prétraités et seuls ceux demandés sont gardés.
+    """
+    if preprocesseur is None:
+        df_app, ids_clients, X = preparer_donnees(*lire_fichiers(*fichiers))
+        masque = ids_clients.isin(ids).to_numpy()
+        return df_app[df_app['SK_ID_CURR'].isin(ids)], ids_clients[masque], X[masque]
+
+    tables = []
+    for fichier, table, colonnes in zip(
+        fichiers,
+        ['application', 'bureau', 'previous'],
+        [APP_COLONNES_A_CONSERVER, BUREAU_COLONNES_A_CONSERVER, PREV_COLONNES_A_CONSERVER]
+    ):
+        if fichier is None:
+            tables.append(None)
+            continue
+        types = types_lecture(preprocesseur.parametres[table])
+        fichier.file.seek(0)
+        if format_fichier(fichier.file) == 'csv':
+            tables.append(filtrer_csv(fichier.file, ids, colonnes, types))
+        else:
+            tables.append(lire_table(fichier.file, colonnes, types, ids_clients=ids))
+
+    df_app, df_bureau, df_prev = tables
+    if df_bureau is None or df_prev is None:
+        return preparer_donnees_magasin(df_app, drop_first=False)
+    return preparer_tables(df_app, df_bureau, df_prev, drop_first=False)
+
+
+class LotPrepare:
+    """
+    Données préparées d'une requête multipart (application prétraitée, identifiants, matrice X)
+    et résultats calculés à la demande puis conservés : probabilités du lot, valeurs SHAP
+    (par client ou pour tout le lot), résumé global et graphiques.
+
+    Un même lot en cache peut servir plusieurs requêtes simultanées (threads du pool) : chaque
+    résultat est calculé une seule fois, sous le verrou du lot (réentrant, un résultat dérivé
+    pouvant demander les valeurs SHAP du lot).
+    """
+
+    def __init__(self, df_app, ids_clients, X):
+        self.df_app = df_app
+        self.ids_clients = ids_clients
+        self.X = X
+        self.verrou = threading.RLock()
+        self._resultats = None
+        self._shap_tous = None
+        self._shap_clients = {}
+        self.derives = {}
+
+    def taille_octets(self):
+        """Taille estimée : X, application et valeurs SHAP (une matrice de la taille de X)."""
+        return int(2 * self.X.memory_usage(index=False).sum() + self.df_app.memory_usage(deep=False).sum())
+
+    def resultats(self):
+        if self._resultats is None:
+            with self.verrou:
+                if self._resultats is None:
+                    self._resultats = predire(self.ids_clients, self.X)
+        return self._resultats
+
+    def scores_client(self, pos):
+        """Score du client : lu dans les résultats du lot s'ils existent, sinon vecteur à scorer par le regroupeur."""
+        if self._resultats is not None:
+            return self._resultats.iloc[[pos]].reset_index(drop=True)
+        return VecteursAScorer(self.ids_clients.iloc[[pos]].tolist(), self.X.iloc[[pos]].to_numpy(dtype=np.float64))
+
+    def proba_client(self, pos):
+        if self._resultats is not None:
+            return float(self._resultats["Score_proba"].iloc[pos])
+        return float(modele_servi.moteur.predict(self.X.iloc[[pos]])[0])
+
+    def shap_tous(self):
+        if self._shap_tous is None:
+            with self.verrou:
+                if self._shap_tous is None:
+                    shap_vals = modele_servi.explainer.shap_values(self.X)
+                    self._shap_tous = shap_vals[1] if isinstance(shap_vals, list) else shap_vals
+        return self._shap_tous
+
+    def shap_client(self, pos):
+        if self._shap_tous is not None:
+            return self._shap_tous[pos]
+        if pos not in self._shap_clients:
+            with self.verrou:
+                if pos not in self._shap_clients:
+                    shap_vals = modele_servi.explainer.shap_values(self.X.iloc[[pos]])
+                    self._shap_clients[pos] = shap_vals[1][0] if isinstance(shap_vals, list) else shap_vals[0]
+        return self._shap_clients[pos]
+
+    def memoriser(self, nom, calcul):
+        """Résultat dérivé (graphique PNG, résumé global) calculé une seule fois pour le lot."""
+        if nom not in self.derives:
+            with self.verrou:
+                if nom not in self.derives:
+                    self.derives[nom] = calcul()
+        return self.derives[nom]
+
+
+# Lots préparés récemment, par empreinte des fichiers envoyés, clients demandés et version du modèle
+cache_lots = CacheLRU(
+    max_entrees=TAILLE_CACHE_LOTS, ttl_s=TTL_CACHE_LOTS_S, max_octets=OCTETS_CACHE_LOTS,
+    taille=LotPrepare.taille_octets
+)
+
+
+def cle_lot(fichiers, ids=None):
+    """Clé du cache : empreinte du contenu des fichiers, des clients demandés et de la version du modèle."""
+    return empreinte_flux(
+        *[None if fichier is None else fichier.file for fichier in fichiers],
+        extra=(sorted(ids) if ids is not None else None, modele_servi.version)
+    )
+
+
+def lot_requete(fichiers, ids=None):
+    """
+    Lot d'une requête multipart (tous les clients envoyés, ou seulement `ids`), lu dans le
+    cache si les mêmes fichiers ont déjà été envoyés pour le même modèle.
+    """
+    cle = cle_lot(fichiers, ids)
+    lot = cache_lots.get(cle)
+    if lot is None:
+        if ids is None:
+            donnees = preparer_donnees(*lire_fichiers(*fichiers))
+        else:
+            donnees = preparer_donnees_filtrees(fichiers, ids)
+        lot = LotPrepare(*donnees)
+        cache_lots.put(cle, lot)
+    return lot
+
+
+def predire(ids_clients, X):
+    """Calcule les probabilités et les décisions pour chaque client de X (moteur d'inférence servi)."""
+    return tableau_scores(ids_clients, modele_servi.moteur.predict(X))
+
+
+def position_client(ids_clients, sk_id_curr):
+    """Retourne la position (ligne de X) du client demandé, ou lève une erreur s'il est absent."""
+    positions = np.flatnonzero(ids_clients.to_numpy() == sk_id_curr)
+    if len(positions) == 0:
+        raise ValueError(f"SK_ID_CURR {sk_id_curr} absent des données envoyées")
+    return int(positions[0])
+
+
+# pyplot garde une figure courante globale : un seul graphique tracé à la fois dans le pool
+verrou_graphiques = threading.Lock()
+
+
+def figure_en_base64(fig):
+    import matplotlib.pyplot as plt
+
+    buf = io.BytesIO()
+    plt.savefig(buf, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+
+def valeur_attendue():
+    explainer = modele_servi.explainer
+    return explainer.expected_value[1] if isinstance(explainer.expected_value, list) else explainer.expected_value
+
+
+def tracer_force_plot(shap_values_force, x_client):
     try:
-        df_app = pd.read_csv(io.BytesIO(await application_test.read()))
-        df_bureau = pd.read_csv(io.BytesIO(await bureau.read()))
-        df_prev = pd.read_csv(io.BytesIO(await previous_application.read()))
-
-        # === Prétraitement application_test ===
-        app_colonnes_a_conserver = [
-            'AMT_ANNUITY', 'AMT_CREDIT', 'AMT_GOODS_PRICE', 'AMT_INCOME_TOTAL',
-            'AMT_REQ_CREDIT_BUREAU_DAY', 'AMT_REQ_CREDIT_BUREAU_HOUR', 'AMT_REQ_CREDIT_BUREAU_MON',
-            'AMT_REQ_CREDIT_BUREAU_QRT', 'AMT_REQ_CREDIT_BUREAU_WEEK', 'AMT_REQ_CREDIT_BUREAU_YEAR',
-            'CNT_CHILDREN', 'CNT_FAM_MEMBERS', 'CODE_GENDER', 'DAYS_BIRTH', 'DAYS_EMPLOYED',
-            'DAYS_ID_PUBLISH', 'DAYS_LAST_PHONE_CHANGE', 'DAYS_REGISTRATION',
-            'DEF_30_CNT_SOCIAL_CIRCLE', 'DEF_60_CNT_SOCIAL_CIRCLE', 'EXT_SOURCE_2', 'EXT_SOURCE_3',
-            'FLAG_CONT_MOBILE', 'FLAG_DOCUMENT_10', 'FLAG_DOCUMENT_11', 'FLAG_DOCUMENT_12',
-            'FLAG_DOCUMENT_13', 'FLAG_DOCUMENT_14', 'FLAG_DOCUMENT_15', 'FLAG_DOCUMENT_16',
-            'FLAG_DOCUMENT_17', 'FLAG_DOCUMENT_18', 'FLAG_DOCUMENT_19', 'FLAG_DOCUMENT_2',
-            'FLAG_DOCUMENT_20', 'FLAG_DOCUMENT_21', 'FLAG_DOCUMENT_3', 'FLAG_DOCUMENT_4',
-            'FLAG_DOCUMENT_5', 'FLAG_DOCUMENT_6', 'FLAG_DOCUMENT_7', 'FLAG_DOCUMENT_8',
-            'FLAG_DOCUMENT_9', 'FLAG_EMAIL', 'FLAG_EMP_PHONE', 'FLAG_MOBIL', 'FLAG_OWN_CAR',
-            'FLAG_OWN_REALTY', 'FLAG_PHONE', 'FLAG_WORK_PHONE', 'HOUR_APPR_PROCESS_START',
-            'LIVE_CITY_NOT_WORK_CITY', 'LIVE_REGION_NOT_WORK_REGION', 'NAME_CONTRACT_TYPE',
-            'NAME_EDUCATION_TYPE', 'NAME_FAMILY_STATUS', 'NAME_HOUSING_TYPE', 'NAME_INCOME_TYPE',
-            'NAME_TYPE_SUITE', 'OBS_30_CNT_SOCIAL_CIRCLE', 'OBS_60_CNT_SOCIAL_CIRCLE',
-            'OCCUPATION_TYPE', 'ORGANIZATION_TYPE', 'REGION_POPULATION_RELATIVE',
-            'REGION_RATING_CLIENT', 'REGION_RATING_CLIENT_W_CITY', 'REG_CITY_NOT_LIVE_CITY',
-            'REG_CITY_NOT_WORK_CITY', 'REG_REGION_NOT_LIVE_REGION', 'REG_REGION_NOT_WORK_REGION',
-            'SK_ID_CURR', 'WEEKDAY_APPR_PROCESS_START'
-        ]
-        df_app = df_app[app_colonnes_a_conserver]
-        df_app, _ = imputer_valeurs_manquantes(df_app)
-
-        for col in ['CNT_FAM_MEMBERS', 'OBS_30_CNT_SOCIAL_CIRCLE', 'DEF_30_CNT_SOCIAL_CIRCLE',
-                    'OBS_60_CNT_SOCIAL_CIRCLE', 'DEF_60_CNT_SOCIAL_CIRCLE',
-                    'AMT_REQ_CREDIT_BUREAU_HOUR', 'AMT_REQ_CREDIT_BUREAU_DAY',
-                    'AMT_REQ_CREDIT_BUREAU_WEEK', 'AMT_REQ_CREDIT_BUREAU_MON',
-                    'AMT_REQ_CREDIT_BUREAU_QRT', 'AMT_REQ_CREDIT_BUREAU_YEAR']:
-            df_app[col] = df_app[col].astype(int)
-
-        df_app, _ = convertir_binaires_en_object(df_app)
-        df_app = nettoyer_colonnes_categorielles_application(df_app)
-        df_app, _ = reduire_types(df_app)
-
-        # === Prétraitement bureau ===
-        bureau_colonnes_a_conserver = [
-            'AMT_CREDIT_SUM', 'AMT_CREDIT_SUM_DEBT', 'AMT_CREDIT_SUM_LIMIT',
-            'AMT_CREDIT_SUM_OVERDUE', 'CNT_CREDIT_PROLONG', 'CREDIT_ACTIVE',
-            'CREDIT_CURRENCY', 'CREDIT_DAY_OVERDUE', 'CREDIT_TYPE', 'DAYS_CREDIT',
-            'DAYS_CREDIT_ENDDATE', 'DAYS_CREDIT_UPDATE', 'DAYS_ENDDATE_FACT',
-            'SK_ID_BUREAU', 'SK_ID_CURR'
-        ]
-        df_bureau = df_bureau[bureau_colonnes_a_conserver]
-        df_bureau, _ = imputer_valeurs_manquantes(df_bureau)
-        df_bureau[['DAYS_CREDIT_ENDDATE', 'DAYS_ENDDATE_FACT']] = df_bureau[
-            ['DAYS_CREDIT_ENDDATE', 'DAYS_ENDDATE_FACT']
-        ].astype('int32')
-        df_bureau = nettoyer_colonnes_categorielles_bureau(df_bureau)
-        df_bureau, _ = reduire_types(df_bureau)
-
-        # === Prétraitement previous_application ===
-        prev_colonnes_a_conserver = [
-            'AMT_ANNUITY','AMT_APPLICATION','AMT_CREDIT','AMT_GOODS_PRICE',
-            'CHANNEL_TYPE','CNT_PAYMENT','CODE_REJECT_REASON','DAYS_DECISION',
-            'DAYS_FIRST_DRAWING','DAYS_FIRST_DUE','DAYS_LAST_DUE','DAYS_LAST_DUE_1ST_VERSION',
-            'DAYS_TERMINATION','FLAG_LAST_APPL_PER_CONTRACT','HOUR_APPR_PROCESS_START',
-            'NAME_CASH_LOAN_PURPOSE','NAME_CLIENT_TYPE','NAME_CONTRACT_STATUS',
-            'NAME_CONTRACT_TYPE','NAME_GOODS_CATEGORY','NAME_PAYMENT_TYPE',
-            'NAME_PORTFOLIO','NAME_PRODUCT_TYPE','NAME_SELLER_INDUSTRY',
-            'NAME_YIELD_GROUP','NFLAG_INSURED_ON_APPROVAL','NFLAG_LAST_APPL_IN_DAY',
-            'PRODUCT_COMBINATION','SELLERPLACE_AREA','SK_ID_CURR','SK_ID_PREV',
-            'WEEKDAY_APPR_PROCESS_START'
-        ]
-        df_prev = df_prev[prev_colonnes_a_conserver]
-        df_prev, _ = imputer_valeurs_manquantes(df_prev)
-
-        for col in ['CNT_PAYMENT', 'DAYS_DECISION', 'SELLERPLACE_AREA',
-                    'NFLAG_LAST_APPL_IN_DAY', 'NFLAG_MICRO_CASH', 'NFLAG_INSURED_ON_APPROVAL']:
-            if col in df_prev.columns:
-                df_prev[col] = df_prev[col].fillna(0).astype(int)
-
-        df_prev, _ = convertir_binaires_en_object(df_prev)
-        df_prev = nettoyer_colonnes_categorielles_previous(df_prev)
-        df_prev, _ = reduire_types(df_prev)
-
-        # === Fusion & Feature engineering ===
-        df = fusionner_et_agreger_donnees(df_app, df_bureau, df_prev)
-        df.fillna(0, inplace=True)
-        df.columns = df.columns.str.strip().str.replace('[^A-Za-z0-9_]+', '_', regex=True)
-        df = pd.get_dummies(df, columns=df.select_dtypes(include='object').columns, drop_first=True)
-
-        ids_clients = df["SK_ID_CURR"]
-        X = df.drop(columns=["SK_ID_CURR"]).reindex(columns=colonnes_utiles, fill_value=0)
-        for col, dtype in colonnes_types.items():
-            if col in X.columns:
-                X[col] = X[col].astype(dtype)
-
-        probas = model.predict_proba(X)[:, 1]
-        seuil = 0.14
-        y_pred = (probas >= seuil).astype(int)
-
-        resultats = pd.DataFrame({
-            "SK_ID_CURR": ids_clients,
-            "Score_proba": probas,
-            "Decision": y_pred
-        })
-
-        shap_vals = explainer.shap_values(X)
-        idx = ids_clients[ids_clients == sk_id_curr].index[0]
-        shap_values_summary = shap_vals[1] if isinstance(shap_vals, list) else shap_vals
-
-        try:
-            fig_summary, ax = plt.subplots(figsize=(10, 6))
-            shap.summary_plot(shap_values_summary, X, show=False)
-            buf_summary = io.BytesIO()
-            plt.savefig(buf_summary, format="png", bbox_inches="tight")
-            plt.close(fig_summary)
-            summary_plot_b64 = base64.b64encode(buf_summary.getvalue()).decode("utf-8")
-        except Exception:
-            summary_plot_b64 = None
-
-        try:
-            shap_values_force = shap_vals[1][idx] if isinstance(shap_vals, list) else shap_vals[idx]
-            expected_value_force = explainer.expected_value[1] if isinstance(explainer.expected_value, list) else explainer.expected_value
+        import matplotlib.pyplot as plt
+        import shap
+
+        with verrou_graphiques:
             fig_force = plt.figure()
             shap.force_plot(
-                expected_value_force, shap_values_force, X.iloc[idx], matplotlib=True, show=False
+                valeur_attendue(), shap_values_force, x_client, matplotlib=True, show=False
             )
-            buf_force = io.BytesIO()
-            plt.savefig(buf_force, format="png", bbox_inches="tight")
-            plt.close(fig_force)
-            force_plot_b64 = base64.b64encode(buf_force.getvalue()).decode("utf-8")
-        except Exception:
-            force_plot_b64 = None
-
-        # === Infos contextuelles ===
-        infos_client = df_app[df_app['SK_ID_CURR'] == sk_id_curr].iloc[0]
-        infos_contextuelles = {
-            "Age_annees": round(float(-infos_client["DAYS_BIRTH"]) / 365, 1),
-            "AMT_INCOME_TOTAL": float(infos_client["AMT_INCOME_TOTAL"]),
-            "AMT_CREDIT": float(infos_client["AMT_CREDIT"]),
-            "NAME_FAMILY_STATUS": str(infos_client["NAME_FAMILY_STATUS"]),
-            "NAME_HOUSING_TYPE": str(infos_client["NAME_HOUSING_TYPE"]),
-            "OCCUPATION_TYPE": str(infos_client.get("OCCUPATION_TYPE", "Non renseigné"))
-        }
-
-        moyennes_clients = {
-            "Age_annees": round(float(-df_app["DAYS_BIRTH"].mean()) / 365, 1),
-            "AMT_INCOME_TOTAL": float(df_app["AMT_INCOME_TOTAL"].mean()),
-            "AMT_CREDIT": float(df_app["AMT_CREDIT"].mean())
-        }
-
-        return JSONResponse(content={
-            "predictions": resultats.to_dict(orient="records"),
-            "shap_summary_plot": summary_plot_b64,
-            "shap_force_plot": force_plot_b64,
-            "infos_contextuelles": infos_contextuelles,
-            "comparaison_moyenne": moyennes_clients
-        })
+            return figure_en_base64(fig_force)
+    except Exception:
+        return None
+
+
+FORMATS_GRAPHIQUES = ("json", "png")
+
+
+def explication_globale_servie():
+    """Explication globale précalculée, ou None si absente ou calculée pour une autre version du modèle."""
+    if explication_globale is None or explication_globale["version_modele"] != modele_servi.version:
+        return None
+    return explication_globale
+
+
+def verifier_format_graphiques(graphiques):
+    if graphiques not in FORMATS_GRAPHIQUES:
+        raise ValueError(f"graphiques doit valoir {' ou '.join(FORMATS_GRAPHIQUES)} (reçu : {graphiques})")
+
+
+def tracer_summary_plot(shap_values_summary, X):
+    try:
+        import matplotlib.pyplot as plt
+        import shap
+
+        with verrou_graphiques:
+            fig_summary, ax = plt.subplots(figsize=(10, 6))
+            shap.summary_plot(shap_values_summary, X, show=False)
+            return figure_en_base64(fig_summary)
+    except Exception:
+        return None
+
+
+def infos_client(df_app, sk_id_curr):
+    """Informations contextuelles du client et moyennes du lot envoyé."""
+    client = df_app[df_app['SK_ID_CURR'] == sk_id_curr].iloc[0]
+    infos_contextuelles = {
+        "Age_annees": round(float(-client["DAYS_BIRTH"]) / 365, 1),
+        "AMT_INCOME_TOTAL": float(client["AMT_INCOME_TOTAL"]),
+        "AMT_CREDIT": float(client["AMT_CREDIT"]),
+        "NAME_FAMILY_STATUS": str(client["NAME_FAMILY_STATUS"]),
+        "NAME_HOUSING_TYPE": str(client["NAME_HOUSING_TYPE"]),
+        "OCCUPATION_TYPE": str(client.get("OCCUPATION_TYPE", "Non renseigné"))
+    }
+
+    moyennes_clients = {
+        "Age_annees": round(float(-df_app["DAYS_BIRTH"].mean()) / 365, 1),
+        "AMT_INCOME_TOTAL": float(df_app["AMT_INCOME_TOTAL"].mean()),
+        "AMT_CREDIT": float(df_app["AMT_CREDIT"].mean())
+    }
+    return infos_contextuelles, moyennes_clients
+
+
+class VecteursAScorer:
+    """Vecteurs de features construits dans le pool de calcul, scorés ensuite par le regroupeur."""
+
+    def __init__(self, ids_clients, X):
+        self.ids_clients = ids_clients
+        self.X = X
+
+
+def scorer_client(contenu_app, contenu_bureau, contenu_prev, sk_id_curr):
+    """
+    Score un seul client. Avec le plan compilé, seules ses lignes sont lues dans les CSV
+    et transformées directement en vecteur numpy ; sinon (ou avec le magasin de features,
+    ou des fichiers Parquet / Arrow), pipeline pandas complet et ligne du client extraite
+    de X. Dans les deux cas, le vecteur est scoré par le regroupeur.
+    """
+    contenus = [contenu_app, contenu_bureau, contenu_prev]
+    if plan_scoring is None or any(
+        contenu is None or format_fichier(io.BytesIO(contenu)) != 'csv' for contenu in contenus
+    ):
+        _, ids_clients, X = preparer_donnees(contenu_app, contenu_bureau, contenu_prev)
+        pos = position_client(ids_clients, sk_id_curr)
+        return VecteursAScorer(ids_clients.iloc[[pos]].tolist(), X.iloc[[pos]].to_numpy(dtype=np.float64))
+
+    lignes_app = extraire_enregistrements(contenu_app, sk_id_curr)
+    if not lignes_app:
+        raise ValueError(f"SK_ID_CURR {sk_id_curr} absent des données envoyées")
+    x = plan_scoring.vecteur(
+        lignes_app[0],
+        extraire_enregistrements(contenu_bureau, sk_id_curr),
+        extraire_enregistrements(contenu_prev, sk_id_curr)
+    )
+    return VecteursAScorer([sk_id_curr], x.reshape(1, -1))
+
+
+def tableau_scores(ids_clients, probas):
+    """Probabilités et décisions des clients scorés."""
+    return pd.DataFrame({
+        "SK_ID_CURR": ids_clients,
+        "Score_proba": probas,
+        "Decision": (probas >= SEUIL_DECISION).astype(int)
+    })
+
+
+def contenu_predictions(resultats):
+    """Réponse `predictions` ; des vecteurs à scorer sont transmis tels quels au regroupeur."""
+    if isinstance(resultats, VecteursAScorer):
+        return resultats
+    return {"predictions": resultats.to_dict(orient="records")}
+
+
+def table_depuis_enregistrements(lignes, colonnes, colonnes_texte):
+    """DataFrame d'enregistrements JSON, avec les types qu'aurait donnés pd.read_csv."""
+    df = pd.DataFrame.from_records(lignes, columns=colonnes)
+    for col in colonnes:
+        if col not in colonnes_texte and df[col].dtype == object:
+            # Colonne numérique entièrement vide
+            df[col] = df[col].astype('float64')
+    return df
+
+
+def verifier_preprocesseur_json():
+    """
+    Les demandeurs JSON ne sont scorés qu'avec le préprocesseur ajusté : sans lui, les
+    statistiques de prétraitement seraient calculées sur les seuls demandeurs envoyés
+    (SK_ID_CURR et les colonnes numériques pris pour des colonnes binaires ou constantes).
+    """
+    if preprocesseur is None:
+        raise HTTPException(
+            status_code=503,
+            detail="préprocesseur ajusté requis (models/preprocesseur.pkl) pour scorer des demandeurs JSON"
+        )
+
 
+def scorer_demandeurs(demandeurs):
+    """
+    Score des demandeurs envoyés en JSON, avec les paramètres du préprocesseur ajusté.
+    Avec le plan compilé, chaque demandeur est transformé directement en vecteur ; sinon, ses
+    enregistrements passent dans le pipeline pandas comme des CSV. Les vecteurs sont scorés
+    par le regroupeur.
+    """
+    enregistrements = [demandeur.enregistrements() for demandeur in demandeurs]
+    if plan_scoring is not None:
+        X = np.vstack([plan_scoring.vecteur(app, bureau, prev) for app, bureau, prev in enregistrements])
+        return VecteursAScorer([app['SK_ID_CURR'] for app, _, _ in enregistrements], X)
+
+    df_app = table_depuis_enregistrements(
+        [app for app, _, _ in enregistrements], APP_COLONNES_A_CONSERVER, APP_COLONNES_TEXTE
+    )
+    df_bureau = table_depuis_enregistrements(
+        [ligne for _, bureau, _ in enregistrements for ligne in bureau], BUREAU_COLONNES_A_CONSERVER, BUREAU_COLONNES_TEXTE
+    )
+    df_prev = table_depuis_enregistrements(
+        [ligne for _, _, prev in enregistrements for ligne in prev], PREV_COLONNES_A_CONSERVER, PREV_COLONNES_TEXTE
+    )
+    _, ids_clients, X = preparer_tables(df_app, df_bureau, df_prev)
+    return VecteursAScorer(ids_clients.tolist(), X.to_numpy(dtype=np.float64))
+
+
+async def executer_requete(calcul, *args):
+    """
+    Exécute le travail d'une requête dans le pool de calcul et renvoie sa réponse JSON :
+    503 (avec Retry-After) si le pool est saturé, 400 si le calcul échoue. Des vecteurs
+    renvoyés par le calcul sont scorés par le regroupeur, avec ceux des requêtes voisines.
+    """
+    try:
+        contenu = await pool_calcul.executer(calcul, *args)
+        if isinstance(contenu, VecteursAScorer):
+            probas = await regroupeur.scorer(contenu.X)
+            contenu = {"predictions": tableau_scores(contenu.ids_clients, probas).to_dict(orient="records")}
+    except PoolSature as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content=contenu)
+
+
+def reponse_score(fichiers, sk_id_curr, ids_clients):
+    ids = ids_demandes(sk_id_curr, ids_clients=ids_clients)
+    if ids is not None or sk_id_curr is None:
+        lot = lot_requete(fichiers, ids)
+        return {"predictions": lot.resultats().to_dict(orient="records")}
+
+    # Un seul client : lot déjà en cache, sinon chemin rapide sans mise en cache
+    lot = cache_lots.get(cle_lot(fichiers))
+    if lot is not None:
+        resultats = lot.scores_client(position_client(lot.ids_clients, sk_id_curr))
+    else:
+        resultats = scorer_client(*lire_fichiers(*fichiers), sk_id_curr)
+    return contenu_predictions(resultats)
+
+
+@app.post("/score")
+async def score(
+    application_test: UploadFile = File(...),
+    bureau: Optional[UploadFile] = File(None),
+    previous_application: Optional[UploadFile] = File(None),
+    sk_id_curr: Optional[int] = Form(None),
+    ids_clients: Optional[str] = Form(None)
+):
+    """
+    Scoring seul : probabilités et décisions, sans calcul SHAP ni graphique.
+    Si `sk_id_curr` est fourni, seul ce client est scoré (chemin rapide).
+    Avec `ids_clients` ("id1,id2,..."), seules les lignes de ces clients sont lues et scorées
+    (sans préprocesseur ajusté, tous les clients sont prétraités puis filtrés).
+    Sans bureau / previous_application, les agrégats sont lus dans le magasin de features.
+    Les fichiers déjà envoyés (même contenu) sont servis depuis le cache des lots.
+    """
+    return await executer_requete(
+        reponse_score, (application_test, bureau, previous_application), sk_id_curr, ids_clients
+    )
+
+
+def reponse_demandeurs(demandeurs):
+    return contenu_predictions(scorer_demandeurs(demandeurs))
+
+
+@app.post("/score/json")
+async def score_json(demandeur: Demandeur):
+    """
+    Scoring d'un demandeur envoyé en JSON (sa ligne application et ses historiques),
+    sans envoi ni lecture de fichiers CSV. Nécessite le préprocesseur ajusté (503 sinon).
+    """
+    verifier_preprocesseur_json()
+    return await executer_requete(reponse_demandeurs, [demandeur])
+
+
+@app.post("/score/json/lot")
+async def score_json_lot(lot: LotDemandeurs):
+    """Scoring de plusieurs demandeurs envoyés en JSON dans une seule requête (préprocesseur ajusté requis)."""
+    verifier_preprocesseur_json()
+    return await executer_requete(reponse_demandeurs, lot.demandeurs)
+
+
+def reponse_explain(fichiers, sk_id_curr, filtrer, graphiques, top_k):
+    verifier_format_graphiques(graphiques)
+    lot = lot_requete(fichiers, ids_demandes(sk_id_curr, filtrer))
+    pos = position_client(lot.ids_clients, sk_id_curr)
+    X = lot.X
+
+    proba = lot.proba_client(pos)
+    shap_values_force = lot.shap_client(pos)
+
+    infos_contextuelles, moyennes_clients = infos_client(lot.df_app, sk_id_curr)
+
+    return {
+        "prediction": {
+            "SK_ID_CURR": sk_id_curr,
+            "Score_proba": proba,
+            "Decision": int(proba >= SEUIL_DECISION)
+        },
+        "shap_values": dict(zip(X.columns, map(float, shap_values_force))),
+        "expected_value": float(valeur_attendue()),
+        "explication": explication_locale(
+            shap_values_force, X.iloc[pos], X.columns, valeur_attendue(), top_k
+        ),
+        "shap_force_plot": lot.memoriser(
+            ("force", pos), lambda: tracer_force_plot(shap_values_force, X.iloc[pos])
+        ) if graphiques == "png" else None,
+        "infos_contextuelles": infos_contextuelles,
+        "comparaison_moyenne": moyennes_clients
+    }
+
+
+@app.post("/explain")
+async def explain(
+    application_test: UploadFile = File(...),
+    bureau: Optional[UploadFile] = File(None),
+    previous_application: Optional[UploadFile] = File(None),
+    sk_id_curr: int = Form(...),
+    filtrer: bool = Form(False),
+    graphiques: str = Form("json"),
+    top_k: int = Form(TOP_K)
+):
+    """
+    Explication locale : valeurs SHAP calculées uniquement pour le client demandé.
+    Avec `filtrer`, seules ses lignes sont lues dans les fichiers (la comparaison aux
+    moyennes porte alors sur ce seul client).
+    Sans bureau / previous_application, les agrégats sont lus dans le magasin de features.
+
+    `explication` : valeur de base, `top_k` plus fortes contributions et valeurs des features,
+    tracées par le dashboard ; le force plot PNG n'est rendu qu'avec `graphiques="png"`.
+    """
+    return await executer_requete(
+        reponse_explain, (application_test, bureau, previous_application), sk_id_curr, filtrer, graphiques, top_k
+    )
+
+
+def reponse_upload(fichiers, sk_id_curr, filtrer, ids_clients, graphiques, top_k):
+    verifier_format_graphiques(graphiques)
+    ids = ids_demandes(sk_id_curr, filtrer, ids_clients)
+    lot = lot_requete(fichiers, ids)
+    resultats = lot.resultats()
+    X = lot.X
+
+    idx = position_client(lot.ids_clients, sk_id_curr)
+    shap_values_force = lot.shap_client(idx)
+
+    # Résumé global : précalculé hors ligne sur la population de référence ; calculé
+    # sur le lot envoyé seulement en son absence ou pour le summary plot PNG
+    reference = explication_globale_servie()
+    if reference is not None:
+        resume = {**extraire(reference, top_k, distributions=False), "source": "reference"}
+    else:
+        resume = lot.memoriser(
+            ("resume", top_k), lambda: {**resume_global(lot.shap_tous(), X, top_k), "source": "lot"}
+        )
+
+    summary_plot_b64 = force_plot_b64 = None
+    if graphiques == "png":
+        summary_plot_b64 = lot.memoriser("summary", lambda: tracer_summary_plot(lot.shap_tous(), X))
+        force_plot_b64 = lot.memoriser(("force", idx), lambda: tracer_force_plot(shap_values_force, X.iloc[idx]))
+
+    # === Infos contextuelles ===
+    infos_contextuelles, moyennes_clients = infos_client(lot.df_app, sk_id_curr)
+
+    return {
+        "predictions": resultats.to_dict(orient="records"),
+        "explication": explication_locale(
+            shap_values_force, X.iloc[idx], X.columns, valeur_attendue(), top_k
+        ),
+        "resume_global": resume,
+        "shap_summary_plot": summary_plot_b64,
+        "shap_force_plot": force_plot_b64,
+        "infos_contextuelles": infos_contextuelles,
+        "comparaison_moyenne": moyennes_clients
+    }
+
+
+@app.post("/upload")
+async def upload_files(
+    application_test: UploadFile = File(...),
+    bureau: UploadFile = File(...),
+    previous_application: UploadFile = File(...),
+    sk_id_curr: int = Form(...),
+    filtrer: bool = Form(False),
+    ids_clients: Optional[str] = Form(None),
+    graphiques: str = Form("json"),
+    top_k: int = Form(TOP_K)
+):
+    """
+    Réponse complète : prédictions, explications SHAP et informations du client.
+    Avec `filtrer` (seulement `sk_id_curr`) ou `ids_clients` ("id1,id2,..."), seules les
+    lignes de ces clients sont lues, scorées et comparées (sans préprocesseur ajusté, tous
+    les clients sont prétraités puis filtrés).
+
+    Explications en JSON (`explication` du client et `resume_global`, `top_k` features),
+    tracées par le dashboard. Le résumé global est celui précalculé sur la population de
+    référence (cf. `/global-explanation`) ; à défaut, il est calculé sur le lot. Avec
+    `graphiques="png"`, summary plot et force plot sont aussi rendus en PNG (base64) comme
+    auparavant.
+    """
+    return await executer_requete(
+        reponse_upload, (application_test, bureau, previous_application),
+        sk_id_curr, filtrer, ids_clients, graphiques, top_k
+    )
+
+
+@app.get("/ready")
+def ready():
+    """
+    Disponibilité : 200 quand le modèle est chargé, 503 sinon. Indique les durées de
+    chargement de chaque artefact (l'explicateur SHAP une fois utilisé) et le délai
+    entre l'import de l'API et la fin du chargement du modèle.
+    """
+    contenu = modele_servi.metriques()
+    return JSONResponse(status_code=200 if modele_servi.pret else 503, content=contenu)
+
+
+@app.get("/global-explanation")
+def global_explanation(top_k: Optional[int] = None, distributions: bool = True):
+    """
+    Explication globale du modèle précalculée hors ligne sur la population de référence
+    (`python -m src.explication_globale`) : importance moyenne, sens de l'effet, quantiles
+    et histogramme des contributions SHAP de chaque feature (`top_k` premières, toutes par
+    défaut). 404 si elle n'a pas été calculée pour la version du modèle servie.
+    """
+    reference = explication_globale_servie()
+    if reference is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Explication globale absente pour cette version du modèle : lancer python -m src.explication_globale"
+        )
+    return extraire(reference, top_k, distributions)
+
+
+def memoire_processus():
+    """Mémoire du processus en Mo (Linux) : résidente, proportionnelle (PSS) et propre (USS)."""
+    valeurs = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for ligne in f:
+            champ, _, reste = ligne.partition(":")
+            if champ in ("Rss", "Pss", "Private_Clean", "Private_Dirty", "Shared_Clean", "Shared_Dirty"):
+                valeurs[champ] = int(reste.split()[0]) / 1024
+    return {
+        "pid": os.getpid(),
+        "rss_mo": round(valeurs["Rss"], 1),
+        "pss_mo": round(valeurs["Pss"], 1),
+        "uss_mo": round(valeurs["Private_Clean"] + valeurs["Private_Dirty"], 1),
+        "partagee_mo": round(valeurs["Shared_Clean"] + valeurs["Shared_Dirty"], 1)
+    }
+
+
+@app.get("/schema")
+def metriques_schema():
+    """
+    Écarts entre les features construites et celles du modèle, cumulés depuis le démarrage :
+    colonnes inconnues (ignorées), variables et modalités absentes (remplies avec 0).
+    """
+    return schema_features.metriques()
+
+
+@app.get("/memory")
+def memoire():
+    """
+    Empreinte mémoire du worker qui répond : avec `python -m api.serveur`, la mémoire
+    partagée avec les autres workers (modèle, bibliothèques) compte dans `partagee_mo`,
+    et `uss_mo` est le coût propre d'un worker supplémentaire.
+    """
+    return memoire_processus()
+
+
+@app.get("/cache")
+def metriques_cache():
+    """Métriques du cache des lots envoyés (hits, misses, évictions, expirations, taille)."""
+    return cache_lots.metriques()
+
+
+@app.get("/micro-batching")
+def metriques_regroupement():
+    """
+    Métriques du regroupement des scorings : lots, demandes par lot, latence ajoutée par
+    la fenêtre de regroupement et durée de scoring d'un lot.
+    """
+    return regroupeur.metriques()
+
+
+@app.get("/pool")
+def metriques_pool():
+    """Charge du pool de calcul : calculs en cours et en attente, rejets, temps d'attente et de calcul moyens."""
+    return pool_calcul.metriques()
+
 
 @app.get("/")
 def home():
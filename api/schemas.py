@@ -0,0 +1,81 @@
+"""
+Schémas Pydantic des enregistrements envoyés en JSON à l'API (/score/json).
+
+Chaque enregistrement reprend les colonnes conservées par le pipeline
+(`*_COLONNES_A_CONSERVER`) : texte pour les variables catégorielles, nombre entier ou
+décimal pour les autres (un entier reste un entier, comme dans un CSV lu par pandas).
+Toutes les colonnes sont facultatives (valeur manquante, imputée comme dans un CSV),
+sauf SK_ID_CURR pour la ligne application ; les colonnes inconnues sont ignorées.
+"""
+
+from typing import List, Optional, Union
+from pydantic import BaseModel, ConfigDict, Field, StrictFloat, StrictInt, create_model
+
+from src.pipeline import APP_COLONNES_A_CONSERVER, BUREAU_COLONNES_A_CONSERVER, PREV_COLONNES_A_CONSERVER
+
+Nombre = Optional[Union[StrictInt, StrictFloat]]
+
+APP_COLONNES_TEXTE = [
+    'CODE_GENDER', 'FLAG_OWN_CAR', 'FLAG_OWN_REALTY', 'NAME_CONTRACT_TYPE',
+    'NAME_EDUCATION_TYPE', 'NAME_FAMILY_STATUS', 'NAME_HOUSING_TYPE', 'NAME_INCOME_TYPE',
+    'NAME_TYPE_SUITE', 'OCCUPATION_TYPE', 'ORGANIZATION_TYPE', 'WEEKDAY_APPR_PROCESS_START'
+]
+
+BUREAU_COLONNES_TEXTE = ['CREDIT_ACTIVE', 'CREDIT_CURRENCY', 'CREDIT_TYPE']
+
+PREV_COLONNES_TEXTE = [
+    'CHANNEL_TYPE', 'CODE_REJECT_REASON', 'FLAG_LAST_APPL_PER_CONTRACT', 'NAME_CASH_LOAN_PURPOSE',
+    'NAME_CLIENT_TYPE', 'NAME_CONTRACT_STATUS', 'NAME_CONTRACT_TYPE', 'NAME_GOODS_CATEGORY',
+    'NAME_PAYMENT_TYPE', 'NAME_PORTFOLIO', 'NAME_PRODUCT_TYPE', 'NAME_SELLER_INDUSTRY',
+    'NAME_YIELD_GROUP', 'PRODUCT_COMBINATION', 'WEEKDAY_APPR_PROCESS_START'
+]
+
+
+def modele_enregistrement(nom, colonnes, colonnes_texte, id_obligatoire):
+    """Modèle Pydantic d'une ligne de table : un champ par colonne conservée."""
+    champs = {}
+    for col in colonnes:
+        if col == 'SK_ID_CURR':
+            champs[col] = (StrictInt, ...) if id_obligatoire else (Optional[StrictInt], None)
+        else:
+            champs[col] = (Optional[str] if col in colonnes_texte else Nombre, None)
+    return create_model(nom, __config__=ConfigDict(extra='ignore'), **champs)
+
+
+EnregistrementApplication = modele_enregistrement(
+    'EnregistrementApplication', APP_COLONNES_A_CONSERVER, APP_COLONNES_TEXTE, id_obligatoire=True
+)
+# SK_ID_CURR des lignes bureau / previous_application : celui du demandeur s'il est absent
+EnregistrementBureau = modele_enregistrement(
+    'EnregistrementBureau', BUREAU_COLONNES_A_CONSERVER, BUREAU_COLONNES_TEXTE, id_obligatoire=False
+)
+EnregistrementPrevious = modele_enregistrement(
+    'EnregistrementPrevious', PREV_COLONNES_A_CONSERVER, PREV_COLONNES_TEXTE, id_obligatoire=False
+)
+
+
+class Demandeur(BaseModel):
+    """Un demandeur : sa ligne application et ses historiques bureau / previous_application."""
+    application: EnregistrementApplication
+    bureau: List[EnregistrementBureau] = Field(default_factory=list)
+    previous_application: List[EnregistrementPrevious] = Field(default_factory=list)
+
+    def enregistrements(self):
+        """Dictionnaires colonne → valeur (application, lignes bureau, lignes previous_application)."""
+        sk_id_curr = self.application.SK_ID_CURR
+        historiques = []
+        for lignes in (self.bureau, self.previous_application):
+            dicts = [ligne.model_dump() for ligne in lignes]
+            for ligne in dicts:
+                if ligne['SK_ID_CURR'] is None:
+                    ligne['SK_ID_CURR'] = sk_id_curr
+                elif ligne['SK_ID_CURR'] != sk_id_curr:
+                    raise ValueError(
+                        f"Ligne d'historique du client {ligne['SK_ID_CURR']} envoyée pour le demandeur {sk_id_curr}"
+                    )
+            historiques.append(dicts)
+        return self.application.model_dump(), historiques[0], historiques[1]
+
+
+class LotDemandeurs(BaseModel):
+    demandeurs: List[Demandeur] = Field(min_length=1)
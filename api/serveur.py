@@ -0,0 +1,109 @@
+"""
+Service multi-processus « preload-and-fork » de l'API.
+
+`uvicorn main:app --workers N` démarre N processus neufs (spawn) : chacun importe pandas,
+LightGBM, FastAPI... et charge le modèle et les artefacts de colonnes. Ici, le processus
+maître importe l'API et charge une seule fois le booster, l'explicateur natif, les colonnes
+et le plan compilé, puis crée les workers par fork : ils partagent ces pages mémoire en
+copie sur écriture et ne paient que leurs données propres (requêtes, cache des lots).
+
+- `gc.freeze()` avant le fork : le ramasse-miettes des workers ne parcourt plus (et donc
+  n'écrit plus dans) les objets chargés par le maître ;
+- OpenMP limité à un thread (OMP_NUM_THREADS=1) : les workers se partagent les cœurs, et
+  libgomp ne supporte pas un fork après avoir démarré ses threads (un worker resterait
+  bloqué à sa première prédiction) ;
+- un worker arrêté anormalement est relancé ; SIGTERM / SIGINT arrêtent tous les workers.
+
+Usage :
+    python -m api.serveur [--workers 4] [--host 0.0.0.0] [--port 8000]
+                          [--fenetre-regroupement 0.002] [--taille-max-regroupement 256]
+"""
+
+import os
+
+# Avant tout import de LightGBM (cf. docstring)
+os.environ["OMP_NUM_THREADS"] = "1"
+
+import argparse
+import gc
+import signal
+import time
+
+import uvicorn
+
+
+def precharger():
+    """Importe l'API et charge le modèle et l'explicateur dans le processus maître."""
+    from api import main
+
+    main.modele_servi.moteur
+    main.modele_servi.explainer
+    gc.collect()
+    gc.freeze()
+    return main
+
+
+def lancer_worker(app, socket_ecoute, options_uvicorn):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            uvicorn.Server(uvicorn.Config(app, **options_uvicorn)).run(sockets=[socket_ecoute])
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def servir(workers, host="0.0.0.0", port=8000, log_level="info"):
+    debut = time.perf_counter()
+    main = precharger()
+    print(f"✅ Modèle et artefacts chargés dans le maître en {time.perf_counter() - debut:.2f}s "
+          f"({main.modele_servi.metriques()['format_modele']})")
+
+    options_uvicorn = {"log_level": log_level}
+    socket_ecoute = uvicorn.Config(main.app, host=host, port=port).bind_socket()
+    pids = {lancer_worker(main.app, socket_ecoute, options_uvicorn) for _ in range(workers)}
+    print(f"🚀 {workers} workers sur http://{host}:{port} : {sorted(pids)}")
+
+    arret = False
+
+    def arreter(signum, frame):
+        nonlocal arret
+        arret = True
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, arreter)
+    signal.signal(signal.SIGINT, arreter)
+
+    while pids:
+        try:
+            pid, statut = os.wait()
+        except ChildProcessError:
+            break
+        pids.discard(pid)
+        if not arret:
+            print(f"⚠️ Worker {pid} arrêté (statut {statut}), relancé")
+            pids.add(lancer_worker(main.app, socket_ecoute, options_uvicorn))
+    socket_ecoute.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sert l'API avec plusieurs workers partageant le modèle chargé")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--fenetre-regroupement", type=float, help="fenêtre du regroupement des scorings (s)")
+    parser.add_argument("--taille-max-regroupement", type=int, help="lignes au plus par lot regroupé")
+    args = parser.parse_args()
+    # Lues par api/main.py à son import (cf. `precharger`)
+    if args.fenetre_regroupement is not None:
+        os.environ["FENETRE_REGROUPEMENT_S"] = str(args.fenetre_regroupement)
+    if args.taille_max_regroupement is not None:
+        os.environ["TAILLE_MAX_REGROUPEMENT"] = str(args.taille_max_regroupement)
+    servir(args.workers, args.host, args.port, args.log_level)
@@ -5,6 +5,8 @@ import io
 import base64
 from PIL import Image
 
+from graphiques import graphique_explication, graphique_resume
+
 st.set_page_config(layout="wide")
 st.title("📊 Prédiction de crédit & SHAP")
 
@@ -33,7 +35,7 @@ if file_app and file_bureau and file_prev and sk_id_selected is not None:
         with st.spinner("🧠 Prédiction en cours..."):
             response = requests.post(
                 API_URL,
-                data={"sk_id_curr": sk_id_selected},
+                data={"sk_id_curr": sk_id_selected, "graphiques": "json"},
                 files={
                     "application_test": ("application_test.csv", file_app, "text/csv"),
                     "bureau": ("bureau.csv", file_bureau, "text/csv"),
@@ -70,16 +72,22 @@ if file_app and file_bureau and file_prev and sk_id_selected is not None:
                 - **Montant de crédit moyen** : {moyenne_info['AMT_CREDIT']:.0f}
                 """)
 
-            # SHAP Summary Plot
-            if data.get("shap_summary_plot"):
+            # SHAP global : données JSON tracées ici (PNG si l'API les a rendus)
+            if data.get("resume_global"):
+                st.subheader("📉 SHAP : importance globale des features")
+                st.altair_chart(graphique_resume(data["resume_global"]), use_container_width=True)
+            elif data.get("shap_summary_plot"):
                 st.subheader("📉 SHAP Summary Plot (Global)")
                 summary_img = Image.open(io.BytesIO(base64.b64decode(data["shap_summary_plot"])))
                 st.image(summary_img, caption="Summary Plot des SHAP values")
             else:
                 st.warning("⚠️ Le graphique SHAP global n'a pas pu être généré.")
 
-            # SHAP Force Plot
-            if data.get("shap_force_plot"):
+            # SHAP local
+            if data.get("explication"):
+                st.subheader("⚡ SHAP : contributions pour le client")
+                st.altair_chart(graphique_explication(data["explication"]), use_container_width=True)
+            elif data.get("shap_force_plot"):
                 st.subheader("⚡ SHAP Force Plot (Client spécifique)")
                 force_img = Image.open(io.BytesIO(base64.b64decode(data["shap_force_plot"])))
                 st.image(force_img, caption=f"Force Plot pour SK_ID_CURR {sk_id_selected}")
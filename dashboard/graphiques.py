@@ -0,0 +1,81 @@
+"""
+Graphiques SHAP du dashboard, tracés à partir des explications JSON de l'API
+(`explication` et `resume_global`, cf. src/explications.py).
+"""
+
+import math
+
+import altair as alt
+import pandas as pd
+
+ROUGE = "#ff0051"   # contribution vers le refus (augmente le risque)
+BLEU = "#008bfb"    # contribution vers l'accord
+
+
+def probabilite(log_odds):
+    return 1 / (1 + math.exp(-log_odds))
+
+
+def formater_valeur(valeur):
+    if valeur is None:
+        return "manquant"
+    return f"{valeur:.0f}" if float(valeur).is_integer() else f"{valeur:.3g}"
+
+
+def tableau_explication(explication):
+    """Une ligne par contribution affichée (« feature = valeur »), plus les autres features regroupées."""
+    lignes = [
+        {"libelle": f"{c['feature']} = {formater_valeur(c['valeur'])}", "contribution": c["contribution"]}
+        for c in explication["contributions"]
+    ]
+    autres = explication["nombre_features"] - len(lignes)
+    if autres > 0:
+        lignes.append({"libelle": f"{autres} autres features", "contribution": explication["autres_contributions"]})
+    df = pd.DataFrame(lignes, columns=["libelle", "contribution"])
+    df["sens"] = ["augmente le risque" if c > 0 else "diminue le risque" for c in df["contribution"]]
+    return df
+
+
+def graphique_explication(explication):
+    """Contributions du client (barres horizontales, équivalent du force plot)."""
+    df = tableau_explication(explication)
+    log_odds = explication["valeur_base"] + df["contribution"].sum()
+    titre = (f"Valeur de base {explication['valeur_base']:.3f} → {log_odds:.3f} (log-odds), "
+             f"probabilité de défaut {probabilite(log_odds):.1%}")
+    return alt.Chart(df, title=titre).mark_bar().encode(
+        x=alt.X("contribution:Q", title="Contribution SHAP (log-odds)"),
+        y=alt.Y("libelle:N", sort=list(df["libelle"]), title=None),
+        color=alt.Color("sens:N", scale=alt.Scale(domain=["augmente le risque", "diminue le risque"],
+                                                  range=[ROUGE, BLEU]), title=None),
+        tooltip=["libelle", alt.Tooltip("contribution:Q", format=".4f")]
+    )
+
+
+def tableau_resume(resume):
+    df = pd.DataFrame(resume["features"])
+    df["sens"] = [
+        "valeur élevée → risque plus élevé" if c is not None and c > 0
+        else "valeur élevée → risque plus faible" if c is not None and c < 0
+        else "indéterminé"
+        for c in df["correlation_valeur_contribution"]
+    ]
+    return df
+
+
+def graphique_resume(resume):
+    """
+    Importance globale : contribution moyenne absolue de chaque feature sur la population de
+    référence (précalculée) ou, à défaut, sur le lot envoyé.
+    """
+    df = tableau_resume(resume)
+    population = "de la population de référence" if resume.get("source") == "reference" else "du lot"
+    titre = f"Importance moyenne sur {resume['nombre_clients']} clients {population}"
+    return alt.Chart(df, title=titre).mark_bar().encode(
+        x=alt.X("contribution_moyenne_abs:Q", title="|SHAP| moyen (log-odds)"),
+        y=alt.Y("feature:N", sort=list(df["feature"]), title=None),
+        color=alt.Color("sens:N", scale=alt.Scale(
+            domain=["valeur élevée → risque plus élevé", "valeur élevée → risque plus faible", "indéterminé"],
+            range=[ROUGE, BLEU, "#999999"]
+        ), title=None),
+        tooltip=["feature", alt.Tooltip("contribution_moyenne_abs:Q", format=".4f"), "sens"]
+    )
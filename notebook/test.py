@@ -24,6 +24,7 @@ from src.preprocessing import (
 
 from src.feature_engineering import fusionner_et_agreger_donnees
 from src.feature_engineering import feature_engineering_bureau, feature_engineering_previous
+from src.pipeline import SchemaFeatures
 
 # Chargement des dataset
 data_path = r"C:\Users\inesn\OneDrive - Université de Paris\credit_score_projet7\data\original"
@@ -179,28 +180,15 @@ with open("models/best_model_lightgbm.pkl", "rb") as f:
 # Chargement du seuil optimal choisi lors de l'entraînement
 seuil_optimal = 0.14  # remplace par la bonne valeur si besoin
 
-# Identifiants clients
-ids_clients = df["SK_ID_CURR"]
-
-# 1. Retirer SK_ID_CURR
-X_app = df.drop(columns=["SK_ID_CURR"])
-
-# 2. Charger les colonnes utilisées à l'entraînement
+# Alignement sur les colonnes utilisées à l'entraînement, avec leurs types (schéma compilé :
+# colonnes manquantes remplies avec 0, colonnes en trop ignorées, les unes et les autres comptées)
 colonnes_utiles = joblib.load("models/columns_used.pkl")
-
-# 3. Réindexation : ajouter les colonnes manquantes (remplies avec 0) et enlever celles en trop
-X_app = X_app.reindex(columns=colonnes_utiles, fill_value=0)
-
-# 4. Charger les types de colonnes (sauvegardés à l'entraînement)
 dtypes_dict = joblib.load("models/columns_dtypes.pkl")
-
-# 5. Conversion automatique au bon type
-for col, dtype in dtypes_dict.items():
-    if col in X_app.columns:
-        try:
-            X_app[col] = X_app[col].astype(dtype)
-        except Exception as e:
-            print(f"⚠️ Erreur de conversion pour {col} → {dtype} : {e}")
+schema = SchemaFeatures(colonnes_utiles, dtypes_dict)
+ids_clients, X_app = schema.aligner(df)
+metriques_schema = schema.metriques()
+print(f"⚠️ Colonnes inconnues du modèle : {list(metriques_schema['colonnes_inconnues'])}")
+print(f"⚠️ Variables du modèle absentes (remplies avec 0) : {list(metriques_schema['variables_absentes'])}")
 
 # Prédiction de la probabilité d'être un "bon" client (classe 1)
 probas = best_model.predict_proba(X_app)[:, 1]
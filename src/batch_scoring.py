@@ -0,0 +1,338 @@
+"""
+Scoring par lots en flux des fichiers complets application_test / bureau / previous_application.
+
+Les fichiers sont lus par morceaux : application_test est découpé en blocs de
+`taille_bloc` clients, puis les lignes bureau et previous_application sont réparties
+sur disque vers le bloc de leur client. Chaque bloc passe ensuite seul dans le
+pipeline (prétraitement ajusté, agrégations, modèle) et ses résultats sont ajoutés
+au fichier de sortie. La mémoire utilisée dépend de la taille des blocs et des
+morceaux, et non de la taille des fichiers.
+
+Avec `--processus N` (N > 1), les clients sont répartis en partitions par hachage de
+SK_ID_CURR et les partitions sont scorées en parallèle par N processus. Les features
+d'un client ne dépendant que de ses propres lignes, le résultat est identique ligne
+à ligne à une exécution sur un seul processus, remis dans l'ordre de application_test.
+
+Usage :
+    python -m src.batch_scoring <dossier_donnees> <sortie.csv|sortie.parquet> [--taille-bloc N] [--chunksize N] [--processus N] [--creuse]
+"""
+
+import argparse
+import math
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from src.modele import DOSSIER_MODELES, charger_artefacts, scorer
+from src.pipeline import (
+    pretraiter,
+    construire_features,
+    aligner_colonnes,
+    APP_COLONNES_A_CONSERVER,
+    BUREAU_COLONNES_A_CONSERVER,
+    PREV_COLONNES_A_CONSERVER
+)
+from src.preprocesseur import charger_preprocesseur
+from src.preprocessing import chemin_table, lire_par_morceaux, lire_table
+
+TAILLE_BLOC = 20000
+CHUNKSIZE = 200000
+
+# =============================================================================
+# 📂 LECTURE ET RÉPARTITION PAR BLOCS
+# =============================================================================
+
+def types_lecture(parametres_table):
+    """
+    Types à imposer à la lecture, d'après les valeurs d'imputation apprises : sans cela,
+    chaque morceau lu déduirait ses propres types (int ou float selon ses valeurs).
+    Les colonnes texte sont lues directement en 'category'.
+    """
+    types = {}
+    for col, valeur in parametres_table['imputations'].items():
+        if isinstance(valeur, str):
+            types[col] = 'category'
+        elif isinstance(valeur, float):
+            types[col] = 'float64'
+    return types
+
+
+def partitionner_par_hachage(ids_clients, n_partitions):
+    """Partition de chaque client : hachage de SK_ID_CURR modulo le nombre de partitions."""
+    hachages = pd.util.hash_array(np.asarray(ids_clients, dtype=np.int64))
+    return (hachages % np.uint64(n_partitions)).astype(np.int64)
+
+
+class RepartiteurBlocs:
+    """
+    Associe chaque SK_ID_CURR à son bloc et écrit, morceau par morceau, les lignes
+    de chaque table dans un fichier CSV temporaire par bloc.
+    """
+
+    def __init__(self, dossier_tmp):
+        self.dossier_tmp = dossier_tmp
+        self.ids_clients = np.array([], dtype=np.int64)
+        self.ids_tries = np.array([], dtype=np.int64)
+        self.blocs_tries = np.array([], dtype=np.int64)
+
+    def chemin(self, table, bloc):
+        return os.path.join(self.dossier_tmp, f"{table}_{bloc}.csv")
+
+    def existe(self, table, bloc):
+        return os.path.exists(self.chemin(table, bloc))
+
+    def definir_blocs(self, ids_clients, blocs):
+        self.ids_clients = np.asarray(ids_clients)
+        ordre = np.argsort(ids_clients, kind='stable')
+        self.ids_tries = np.asarray(ids_clients)[ordre]
+        self.blocs_tries = np.asarray(blocs)[ordre]
+
+    def blocs_des_lignes(self, ids_clients):
+        """Bloc de chaque ligne (-1 si le client n'est pas à scorer)."""
+        ids_clients = np.asarray(ids_clients)
+        if len(self.ids_tries) == 0:
+            return np.full(len(ids_clients), -1)
+        positions = np.minimum(np.searchsorted(self.ids_tries, ids_clients), len(self.ids_tries) - 1)
+        return np.where(self.ids_tries[positions] == ids_clients, self.blocs_tries[positions], -1)
+
+    def ecrire(self, table, morceau, blocs):
+        for bloc, lignes in morceau.groupby(blocs):
+            if bloc < 0:
+                continue
+            chemin = self.chemin(table, bloc)
+            lignes.to_csv(chemin, mode='a', header=not os.path.exists(chemin), index=False)
+
+    def lire(self, table, bloc, colonnes, types):
+        chemin = self.chemin(table, bloc)
+        if not os.path.exists(chemin):
+            return pd.DataFrame({col: pd.Series(dtype=types.get(col, 'float64')) for col in colonnes})
+        return pd.read_csv(chemin, dtype=types)
+
+
+def repartir_fichiers(chemin_app, chemin_bureau, chemin_prev, repartiteur, preprocesseur,
+                      taille_bloc=TAILLE_BLOC, chunksize=CHUNKSIZE, n_partitions=None):
+    """
+    Découpe application_test en blocs consécutifs de `taille_bloc` clients (ou, si
+    `n_partitions` est donné, en partitions par hachage de SK_ID_CURR), puis répartit
+    les lignes bureau et previous_application par bloc. Retourne le nombre de blocs.
+    """
+    parametres = preprocesseur.parametres
+    ids_clients, blocs = [], []
+    lecteur = lire_par_morceaux(chemin_app, APP_COLONNES_A_CONSERVER, taille_bloc,
+                                types_lecture(parametres['application']))
+    n_blocs = 0
+    for numero, morceau in enumerate(lecteur):
+        if n_partitions is None:
+            blocs_morceau = np.full(len(morceau), numero)
+            n_blocs = numero + 1
+        else:
+            blocs_morceau = partitionner_par_hachage(morceau['SK_ID_CURR'], n_partitions)
+            n_blocs = n_partitions
+        repartiteur.ecrire('application', morceau, blocs_morceau)
+        ids_clients.append(morceau['SK_ID_CURR'].to_numpy())
+        blocs.append(blocs_morceau)
+
+    if n_blocs == 0:
+        return 0
+    repartiteur.definir_blocs(np.concatenate(ids_clients), np.concatenate(blocs))
+
+    for table, chemin, colonnes, cle in [
+        ('bureau', chemin_bureau, BUREAU_COLONNES_A_CONSERVER, 'bureau'),
+        ('previous', chemin_prev, PREV_COLONNES_A_CONSERVER, 'previous')
+    ]:
+        lecteur = lire_par_morceaux(chemin, colonnes, chunksize, types_lecture(parametres[cle]))
+        for morceau in lecteur:
+            repartiteur.ecrire(table, morceau, repartiteur.blocs_des_lignes(morceau['SK_ID_CURR']))
+
+    return n_blocs
+
+# =============================================================================
+# 🧮 SCORING D'UN BLOC
+# =============================================================================
+
+def lire_bloc(repartiteur, bloc, parametres):
+    """Relit les trois tables d'un bloc depuis le dossier temporaire."""
+    return (
+        repartiteur.lire('application', bloc, APP_COLONNES_A_CONSERVER, types_lecture(parametres['application'])),
+        repartiteur.lire('bureau', bloc, BUREAU_COLONNES_A_CONSERVER, types_lecture(parametres['bureau'])),
+        repartiteur.lire('previous', bloc, PREV_COLONNES_A_CONSERVER, types_lecture(parametres['previous']))
+    )
+
+
+def scorer_bloc(df_app, df_bureau, df_prev, model, colonnes_utiles, colonnes_types, preprocesseur,
+                creuse=False):
+    """
+    Score un bloc de clients avec le pipeline habituel, en mode catégoriel (sans copies).
+    Les modalités sont encodées sans drop_first pour que l'encodage ne dépende pas du
+    contenu du bloc. Avec `creuse=True`, la matrice alignée est une matrice CSR.
+    """
+    df_app, df_bureau, df_prev = pretraiter(df_app, df_bureau, df_prev, preprocesseur, categoriel=True)
+    df = construire_features(df_app, df_bureau, df_prev, drop_first=False, modalites=preprocesseur.modalites)
+    ids_clients, X = aligner_colonnes(df, colonnes_utiles, colonnes_types, creuse)
+    del df
+    return scorer(model, ids_clients.to_numpy(), X)
+
+# =============================================================================
+# ⚙️ PROCESSUS PARALLÈLES
+# =============================================================================
+
+# Artefacts chargés une seule fois par processus (voir initialiser_processus)
+_ETAT_PROCESSUS = {}
+
+
+def initialiser_processus(dossier_modeles, preprocesseur, dossier_tmp, creuse=False):
+    model, colonnes_utiles, colonnes_types = charger_artefacts(dossier_modeles)
+    _ETAT_PROCESSUS.update(
+        model=model,
+        colonnes_utiles=colonnes_utiles,
+        colonnes_types=colonnes_types,
+        preprocesseur=preprocesseur,
+        repartiteur=RepartiteurBlocs(dossier_tmp),
+        creuse=creuse
+    )
+
+
+def scorer_partition(partition):
+    """Score une partition dans un processus initialisé par `initialiser_processus`."""
+    etat = _ETAT_PROCESSUS
+    df_app, df_bureau, df_prev = lire_bloc(etat['repartiteur'], partition, etat['preprocesseur'].parametres)
+    return scorer_bloc(df_app, df_bureau, df_prev, etat['model'], etat['colonnes_utiles'],
+                       etat['colonnes_types'], etat['preprocesseur'], etat['creuse'])
+
+# =============================================================================
+# 💾 ÉCRITURE DES RÉSULTATS
+# =============================================================================
+
+class EcrivainResultats:
+    """Ajoute les résultats bloc par bloc à un fichier CSV ou Parquet."""
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.parquet = chemin.endswith(".parquet")
+        self.writer = None
+        self.premier_bloc = True
+
+    def ecrire(self, resultats):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(resultats, preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.chemin, table.schema)
+            self.writer.write_table(table)
+        else:
+            resultats.to_csv(self.chemin, mode='w' if self.premier_bloc else 'a',
+                             header=self.premier_bloc, index=False)
+        self.premier_bloc = False
+
+    def fermer(self):
+        if self.writer is not None:
+            self.writer.close()
+
+# =============================================================================
+# 🚀 POINT D'ENTRÉE
+# =============================================================================
+
+def scorer_fichiers(chemin_app, chemin_bureau, chemin_prev, chemin_sortie,
+                    taille_bloc=TAILLE_BLOC, chunksize=CHUNKSIZE, dossier_modeles=DOSSIER_MODELES,
+                    preprocesseur=None, processus=1, creuse=False):
+    """
+    Score en flux les trois fichiers et écrit les résultats (SK_ID_CURR, Score_proba, Decision)
+    dans `chemin_sortie`, dans l'ordre de application_test. Retourne le nombre de clients scorés.
+
+    Avec `processus` > 1, les partitions sont scorées en parallèle ; leurs résultats (trois
+    colonnes par client) sont rassemblés en mémoire pour être remis dans l'ordre d'origine.
+
+    Avec `creuse=True`, la matrice de features de chaque bloc est une matrice CSR (cf.
+    `SchemaFeatures.aligner`) au lieu d'une matrice dense : mêmes probabilités.
+    """
+    preprocesseur = preprocesseur or charger_preprocesseur(dossier_modeles)
+    if preprocesseur is None:
+        raise FileNotFoundError(
+            "models/preprocesseur.pkl introuvable : les statistiques de prétraitement ne peuvent pas "
+            "être recalculées bloc par bloc. Lancez d'abord `python -m src.preprocesseur <dossier>`."
+        )
+
+    dossier_tmp = tempfile.mkdtemp(prefix="scoring_blocs_")
+    ecrivain = EcrivainResultats(chemin_sortie)
+    try:
+        repartiteur = RepartiteurBlocs(dossier_tmp)
+        if processus > 1:
+            return scorer_en_parallele(chemin_app, chemin_bureau, chemin_prev, repartiteur, ecrivain,
+                                       preprocesseur, taille_bloc, chunksize, dossier_modeles, processus, creuse)
+
+        model, colonnes_utiles, colonnes_types = charger_artefacts(dossier_modeles)
+        n_blocs = repartir_fichiers(chemin_app, chemin_bureau, chemin_prev, repartiteur, preprocesseur,
+                                    taille_bloc, chunksize)
+        n_clients = 0
+        for bloc in range(n_blocs):
+            df_app, df_bureau, df_prev = lire_bloc(repartiteur, bloc, preprocesseur.parametres)
+            resultats = scorer_bloc(df_app, df_bureau, df_prev, model, colonnes_utiles, colonnes_types,
+                                    preprocesseur, creuse)
+            ecrivain.ecrire(resultats)
+            n_clients += len(resultats)
+            print(f"✅ Bloc {bloc + 1}/{n_blocs} : {len(resultats)} clients scorés")
+        return n_clients
+    finally:
+        ecrivain.fermer()
+        shutil.rmtree(dossier_tmp, ignore_errors=True)
+
+
+def scorer_en_parallele(chemin_app, chemin_bureau, chemin_prev, repartiteur, ecrivain,
+                        preprocesseur, taille_bloc, chunksize, dossier_modeles, processus, creuse=False):
+    """
+    Répartit les clients par hachage de SK_ID_CURR en au moins `processus` partitions
+    (d'environ `taille_bloc` clients chacune) et les score dans un pool de processus.
+    """
+    n_app = len(lire_table(chemin_app, ['SK_ID_CURR']))
+    n_partitions = max(processus, math.ceil(n_app / taille_bloc))
+    repartir_fichiers(chemin_app, chemin_bureau, chemin_prev, repartiteur, preprocesseur,
+                      taille_bloc, chunksize, n_partitions=n_partitions)
+    partitions = [p for p in range(n_partitions) if repartiteur.existe('application', p)]
+
+    resultats = []
+    with ProcessPoolExecutor(max_workers=processus, initializer=initialiser_processus,
+                             initargs=(dossier_modeles, preprocesseur, repartiteur.dossier_tmp, creuse)) as pool:
+        for i, resultats_partition in enumerate(pool.map(scorer_partition, partitions)):
+            resultats.append(resultats_partition)
+            print(f"✅ Partition {i + 1}/{len(partitions)} : {len(resultats_partition)} clients scorés")
+
+    if not resultats:
+        return 0
+    # Remise dans l'ordre de application_test
+    resultats = pd.concat(resultats, ignore_index=True)
+    positions = pd.Series(np.arange(len(repartiteur.ids_clients)), index=repartiteur.ids_clients)
+    resultats = resultats.iloc[np.argsort(positions.loc[resultats['SK_ID_CURR']].to_numpy(), kind='stable')]
+    ecrivain.ecrire(resultats.reset_index(drop=True))
+    return len(resultats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scoring par lots en flux")
+    parser.add_argument("dossier_donnees",
+                        help="dossier contenant application_test, bureau et previous_application "
+                             "(.parquet, .arrow ou .csv)")
+    parser.add_argument("sortie", help="fichier de résultats (.csv ou .parquet)")
+    parser.add_argument("--taille-bloc", type=int, default=TAILLE_BLOC, help="nombre de clients scorés par bloc")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE,
+                        help="nombre de lignes bureau / previous_application lues à la fois")
+    parser.add_argument("--processus", type=int, default=1,
+                        help="nombre de processus de scoring (partitionnement par SK_ID_CURR)")
+    parser.add_argument("--creuse", action="store_true",
+                        help="matrice de features creuse (CSR) au lieu d'une matrice dense")
+    args = parser.parse_args()
+
+    n = scorer_fichiers(
+        chemin_table(args.dossier_donnees, "application_test"),
+        chemin_table(args.dossier_donnees, "bureau"),
+        chemin_table(args.dossier_donnees, "previous_application"),
+        args.sortie,
+        taille_bloc=args.taille_bloc,
+        chunksize=args.chunksize,
+        processus=args.processus,
+        creuse=args.creuse
+    )
+    print(f"✅ {n} clients scorés → {args.sortie}")
@@ -0,0 +1,173 @@
+"""
+Cache de la matrice de features alignée (après `aligner_colonnes`) pour les analyses
+répétées sur une même population (scoring, SHAP).
+
+La matrice est enregistrée une fois (.npy, ordre C) avec les SK_ID_CURR et le nom des
+colonnes, dans un dossier dont le nom est une empreinte du contenu des fichiers d'entrée,
+des artefacts du modèle et des options de construction : si rien n'a changé, les
+exécutions suivantes ouvrent la matrice par memory-map, sans copie, et sautent
+chargement, prétraitement et agrégations.
+
+Elle est en float32 si toutes les colonnes y sont représentées exactement, en float64
+sinon : LightGBM compare les features en double à des seuils double, et une valeur
+float64 arrondie en float32 peut passer de l'autre côté d'un seuil. Les probabilités sur
+la matrice en cache sont ainsi celles de la matrice d'origine.
+
+Usage :
+    python -m src.cache_features <dossier_donnees> [--cache dossier] [--table-application application_test]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from src.modele import DOSSIER_MODELES, charger_colonnes
+from src.pipeline import (
+    pretraiter,
+    construire_features,
+    aligner_colonnes,
+    APP_COLONNES_A_CONSERVER,
+    BUREAU_COLONNES_A_CONSERVER,
+    PREV_COLONNES_A_CONSERVER
+)
+from src.preprocesseur import charger_preprocesseur
+from src.preprocessing import chemin_table, lire_table
+
+DOSSIER_CACHE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "cache_features"))
+
+# À incrémenter quand le pipeline change les features produites
+VERSION_CACHE = 2
+
+# Types dont toutes les valeurs sont exactes en float32
+TYPES_EXACTS_FLOAT32 = (np.bool_, np.int8, np.uint8, np.int16, np.uint16, np.float32)
+
+ARTEFACTS = [
+    "columns_used.pkl", "columns_dtypes.pkl", "preprocesseur.pkl",
+    "best_model_lightgbm.txt", "best_model_lightgbm.pkl"
+]
+
+# =============================================================================
+# 🔑 EMPREINTE DES ENTRÉES
+# =============================================================================
+
+def empreinte(chemins_entrees, dossier_modeles=DOSSIER_MODELES, **options):
+    """
+    Empreinte (sha256) du contenu des fichiers d'entrée, des artefacts présents dans
+    `dossier_modeles` et des options de construction.
+    """
+    h = hashlib.sha256(f"version={VERSION_CACHE};{sorted(options.items())}".encode())
+    chemins_artefacts = [os.path.join(dossier_modeles, nom) for nom in ARTEFACTS]
+    for chemin in [*chemins_entrees, *[c for c in chemins_artefacts if os.path.exists(c)]]:
+        h.update(os.path.basename(chemin).encode())
+        with open(chemin, "rb") as f:
+            while bloc := f.read(1 << 20):
+                h.update(bloc)
+    return h.hexdigest()
+
+# =============================================================================
+# 💾 ÉCRITURE ET OUVERTURE DU CACHE
+# =============================================================================
+
+def type_stockage(X):
+    """float32 si toutes les colonnes de X y sont exactes, float64 sinon (aucune valeur arrondie)."""
+    exacte = all(any(dtype == t for t in TYPES_EXACTS_FLOAT32) for dtype in X.dtypes)
+    return np.float32 if exacte else np.float64
+
+
+def enregistrer_matrice(dossier, ids_clients, X):
+    """
+    Écrit la matrice (`type_stockage`, ordre C), les identifiants et les colonnes dans `dossier`.
+    L'écriture se fait dans un dossier temporaire renommé à la fin : un cache interrompu
+    n'est jamais relu.
+    """
+    parent = os.path.dirname(dossier)
+    os.makedirs(parent, exist_ok=True)
+    dossier_tmp = tempfile.mkdtemp(dir=parent)
+    try:
+        np.save(os.path.join(dossier_tmp, "X.npy"), np.ascontiguousarray(X.to_numpy(dtype=type_stockage(X))))
+        np.save(os.path.join(dossier_tmp, "ids.npy"), np.asarray(ids_clients, dtype=np.int64))
+        with open(os.path.join(dossier_tmp, "colonnes.json"), "w") as f:
+            json.dump(list(X.columns), f)
+        os.replace(dossier_tmp, dossier)
+    except OSError:
+        shutil.rmtree(dossier_tmp, ignore_errors=True)
+        if not os.path.exists(os.path.join(dossier, "X.npy")):
+            raise
+
+
+def ouvrir_matrice(dossier):
+    """
+    Ouvre une matrice en cache par memory-map (lecture seule, sans copie).
+    Retourne les identifiants (Series SK_ID_CURR) et X (DataFrame float32 ou float64).
+    """
+    valeurs = np.load(os.path.join(dossier, "X.npy"), mmap_mode="r")
+    ids = np.load(os.path.join(dossier, "ids.npy"), mmap_mode="r")
+    with open(os.path.join(dossier, "colonnes.json")) as f:
+        colonnes = json.load(f)
+    X = pd.DataFrame(valeurs, columns=colonnes, copy=False)
+    return pd.Series(ids, name="SK_ID_CURR", copy=False), X
+
+# =============================================================================
+# 🧮 CONSTRUCTION OU LECTURE
+# =============================================================================
+
+def construire_matrice(chemin_app, chemin_bureau, chemin_prev, dossier_modeles=DOSSIER_MODELES,
+                       drop_first=True):
+    """Pipeline complet (lecture, prétraitement, agrégations, alignement) des trois fichiers."""
+    preprocesseur = charger_preprocesseur(dossier_modeles)
+    colonnes_utiles, colonnes_types = charger_colonnes(dossier_modeles)
+    tables = pretraiter(
+        lire_table(chemin_app, APP_COLONNES_A_CONSERVER),
+        lire_table(chemin_bureau, BUREAU_COLONNES_A_CONSERVER),
+        lire_table(chemin_prev, PREV_COLONNES_A_CONSERVER),
+        preprocesseur, categoriel=True
+    )
+    modalites = preprocesseur.modalites if preprocesseur is not None else None
+    df = construire_features(*tables, drop_first=drop_first, modalites=modalites)
+    return aligner_colonnes(df, colonnes_utiles, colonnes_types)
+
+
+def matrice_features(chemin_app, chemin_bureau, chemin_prev, dossier_cache=DOSSIER_CACHE,
+                     dossier_modeles=DOSSIER_MODELES, drop_first=True):
+    """
+    Matrice de features des trois fichiers : ouverte depuis le cache si les entrées et les
+    artefacts n'ont pas changé, sinon construite par le pipeline puis mise en cache.
+
+    Retourne les identifiants, X (memory-mappé, cf. `type_stockage`) et un booléen indiquant si la
+    matrice vient du cache.
+    """
+    cle = empreinte([chemin_app, chemin_bureau, chemin_prev], dossier_modeles, drop_first=drop_first)
+    dossier = os.path.join(dossier_cache, cle)
+    trouve = os.path.exists(os.path.join(dossier, "X.npy"))
+    if not trouve:
+        ids_clients, X = construire_matrice(chemin_app, chemin_bureau, chemin_prev, dossier_modeles, drop_first)
+        enregistrer_matrice(dossier, ids_clients, X)
+    return (*ouvrir_matrice(dossier), trouve)
+
+
+if __name__ == "__main__":
+    from src.modele import charger_modele, predire_probas
+
+    parser = argparse.ArgumentParser(description="Construit ou ouvre la matrice de features en cache")
+    parser.add_argument("dossier_donnees", help="dossier contenant application, bureau et previous_application")
+    parser.add_argument("--cache", default=DOSSIER_CACHE, help="dossier des matrices en cache")
+    parser.add_argument("--table-application", default="application_test")
+    args = parser.parse_args()
+
+    chemins = [chemin_table(args.dossier_donnees, nom)
+               for nom in [args.table_application, "bureau", "previous_application"]]
+    debut = time.perf_counter()
+    ids_clients, X, trouve = matrice_features(*chemins, dossier_cache=args.cache)
+    duree = time.perf_counter() - debut
+    print(f"{'📂 Matrice lue dans le cache' if trouve else '🧮 Matrice construite et mise en cache'} : "
+          f"{X.shape[0]} clients x {X.shape[1]} colonnes en {duree:.3f}s")
+
+    debut = time.perf_counter()
+    probas = predire_probas(charger_modele(), X)
+    print(f"⏱️ Scoring : {time.perf_counter() - debut:.3f}s (probabilité moyenne {probas.mean():.4f})")
@@ -0,0 +1,102 @@
+"""
+Cache LRU en mémoire, borné en nombre d'entrées et en octets, avec durée de vie (TTL).
+
+Utilisé par l'API pour garder, par empreinte des fichiers envoyés et version du modèle,
+la matrice de features d'un lot, ses probabilités et ses valeurs SHAP : le dashboard
+renvoie souvent les mêmes fichiers pour un autre SK_ID_CURR.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+TAILLE_BLOC_EMPREINTE = 1 << 20
+
+
+def empreinte_flux(*flux, extra=()):
+    """
+    Empreinte (blake2b) du contenu de flux binaires (None pour un flux absent) et de
+    valeurs supplémentaires. Chaque flux est relu depuis le début puis rembobiné.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for f in flux:
+        if f is None:
+            h.update(b"\x00absent")
+            continue
+        f.seek(0)
+        while bloc := f.read(TAILLE_BLOC_EMPREINTE):
+            h.update(bloc)
+        f.seek(0)
+        h.update(b"\x00fin")
+    h.update(repr(extra).encode())
+    return h.hexdigest()
+
+
+class CacheLRU:
+    """
+    Dictionnaire borné : au-delà de `max_entrees` entrées ou de `max_octets` (taille de
+    chaque valeur estimée par `taille` à l'insertion), les entrées les moins récemment
+    utilisées sont évincées ; une entrée plus vieille que `ttl_s` secondes est ignorée
+    et supprimée à la lecture.
+    """
+
+    def __init__(self, max_entrees=8, ttl_s=900, max_octets=None, taille=None, horloge=time.monotonic):
+        self.max_entrees = max_entrees
+        self.ttl_s = ttl_s
+        self.max_octets = max_octets
+        self.taille = taille or (lambda valeur: 0)
+        self.horloge = horloge
+        self.verrou = threading.Lock()
+        self.entrees = OrderedDict()
+        self.octets = 0
+        self.compteurs = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, cle):
+        with self.verrou:
+            entree = self.entrees.get(cle)
+            if entree is not None and self.horloge() - entree[1] > self.ttl_s:
+                self._supprimer(cle)
+                self.compteurs["expirations"] += 1
+                entree = None
+            if entree is None:
+                self.compteurs["misses"] += 1
+                return None
+            self.entrees.move_to_end(cle)
+            self.compteurs["hits"] += 1
+            return entree[0]
+
+    def put(self, cle, valeur):
+        taille = self.taille(valeur)
+        with self.verrou:
+            if cle in self.entrees:
+                self._supprimer(cle)
+            self.entrees[cle] = (valeur, self.horloge(), taille)
+            self.octets += taille
+            while len(self.entrees) > self.max_entrees or (
+                self.max_octets is not None and self.octets > self.max_octets and len(self.entrees) > 1
+            ):
+                self._supprimer(next(iter(self.entrees)))
+                self.compteurs["evictions"] += 1
+
+    def _supprimer(self, cle):
+        _, _, taille = self.entrees.pop(cle)
+        self.octets -= taille
+
+    def vider(self):
+        with self.verrou:
+            self.entrees.clear()
+            self.octets = 0
+
+    def metriques(self):
+        with self.verrou:
+            total = self.compteurs["hits"] + self.compteurs["misses"]
+            return {
+                **self.compteurs,
+                "taux_hits": round(self.compteurs["hits"] / total, 4) if total else None,
+                "entrees": len(self.entrees),
+                "octets": self.octets,
+                "max_entrees": self.max_entrees,
+                "max_octets": self.max_octets,
+                "ttl_s": self.ttl_s
+            }
@@ -0,0 +1,134 @@
+"""
+Conversion des CSV d'origine en Parquet ou Arrow IPC (Feather v2), et comparaison des temps
+et de la mémoire de chargement des trois tables du scoring dans chaque format.
+
+Usage :
+    python -m src.conversion <dossier CSV> <dossier de sortie> [--format parquet|arrow]
+    python -m src.conversion <dossier CSV> <dossier de sortie> --comparer
+
+Chaque CSV est lu une seule fois (encodage détecté au préalable) puis écrit avec les types
+déduits par pandas : relu en Parquet / Arrow, il donne le même DataFrame que le CSV, sans
+reparser le texte et en ne lisant que les colonnes utiles. Nécessite pyarrow.
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import pandas as pd
+
+from src.pipeline import (
+    APP_COLONNES_A_CONSERVER,
+    BUREAU_COLONNES_A_CONSERVER,
+    PREV_COLONNES_A_CONSERVER,
+    memoire_mo
+)
+from src.preprocessing import detecter_encodage, lire_table
+
+EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+TABLES_SCORING = {
+    'application_test': APP_COLONNES_A_CONSERVER,
+    'bureau': BUREAU_COLONNES_A_CONSERVER,
+    'previous_application': PREV_COLONNES_A_CONSERVER
+}
+
+# =============================================================================
+# 🔄 CONVERSION
+# =============================================================================
+
+def convertir_fichier(chemin_csv, chemin_sortie, format='parquet'):
+    """Convertit un CSV en Parquet ou Arrow IPC. Retourne le nombre de lignes écrites."""
+    df = pd.read_csv(chemin_csv, encoding=detecter_encodage(chemin_csv), low_memory=False)
+    if format == 'parquet':
+        df.to_parquet(chemin_sortie, index=False)
+    elif format == 'arrow':
+        df.to_feather(chemin_sortie)
+    else:
+        raise ValueError(f"Format inconnu : {format} (attendu : {', '.join(EXTENSIONS)})")
+    return len(df)
+
+
+def convertir_dossier(dossier_csv, dossier_sortie, format='parquet'):
+    """Convertit tous les CSV de `dossier_csv` dans `dossier_sortie`. Retourne les chemins écrits."""
+    os.makedirs(dossier_sortie, exist_ok=True)
+    chemins = []
+    for nom_fichier in sorted(os.listdir(dossier_csv)):
+        if not nom_fichier.endswith('.csv'):
+            continue
+        chemin = os.path.join(dossier_sortie, nom_fichier[:-len('.csv')] + EXTENSIONS[format])
+        n = convertir_fichier(os.path.join(dossier_csv, nom_fichier), chemin, format)
+        print(f"✅ {nom_fichier} → {chemin} ({n} lignes)")
+        chemins.append(chemin)
+    return chemins
+
+# =============================================================================
+# ⏱️ COMPARAISON DES FORMATS
+# =============================================================================
+
+def mesurer_chargement(chemins):
+    """
+    Lit les tables du scoring (colonnes conservées) et retourne la durée, le pic de mémoire
+    résidente ajouté par la lecture (Mo, Linux) et la mémoire des DataFrames obtenus.
+    Exécutée dans un processus neuf pour que le pic ne dépende pas des mesures précédentes.
+    """
+    import pyarrow  # noqa: F401 (import hors mesure)
+
+    avant = pic_memoire_residente()
+    debut = time.perf_counter()
+    tables = {nom: lire_table(chemin, TABLES_SCORING[nom]) for nom, chemin in chemins.items()}
+    duree = time.perf_counter() - debut
+    return duree, (pic_memoire_residente() - avant) / 1024, memoire_mo(*tables.values())
+
+
+def pic_memoire_residente():
+    """Pic de mémoire résidente du processus en ko (VmHWM, Linux)."""
+    with open('/proc/self/status') as f:
+        for ligne in f:
+            if ligne.startswith('VmHWM:'):
+                return int(ligne.split()[1])
+
+
+def comparer_formats(dossier_csv, dossier_sortie):
+    """Convertit les tables du scoring en Parquet et Arrow, puis compare leur chargement à celui des CSV."""
+    os.makedirs(dossier_sortie, exist_ok=True)
+    chemins = {'csv': {nom: os.path.join(dossier_csv, nom + '.csv') for nom in TABLES_SCORING}}
+    for format, extension in EXTENSIONS.items():
+        chemins[format] = {}
+        for nom in TABLES_SCORING:
+            chemin = os.path.join(dossier_sortie, nom + extension)
+            if not os.path.exists(chemin):
+                convertir_fichier(chemins['csv'][nom], chemin, format)
+            chemins[format][nom] = chemin
+
+    references = {nom: lire_table(chemin, TABLES_SCORING[nom]) for nom, chemin in chemins['csv'].items()}
+    for format in EXTENSIONS:
+        for nom, chemin in chemins[format].items():
+            pd.testing.assert_frame_equal(lire_table(chemin, TABLES_SCORING[nom]), references[nom])
+    print("✅ Tables identiques dans les trois formats")
+    del references
+
+    contexte = multiprocessing.get_context('spawn')
+    for format in ['csv', *EXTENSIONS]:
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexte) as pool:
+            duree, pic, memoire = pool.submit(mesurer_chargement, chemins[format]).result()
+        taille = sum(os.path.getsize(c) for c in chemins[format].values()) / 1024 ** 2
+        print(f"⏱️ {format} ({taille:.1f} Mo sur disque) : {duree:.3f}s, pic de mémoire +{pic:.1f} Mo, "
+              f"DataFrames {memoire:.1f} Mo")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversion des CSV en Parquet / Arrow IPC")
+    parser.add_argument("dossier_csv", help="dossier contenant les CSV d'origine")
+    parser.add_argument("dossier_sortie", help="dossier des fichiers convertis")
+    parser.add_argument("--format", choices=list(EXTENSIONS), default='parquet')
+    parser.add_argument("--comparer", action="store_true",
+                        help="compare le chargement des tables du scoring en CSV, Parquet et Arrow")
+    args = parser.parse_args()
+
+    if args.comparer:
+        comparer_formats(args.dossier_csv, args.dossier_sortie)
+    else:
+        convertir_dossier(args.dossier_csv, args.dossier_sortie, args.format)
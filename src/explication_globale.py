@@ -0,0 +1,95 @@
+"""
+Explication globale du modèle calculée hors ligne, une fois par version du modèle, sur une
+population de référence (par défaut application_train) : importance moyenne de chaque
+feature, sens de son effet, quantiles et histogramme de ses contributions SHAP.
+
+Le résultat est enregistré dans models/explication_globale.json, à côté du modèle, avec la
+version du modèle pour laquelle il a été calculé ; l'API le sert tel quel
+(`GET /global-explanation`), sans calcul SHAP sur le lot envoyé.
+
+Usage :
+    python -m src.explication_globale <dossier_donnees> [--table application_train] [--echantillon 20000]
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+from src.modele import DOSSIER_MODELES, ExplicateurNatif, charger_modele, version_modele
+from src.explications import resume_global
+
+NOM_FICHIER_EXPLICATION_GLOBALE = "explication_globale.json"
+ECHANTILLON = 20000
+
+
+def calculer_explication_globale(model, X, version, population, echantillon=ECHANTILLON, graine=0,
+                                 n_intervalles=20):
+    """
+    Valeurs SHAP de `echantillon` clients tirés au hasard dans X (tous si None ou si X est
+    plus petit), résumées pour toutes les features par ordre d'importance décroissante.
+    """
+    if echantillon is not None and len(X) > echantillon:
+        lignes = np.sort(np.random.default_rng(graine).choice(len(X), echantillon, replace=False))
+        X = X.iloc[lignes]
+    explicateur = ExplicateurNatif(model)
+    resume = resume_global(explicateur.shap_values(X), X, k=None, distributions=True, n_intervalles=n_intervalles)
+    return {
+        "version_modele": version,
+        "population": population,
+        "calcule_le": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "valeur_base": explicateur.expected_value,
+        **resume
+    }
+
+
+def sauvegarder_explication_globale(explication, dossier_modeles=DOSSIER_MODELES):
+    chemin = os.path.join(dossier_modeles, NOM_FICHIER_EXPLICATION_GLOBALE)
+    with open(chemin, "w") as f:
+        json.dump(explication, f)
+    return chemin
+
+
+def charger_explication_globale(dossier_modeles=DOSSIER_MODELES):
+    """Explication globale enregistrée dans `dossier_modeles`, ou None si elle n'a pas été calculée."""
+    chemin = os.path.join(dossier_modeles, NOM_FICHIER_EXPLICATION_GLOBALE)
+    if not os.path.exists(chemin):
+        return None
+    with open(chemin) as f:
+        return json.load(f)
+
+
+def extraire(explication, top_k=None, distributions=True):
+    """Les `top_k` premières features de l'explication (toutes si None), avec ou sans distributions."""
+    features = explication["features"][:top_k]
+    if not distributions:
+        features = [
+            {cle: valeur for cle, valeur in feature.items() if cle not in ("quantiles_contribution", "distribution")}
+            for feature in features
+        ]
+    return {**explication, "features": features}
+
+
+if __name__ == "__main__":
+    from src.cache_features import matrice_features
+    from src.preprocessing import chemin_table
+
+    parser = argparse.ArgumentParser(description="Calcule l'explication globale du modèle sur une population de référence")
+    parser.add_argument("dossier_donnees", help="dossier contenant la table application, bureau et previous_application")
+    parser.add_argument("--table", default="application_train", help="table application de la population de référence")
+    parser.add_argument("--echantillon", type=int, default=ECHANTILLON, help="nombre de clients tirés au hasard")
+    args = parser.parse_args()
+
+    debut = time.perf_counter()
+    chemins = [chemin_table(args.dossier_donnees, nom) for nom in [args.table, "bureau", "previous_application"]]
+    _, X, _ = matrice_features(*chemins)
+    explication = calculer_explication_globale(
+        charger_modele(), X, version_modele(),
+        population={"table": os.path.basename(chemins[0]), "nombre_clients_table": len(X)},
+        echantillon=args.echantillon
+    )
+    chemin = sauvegarder_explication_globale(explication)
+    print(f"✅ Explication globale ({explication['nombre_clients']} clients, version {explication['version_modele']}) "
+          f"enregistrée dans {chemin} en {time.perf_counter() - debut:.1f}s")
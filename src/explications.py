@@ -0,0 +1,113 @@
+"""
+Explications SHAP sous forme de données JSON compactes (nombres uniquement), tracées
+ensuite par le dashboard, au lieu d'images PNG rendues par l'API.
+
+- explication locale : valeur de base, k plus fortes contributions du client (avec la
+  valeur de chaque feature) et somme des autres contributions ;
+- résumé global : k features de plus forte contribution moyenne (en valeur absolue) sur
+  le lot, avec le sens de leur effet ; calculé hors ligne sur une population de référence
+  avec les distributions des contributions (cf. src/explication_globale.py).
+
+Les contributions sont en log-odds, comme les valeurs SHAP du modèle :
+valeur de base + somme de toutes les contributions = log(p / (1 - p)).
+"""
+
+import numpy as np
+
+TOP_K = 10
+
+
+def nombre_json(valeur):
+    """Nombre JSON (None pour une valeur manquante ou infinie)."""
+    valeur = float(valeur)
+    return valeur if np.isfinite(valeur) else None
+
+
+def explication_locale(contributions, valeurs, colonnes, valeur_base, k=TOP_K):
+    """
+    Les `k` contributions SHAP les plus fortes (en valeur absolue) d'un client, de la plus
+    forte à la plus faible, avec la valeur de la feature, et la somme des autres.
+    """
+    contributions = np.asarray(contributions, dtype=np.float64)
+    valeurs = np.asarray(valeurs, dtype=np.float64)
+    ordre = np.argsort(-np.abs(contributions), kind="stable")[:k]
+    return {
+        "valeur_base": float(valeur_base),
+        "contributions": [
+            {
+                "feature": str(colonnes[i]),
+                "valeur": nombre_json(valeurs[i]),
+                "contribution": float(contributions[i])
+            }
+            for i in ordre
+        ],
+        "autres_contributions": float(contributions.sum() - contributions[ordre].sum()),
+        "nombre_features": len(contributions)
+    }
+
+
+def resume_global(contributions, X, k=TOP_K, distributions=False, n_intervalles=20):
+    """
+    Les `k` features (toutes si None) de plus forte contribution moyenne absolue sur le lot,
+    avec la corrélation entre la valeur de la feature et sa contribution (sens de l'effet,
+    None si l'une des deux est constante).
+
+    Avec `distributions`, ajoute pour chaque feature les quantiles de ses contributions et leur
+    histogramme (`n_intervalles` intervalles) avec la valeur relative moyenne de la feature
+    dans chaque intervalle (0 : valeurs basses, 1 : valeurs hautes, comme la couleur du
+    summary plot).
+    """
+    contributions = np.asarray(contributions, dtype=np.float64)
+    valeurs = X.to_numpy(dtype=np.float64)
+    importance = np.abs(contributions).mean(axis=0)
+    ordre = np.argsort(-importance, kind="stable")[:k]
+
+    resume = []
+    for i in ordre:
+        v, c = valeurs[:, i], contributions[:, i]
+        presentes = ~np.isnan(v)
+        correlation = None
+        if presentes.sum() > 1 and np.ptp(v[presentes]) > 0 and np.ptp(c[presentes]) > 0:
+            correlation = nombre_json(np.corrcoef(v[presentes], c[presentes])[0, 1])
+        feature = {
+            "feature": str(X.columns[i]),
+            "contribution_moyenne_abs": float(importance[i]),
+            "contribution_moyenne": float(c.mean()),
+            "correlation_valeur_contribution": correlation
+        }
+        if distributions:
+            feature.update(distribution_contributions(c, v, n_intervalles))
+        resume.append(feature)
+    return {"features": resume, "nombre_clients": int(len(contributions))}
+
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def distribution_contributions(contributions, valeurs, n_intervalles=20):
+    """Quantiles des contributions d'une feature et histogramme coloré par la valeur de la feature."""
+    presentes = ~np.isnan(valeurs)
+    bas, haut = (np.percentile(valeurs[presentes], [5, 95]) if presentes.any() else (0.0, 0.0))
+    relatives = np.clip((valeurs - bas) / (haut - bas), 0, 1) if haut > bas else np.full(len(valeurs), 0.5)
+
+    bornes = np.linspace(contributions.min(), contributions.max(), n_intervalles + 1)
+    intervalles = np.clip(np.searchsorted(bornes, contributions, side="right") - 1, 0, n_intervalles - 1)
+    effectifs = np.bincount(intervalles, minlength=n_intervalles)
+    sommes = np.bincount(intervalles[presentes], weights=relatives[presentes], minlength=n_intervalles)
+    presents_par_intervalle = np.bincount(intervalles[presentes], minlength=n_intervalles)
+
+    return {
+        "quantiles_contribution": {
+            f"p{int(q * 100)}": float(x) for q, x in zip(QUANTILES, np.quantile(contributions, QUANTILES))
+        },
+        "distribution": [
+            {
+                "contribution": float((bornes[j] + bornes[j + 1]) / 2),
+                "effectif": int(effectifs[j]),
+                "valeur_relative_moyenne": (
+                    float(sommes[j] / presents_par_intervalle[j]) if presents_par_intervalle[j] else None
+                )
+            }
+            for j in range(n_intervalles) if effectifs[j]
+        ]
+    }
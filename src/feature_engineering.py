@@ -2,45 +2,371 @@ import pandas as pd
 import numpy as np
 
 
-def one_hot_encoder(df, nan_as_category=True):
+def est_categorielle(serie):
+    return serie.dtype == 'object' or isinstance(serie.dtype, pd.CategoricalDtype)
+
+
+def normaliser_categories(df, colonnes, nan_as_category=False):
+    """
+    Prépare les colonnes 'category' pour `pd.get_dummies` afin d'obtenir les mêmes
+    colonnes qu'avec des colonnes 'object' : seules les modalités présentes, triées,
+    et modalités numériques nommées comme des float si NaN devient une catégorie
+    (get_dummies nomme alors '1.0' une modalité 1 de type object).
+    """
+    colonnes = [col for col in colonnes if isinstance(df[col].dtype, pd.CategoricalDtype)]
+    if colonnes:
+        # Copie superficielle : les colonnes sont remplacées sans toucher au DataFrame reçu
+        df = df.copy(deep=False)
+    for col in colonnes:
+        serie = df[col].cat.remove_unused_categories()
+        categories = sorted(serie.cat.categories, key=str)
+        if nan_as_category and pd.api.types.is_numeric_dtype(serie.cat.categories):
+            serie = serie.cat.reorder_categories(categories).cat.rename_categories(lambda v: float(v))
+        else:
+            serie = serie.cat.reorder_categories(categories)
+        df[col] = serie
+    return df
+
+
+def vocabulaire_one_hot(df, nan_as_category=True):
+    """
+    Indicatrices produites par `one_hot_encoder` sur `df` (en général les données
+    d'entraînement), par colonne catégorielle, dans l'ordre de `pd.get_dummies`.
+    """
+    colonnes = [col for col in df.columns if est_categorielle(df[col])]
+    df = normaliser_categories(df[colonnes], colonnes, nan_as_category)
+    return {
+        col: list(pd.get_dummies(df[col], prefix=col, dummy_na=nan_as_category).columns)
+        for col in colonnes
+    }
+
+
+class EncodeurOneHot:
+    """
+    Encodage one-hot à vocabulaire figé à l'entraînement (cf. `vocabulaire_one_hot`) :
+    le code de chaque modalité est écrit directement dans un bloc booléen préalloué, sans
+    `pd.get_dummies`. Les colonnes produites sont celles du vocabulaire quel que soit le
+    lot : une modalité absente du lot garde sa colonne (à 0), une modalité inconnue n'a
+    aucune indicatrice à 1, et un lot d'une ligne ne crée pas de colonnes à réaligner.
+
+    Avec `drop_first=True`, la première indicatrice de chaque colonne (modalité de référence
+    de l'entraînement) est retirée, et non la première modalité présente dans le lot.
+    Les valeurs des indicatrices conservées sont celles de `pd.get_dummies`.
+    """
+
+    def __init__(self, vocabulaire, nan_as_category=True, drop_first=False):
+        self.nan_as_category = nan_as_category
+        self.vocabulaire = {col: list(noms)[1 if drop_first else 0:] for col, noms in vocabulaire.items()}
+        self.colonnes = [nom for noms in self.vocabulaire.values() for nom in noms]
+        positions = iter(range(len(self.colonnes)))
+        self.positions = {col: {nom: next(positions) for nom in noms} for col, noms in self.vocabulaire.items()}
+
+    def _positions(self, serie, col):
+        """Position dans le bloc de l'indicatrice de chaque ligne (-1 si aucune)."""
+        if not isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype('category')
+        categories = serie.cat.categories
+        if self.nan_as_category and pd.api.types.is_numeric_dtype(categories):
+            # get_dummies(dummy_na=True) nomme les modalités numériques en float ('1.0')
+            categories = categories.map(float)
+        positions = self.positions[col]
+        # Dernière case : valeur manquante (code -1)
+        table = np.array(
+            [positions.get(f"{col}_{modalite}", -1) for modalite in categories]
+            + [positions.get(f"{col}_nan", -1) if self.nan_as_category else -1],
+            dtype=np.int64
+        )
+        return table[serie.cat.codes.to_numpy()]
+
+    def transform(self, df):
+        """`df` avec les colonnes du vocabulaire remplacées par leurs indicatrices."""
+        colonnes = [col for col in self.vocabulaire if col in df.columns]
+        bloc = np.zeros((len(df), len(self.colonnes)), dtype=bool)
+        for col in colonnes:
+            positions = self._positions(df[col], col)
+            lignes = np.flatnonzero(positions >= 0)
+            bloc[lignes, positions[lignes]] = True
+        indicatrices = pd.DataFrame(bloc, columns=self.colonnes, index=df.index, copy=False)
+        return pd.concat([df.drop(columns=colonnes), indicatrices], axis=1), list(self.colonnes)
+
+
+def one_hot_encoder(df, nan_as_category=True, vocabulaire=None):
+    """
+    Indicatrices des colonnes catégorielles de `df`. Avec un `vocabulaire` appris à
+    l'entraînement, les colonnes produites ne dépendent pas du lot (`EncodeurOneHot`) ;
+    sans, `pd.get_dummies` encode les modalités présentes.
+    """
+    if vocabulaire is not None:
+        return EncodeurOneHot(vocabulaire, nan_as_category).transform(df)
     original_columns = list(df.columns)
-    categorical_columns = [col for col in df.columns if df[col].dtype == 'object']
+    categorical_columns = [col for col in df.columns if est_categorielle(df[col])]
+    df = normaliser_categories(df, categorical_columns, nan_as_category)
     df = pd.get_dummies(df, columns=categorical_columns, dummy_na=nan_as_category)
     new_columns = [c for c in df.columns if c not in original_columns]
     return df, new_columns
 
 
-def feature_engineering_bureau(bureau_df):
-    bureau_df, bureau_cat = one_hot_encoder(bureau_df)
+# =============================================================================
+# ⚡ NOYAU D'AGRÉGATION PAR SEGMENTS
+# =============================================================================
 
-    num_agg = {
-        'DAYS_CREDIT': ['min', 'max', 'mean', 'var'],
-        'DAYS_CREDIT_ENDDATE': ['min', 'max', 'mean'],
-        'DAYS_CREDIT_UPDATE': ['mean'],
-        'CREDIT_DAY_OVERDUE': ['max', 'mean'],
-        'AMT_CREDIT_SUM': ['max', 'mean', 'sum'],
-        'AMT_CREDIT_SUM_DEBT': ['max', 'mean', 'sum'],
-        'AMT_CREDIT_SUM_LIMIT': ['mean', 'sum'],
-        'AMT_CREDIT_SUM_OVERDUE': ['mean'],
-        'CNT_CREDIT_PROLONG': ['sum']
-    }
+# Équivalent de `df.groupby('SK_ID_CURR').agg(agregations)` : les lignes sont triées une
+# seule fois par client (tri stable, l'ordre des lignes d'un client est conservé), puis
+# rangées « par rang » dans une matrice numpy contiguë par type de colonne (float32 après
+# reduire_types, entiers, booléens) : d'abord la 1re ligne de chaque client, puis la 2e
+# ligne des clients qui en ont au moins deux, etc., les clients étant classés du plus
+# grand nombre de lignes au plus petit. Au rang k, les lignes de tous les clients encore
+# actifs forment donc un bloc contigu, combiné d'un coup (clients × colonnes) aux
+# accumulateurs de ces clients, qui forment eux aussi un préfixe. Le nombre d'étapes est
+# la taille du plus grand segment.
+#
+# Les résultats (valeurs et types) sont ceux de pandas :
+# - min / max : NaN ignorés, type d'origine conservé ;
+# - colonnes entières ou booléennes : sommes exactes (dans le type d'origine si elles y
+#   tiennent toutes, sinon en 64 bits, comme pandas), mean / var en float64 ;
+# - colonnes flottantes : sommation compensée (Kahan) pour sum / mean et algorithme de
+#   Welford pour var, dans le type de la colonne, comme les noyaux groupby de pandas.
+
+def tri_stable(cles):
+    """
+    `np.argsort(cles, kind='stable')`. Pour des clés entières, tri par base 2**16 en
+    partant des chiffres de poids faible : chaque passe est un tri stable de uint16,
+    nettement plus rapide qu'un tri stable d'entiers 64 bits.
+    """
+    if not np.issubdtype(cles.dtype, np.integer) or len(cles) == 0:
+        return np.argsort(cles, kind='stable')
+    decalees = cles.astype(np.int64) - np.int64(cles.min())
+    etendue = int(decalees.max())
+    if etendue < 0:
+        # Étendue dépassant int64
+        return np.argsort(cles, kind='stable')
+    decalees = decalees.astype(np.uint64)
+    ordre = np.arange(len(cles))
+    for decalage in range(0, max(etendue.bit_length(), 1), 16):
+        chiffres = ((decalees[ordre] >> np.uint64(decalage)) & np.uint64(0xFFFF)).astype(np.uint16)
+        ordre = ordre[np.argsort(chiffres, kind='stable')]
+    return ordre
+
+
+class Segments:
+    """Segments de lignes par client et ordre « par rang » des lignes."""
+
+    def __init__(self, cles):
+        ordre = tri_stable(cles)
+        cles_triees = cles[ordre]
+        nouveau_client = np.ones(len(cles), dtype=bool)
+        nouveau_client[1:] = cles_triees[1:] != cles_triees[:-1]
+        debuts = np.flatnonzero(nouveau_client)
+        self.tailles = np.diff(np.r_[debuts, len(cles)])
+        self.cles = cles_triees[debuts]
+
+        # Clients du plus grand nombre de lignes au plus petit
+        self.ordre_segments = tri_stable(self.tailles.max(initial=0) - self.tailles)
+        debuts_par_taille = debuts[self.ordre_segments]
+        taille_max = self.tailles.max() if len(self.tailles) else 0
+        # Nombre de clients ayant plus de k lignes, pour chaque rang k
+        self.actifs_par_rang = np.searchsorted(-self.tailles[self.ordre_segments], -np.arange(taille_max))
+
+        # Position dans les données d'origine de chaque ligne rangée par rang
+        self.ordre = ordre[np.concatenate(
+            [debuts_par_taille[:m] + k for k, m in enumerate(self.actifs_par_rang)]
+        )] if taille_max else ordre
+
+    def rangs(self):
+        """Pour chaque rang k : nombre m de clients actifs et tranche de leurs lignes."""
+        debut = 0
+        for m in self.actifs_par_rang:
+            yield m, slice(debut, debut + m)
+            debut += m
+
+    def remettre_en_ordre(self, valeurs):
+        """Passe de l'ordre des clients par taille à l'ordre des clients."""
+        resultat = np.empty_like(valeurs, order='K')
+        resultat[self.ordre_segments] = valeurs
+        return resultat
+
+
+def type_somme_entiere(somme, dtype):
+    """
+    Type de `sum` pour une colonne entière ou booléenne, comme pandas : le type entier
+    d'origine si toutes les sommes y tiennent, sinon int64 (uint64 pour un type non signé).
+    """
+    if not np.issubdtype(dtype, np.integer):
+        return np.int64
+    limites = np.iinfo(dtype)
+    if somme.size == 0 or (somme.min() >= limites.min and somme.max() <= limites.max):
+        return dtype
+    return np.uint64 if np.issubdtype(dtype, np.unsignedinteger) else np.int64
+
+
+def reduire_segments(segments, valeurs, fonctions):
+    """
+    Calcule, pour chaque segment et chaque colonne de `valeurs`
+    (lignes rangées par rang, cf. `Segments`), les statistiques demandées parmi
+    'min', 'max', 'sum', 'mean' et 'var'.
+    """
+    forme = (len(segments.cles), valeurs.shape[1])
+    # Accumulateurs rangés par colonne, comme `valeurs`
+    zeros = lambda dtype: np.zeros(forme, dtype=dtype, order='F')
+    entiere = not np.issubdtype(valeurs.dtype, np.floating)
+    type_calcul = np.float64 if entiere else valeurs.dtype
+    avec_nan = not entiere and bool(np.isnan(valeurs).any())
+    extremes_demandes = bool(fonctions & {'min', 'max'})
+    somme_demandee = bool(fonctions & {'sum', 'mean'})
+    var_demandee = 'var' in fonctions
+
+    # Sommes entières exactes (int32 suffit pour compter des booléens)
+    type_somme = np.int32 if valeurs.dtype == bool else np.int64
+    minimum = maximum = None
+    somme = zeros(type_somme if entiere else type_calcul)
+    compensation = zeros(type_calcul)
+    moyenne = zeros(type_calcul)
+    ssqdm = zeros(type_calcul)
+    # Sans NaN, l'effectif d'un segment est sa taille
+    effectifs = zeros(np.int64) if avec_nan else None
+
+    with np.errstate(invalid='ignore'):
+        for k, (m, lignes) in enumerate(segments.rangs()):
+            v = valeurs[lignes]
+            if extremes_demandes:
+                if k == 0:
+                    # Rang 0 : tous les segments sont actifs
+                    minimum, maximum = v.copy(order='F'), v.copy(order='F')
+                else:
+                    np.fmin(minimum[:m], v, out=minimum[:m])
+                    np.fmax(maximum[:m], v, out=maximum[:m])
+
+            if avec_nan:
+                presente = ~np.isnan(v)
+                effectifs[:m] += presente
+                n = effectifs[:m]
+            else:
+                n = k + 1
+
+            if somme_demandee:
+                if entiere:
+                    np.add(somme[:m], v, out=somme[:m])
+                else:
+                    y = v - compensation[:m]
+                    t = somme[:m] + y
+                    c = (t - somme[:m]) - y
+                    # Valeur infinie : compensation NaN remise à 0, comme dans pandas
+                    c[np.isnan(c)] = 0
+                    if avec_nan:
+                        t = np.where(presente, t, somme[:m])
+                        c = np.where(presente, c, compensation[:m])
+                    somme[:m], compensation[:m] = t, c
+
+            if var_demandee:
+                x = v.astype(type_calcul, copy=False)
+                ancienne = moyenne[:m]
+                diviseur = np.maximum(n, 1).astype(type_calcul) if avec_nan else type_calcul(n)
+                nouvelle = ancienne + (x - ancienne) / diviseur
+                carres = ssqdm[:m] + (x - nouvelle) * (x - ancienne)
+                if avec_nan:
+                    nouvelle = np.where(presente, nouvelle, ancienne)
+                    carres = np.where(presente, carres, ssqdm[:m])
+                moyenne[:m], ssqdm[:m] = nouvelle, carres
+
+    if avec_nan:
+        effectifs = segments.remettre_en_ordre(effectifs)
+    else:
+        effectifs = np.broadcast_to(segments.tailles[:, None], forme)
+
+    resultats = {}
+    if extremes_demandes:
+        if minimum is None:
+            minimum = maximum = np.empty(forme, dtype=valeurs.dtype, order='F')
+        resultats['min'] = segments.remettre_en_ordre(minimum)
+        resultats['max'] = segments.remettre_en_ordre(maximum)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if somme_demandee:
+            somme = segments.remettre_en_ordre(somme)
+            if entiere:
+                # Sommes exactes en 64 bits : le type de sortie est choisi colonne par colonne
+                # par `type_somme_entiere`
+                resultats['sum'] = somme.astype(np.int64, copy=False)
+                resultats['mean'] = somme / effectifs
+            else:
+                resultats['sum'] = somme
+                resultats['mean'] = np.where(effectifs > 0, somme / effectifs.astype(type_calcul), np.nan).astype(type_calcul)
+        if var_demandee:
+            variance = segments.remettre_en_ordre(ssqdm) / (effectifs - 1).astype(type_calcul)
+            resultats['var'] = np.where(effectifs > 1, variance, np.nan).astype(type_calcul)
+    return resultats
+
+
+def agreger_par_client(df, agregations, cle='SK_ID_CURR'):
+    """
+    Calcule `df.groupby(cle).agg(agregations)` (agregations : colonne → liste de 'min',
+    'max', 'mean', 'var', 'sum') avec le noyau par segments. Retourne le même DataFrame :
+    index `cle` trié, colonnes (colonne, fonction) dans l'ordre du dictionnaire.
+    """
+    segments = Segments(df[cle].to_numpy())
+
+    # Colonnes regroupées par type pour travailler sur des matrices contiguës
+    par_type = {}
+    for col in agregations:
+        par_type.setdefault(df[col].dtype, []).append(col)
+
+    resultats = {}
+    for dtype, colonnes in par_type.items():
+        # Matrice rangée par colonne, remplie colonne par colonne (un seul parcours)
+        valeurs = np.empty((len(segments.ordre), len(colonnes)), dtype=dtype, order='F')
+        for j, col in enumerate(colonnes):
+            np.take(df[col].to_numpy(), segments.ordre, out=valeurs[:, j])
+        calculs = reduire_segments(segments, valeurs, {f for col in colonnes for f in agregations[col]})
+        for j, col in enumerate(colonnes):
+            for f in agregations[col]:
+                resultat = calculs[f][:, j]
+                if f == 'sum' and not np.issubdtype(dtype, np.floating):
+                    resultat = resultat.astype(type_somme_entiere(resultat, dtype))
+                resultats[(col, f)] = resultat
+
+    colonnes_sortie = [(col, f) for col, fonctions in agregations.items() for f in fonctions]
+    return pd.DataFrame(
+        {c: resultats[c] for c in colonnes_sortie},
+        index=pd.Index(segments.cles, name=cle),
+        columns=pd.MultiIndex.from_tuples(colonnes_sortie)
+    )
+
+
+# Agrégations numériques par client (SK_ID_CURR)
+AGREGATIONS_BUREAU = {
+    'DAYS_CREDIT': ['min', 'max', 'mean', 'var'],
+    'DAYS_CREDIT_ENDDATE': ['min', 'max', 'mean'],
+    'DAYS_CREDIT_UPDATE': ['mean'],
+    'CREDIT_DAY_OVERDUE': ['max', 'mean'],
+    'AMT_CREDIT_SUM': ['max', 'mean', 'sum'],
+    'AMT_CREDIT_SUM_DEBT': ['max', 'mean', 'sum'],
+    'AMT_CREDIT_SUM_LIMIT': ['mean', 'sum'],
+    'AMT_CREDIT_SUM_OVERDUE': ['mean'],
+    'CNT_CREDIT_PROLONG': ['sum']
+}
+
+AGREGATIONS_PREVIOUS_COLONNES = [
+    'AMT_ANNUITY', 'AMT_APPLICATION', 'AMT_CREDIT',
+    'AMT_GOODS_PRICE', 'APP_CREDIT_PERC', 'HOUR_APPR_PROCESS_START',
+    'DAYS_DECISION', 'CNT_PAYMENT'
+]
+
+
+def feature_engineering_bureau(bureau_df, vocabulaire=None):
+    bureau_df, bureau_cat = one_hot_encoder(bureau_df, vocabulaire=vocabulaire)
+
+    num_agg = AGREGATIONS_BUREAU
     cat_agg = {cat: ['mean'] for cat in bureau_cat}
 
-    bureau_agg = bureau_df.groupby('SK_ID_CURR').agg({**num_agg, **cat_agg})
+    bureau_agg = agreger_par_client(bureau_df, {**num_agg, **cat_agg})
     bureau_agg.columns = pd.Index(['BURO_' + e[0] + '_' + e[1].upper() for e in bureau_agg.columns.tolist()])
     return bureau_agg.reset_index()
 
 
-def feature_engineering_previous(previous_df):
-    previous_df, prev_cat = one_hot_encoder(previous_df)
+def feature_engineering_previous(previous_df, vocabulaire=None):
+    previous_df, prev_cat = one_hot_encoder(previous_df, vocabulaire=vocabulaire)
 
     # Vérifier l'existence des colonnes avant agrégation
-    num_agg_cols = [
-        'AMT_ANNUITY', 'AMT_APPLICATION', 'AMT_CREDIT',
-        'AMT_GOODS_PRICE', 'APP_CREDIT_PERC', 'HOUR_APPR_PROCESS_START',
-        'DAYS_DECISION', 'CNT_PAYMENT'
-    ]
-    num_agg = {col: ['min', 'max', 'mean'] for col in num_agg_cols if col in previous_df.columns}
+    num_agg = {col: ['min', 'max', 'mean'] for col in AGREGATIONS_PREVIOUS_COLONNES if col in previous_df.columns}
 
     # Ajouter les colonnes spécifiques si elles existent
     if 'AMT_DOWN_PAYMENT' in previous_df.columns:
@@ -53,18 +379,69 @@ def feature_engineering_previous(previous_df):
 
     cat_agg = {cat: ['mean'] for cat in prev_cat}
 
-    previous_agg = previous_df.groupby('SK_ID_CURR').agg({**num_agg, **cat_agg})
+    previous_agg = agreger_par_client(previous_df, {**num_agg, **cat_agg})
     previous_agg.columns = pd.Index(['PREV_' + e[0] + '_' + e[1].upper() for e in previous_agg.columns.tolist()])
     return previous_agg.reset_index()
 
 
-def fusionner_et_agreger_donnees(application_df, bureau_df, previous_df):
-    # Feature engineering
-    bureau_agg = feature_engineering_bureau(bureau_df)
-    previous_agg = feature_engineering_previous(previous_df)
-
-    # Fusion
+def fusionner_agregats(application_df, bureau_agg, previous_agg):
+    """Ajoute à application les agrégats bureau et previous_application de chaque client."""
     application_df = application_df.merge(bureau_agg, how='left', on='SK_ID_CURR')
     application_df = application_df.merge(previous_agg, how='left', on='SK_ID_CURR')
 
     return application_df
+
+
+def fusionner_et_agreger_donnees(application_df, bureau_df, previous_df, modalites=None):
+    """
+    Agrège bureau et previous_application par client et les fusionne avec application.
+    `modalites` : vocabulaires one-hot appris à l'entraînement ('bureau', 'previous').
+    """
+    modalites = modalites or {}
+    # Feature engineering
+    bureau_agg = feature_engineering_bureau(bureau_df, modalites.get('bureau'))
+    previous_agg = feature_engineering_previous(previous_df, modalites.get('previous'))
+
+    # Fusion
+    return fusionner_agregats(application_df, bureau_agg, previous_agg)
+
+
+if __name__ == "__main__":
+    # Usage : python -m src.feature_engineering <dossier contenant application_test.csv, bureau.csv, previous_application.csv> [nrows]
+    # Compare le temps de `groupby().agg()` et du noyau par segments, et vérifie que les agrégats sont identiques.
+    import os
+    import sys
+    import time
+
+    from src.pipeline import pretraiter
+
+    dossier_donnees = sys.argv[1]
+    nrows = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    tables = [
+        pd.read_csv(os.path.join(dossier_donnees, nom), nrows=nrows)
+        for nom in ["application_test.csv", "bureau.csv", "previous_application.csv"]
+    ]
+    _, bureau_df, previous_df = pretraiter(*tables, categoriel=True)
+
+    bureau_df, bureau_cat = one_hot_encoder(bureau_df)
+    previous_df, prev_cat = one_hot_encoder(previous_df)
+    previous_df['APP_CREDIT_PERC'] = previous_df['AMT_APPLICATION'] / previous_df['AMT_CREDIT']
+    cas = [
+        ("bureau", bureau_df, {**AGREGATIONS_BUREAU, **{cat: ['mean'] for cat in bureau_cat}}),
+        ("previous_application", previous_df, {
+            **{col: ['min', 'max', 'mean'] for col in AGREGATIONS_PREVIOUS_COLONNES if col in previous_df.columns},
+            **{cat: ['mean'] for cat in prev_cat}
+        }),
+    ]
+
+    for nom, df, agregations in cas:
+        debut = time.perf_counter()
+        attendu = df.groupby('SK_ID_CURR').agg(agregations)
+        duree_pandas = time.perf_counter() - debut
+        debut = time.perf_counter()
+        obtenu = agreger_par_client(df, agregations)
+        duree_segments = time.perf_counter() - debut
+        pd.testing.assert_frame_equal(obtenu, attendu, check_exact=True)
+        print(f"⏱️ {nom} ({len(df)} lignes, {len(agregations)} colonnes) : groupby {duree_pandas:.3f}s, "
+              f"segments {duree_segments:.3f}s (x{duree_pandas / duree_segments:.1f})")
+    print("✅ Agrégats identiques")
@@ -0,0 +1,214 @@
+"""
+Inférence compilée du modèle LightGBM : les arbres du booster sont extraits une fois de son
+format texte en tableaux numpy plats (variable, seuil, fils gauche / droit de chaque nœud,
+valeur de chaque feuille), puis un lot de clients est évalué de façon vectorisée, sans
+passer par predict_proba ni par la validation d'un DataFrame.
+
+Deux moteurs, mêmes probabilités que `predict_proba` (écart < 1e-6, cf. `ecart_maximal`) :
+- "booster" (`BoosterContigu`, utilisé par l'API) : le booster LightGBM appelé directement
+  sur une matrice numpy contiguë ;
+- "foret" (`ForetCompilee`) : parcours numpy de tous les arbres à la fois, niveau par
+  niveau, en numpy seul. Plus lent que le booster (2 à 3 fois sur ce modèle), il sert de
+  référence indépendante du code de prédiction de LightGBM.
+
+Usage (banc d'essai) :
+    python -m src.inference [--tailles 1 100 100000]
+"""
+
+import argparse
+import time
+import numpy as np
+from scipy import sparse
+
+from src.modele import booster_natif, matrice_contigue, predire_probas
+
+# Valeur considérée comme nulle par LightGBM (type de valeur manquante "Zero")
+SEUIL_ZERO = 1e-35
+# Nombre de couples (client, arbre) parcourus ensemble par ForetCompilee
+TAILLE_BLOC = 1 << 18
+
+
+def lire_arbres(texte_modele):
+    """Tableaux plats de chaque arbre (section Tree=... du format texte LightGBM)."""
+    arbres, arbre = [], None
+    for ligne in texte_modele.splitlines():
+        if ligne.startswith("Tree="):
+            arbre = {}
+            arbres.append(arbre)
+        elif ligne in ("end of trees", ""):
+            if ligne == "end of trees":
+                break
+        elif arbre is not None and "=" in ligne:
+            cle, _, valeur = ligne.partition("=")
+            arbre[cle] = valeur
+    return arbres
+
+
+class ForetCompilee:
+    """
+    Forêt du booster en tableaux numpy plats : tous les nœuds internes de tous les arbres
+    à la suite (variable, seuil, type de valeur manquante, sens par défaut, fils), toutes les
+    feuilles à la suite. Un fils c < 0 désigne la feuille ~c de la forêt.
+    """
+
+    def __init__(self, model):
+        booster = booster_natif(model)
+        texte = booster.model_to_string()
+        if "objective=binary sigmoid:1" not in texte:
+            raise ValueError("Forêt compilée : seul l'objectif binary (sigmoid:1) est supporté")
+
+        variables, seuils, types, defaut_gauche, gauches, droits, feuilles, racines = [], [], [], [], [], [], [], []
+        n_noeuds = n_feuilles = 0
+        for arbre in lire_arbres(texte):
+            valeurs = np.array(arbre["leaf_value"].split(), dtype=np.float64)
+            if int(arbre["num_leaves"]) == 1:
+                racines.append(~n_feuilles)
+            else:
+                decisions = np.array(arbre["decision_type"].split(), dtype=np.int64)
+                if (decisions & 1).any():
+                    raise ValueError("Forêt compilée : les splits catégoriels ne sont pas supportés")
+                variables.append(np.array(arbre["split_feature"].split(), dtype=np.int64))
+                seuils.append(np.array(arbre["threshold"].split(), dtype=np.float64))
+                types.append((decisions >> 2) & 3)
+                defaut_gauche.append((decisions & 2) > 0)
+                for fils, sortie in ((arbre["left_child"], gauches), (arbre["right_child"], droits)):
+                    fils = np.array(fils.split(), dtype=np.int64)
+                    # Indices locaux à l'arbre → indices dans la forêt
+                    sortie.append(np.where(fils >= 0, fils + n_noeuds, ~(~fils + n_feuilles)))
+                racines.append(n_noeuds)
+                n_noeuds += len(decisions)
+            feuilles.append(valeurs)
+            n_feuilles += len(valeurs)
+
+        concatener = lambda tableaux, dtype: np.concatenate(tableaux).astype(dtype) if tableaux else np.empty(0, dtype)
+        self.variables = concatener(variables, np.int64)
+        self.seuils = concatener(seuils, np.float64)
+        self.types_manquant = concatener(types, np.int8)
+        self.defaut_gauche = concatener(defaut_gauche, bool)
+        self.gauches = concatener(gauches, np.int64)
+        self.droits = concatener(droits, np.int64)
+        self.valeurs_feuilles = np.concatenate(feuilles)
+        self.racines = np.array(racines, dtype=np.int64)
+        self.num_feature = booster.num_feature()
+        # Types de valeur manquante présents (0 : None, 1 : Zero, 2 : NaN)
+        self.manquants = set(np.unique(self.types_manquant).tolist())
+
+    def _aller_a_gauche(self, valeurs, noeuds):
+        seuils = self.seuils[noeuds]
+        if self.manquants == {0}:
+            # Type None : une valeur manquante est traitée comme 0
+            return np.where(np.isnan(valeurs), 0.0, valeurs) <= seuils
+        types = self.types_manquant[noeuds]
+        nan = np.isnan(valeurs)
+        valeurs = np.where(nan & (types != 2), 0.0, valeurs)
+        manquante = ((types == 1) & (np.abs(valeurs) <= SEUIL_ZERO)) | ((types == 2) & nan)
+        return np.where(manquante, self.defaut_gauche[noeuds], valeurs <= seuils)
+
+    def sorties_brutes(self, X):
+        """Somme des valeurs des feuilles atteintes (log-odds) pour chaque ligne de X."""
+        X = matrice_contigue(X)
+        creuse = sparse.issparse(X)
+        if not creuse:
+            X = np.ascontiguousarray(X, dtype=np.float64)
+        n_arbres = len(self.racines)
+        lignes_par_bloc = max(1, TAILLE_BLOC // n_arbres)
+        sorties = np.empty(X.shape[0])
+        for debut in range(0, X.shape[0], lignes_par_bloc):
+            bloc = X[debut:debut + lignes_par_bloc]
+            if creuse:
+                # Matrice creuse densifiée bloc par bloc
+                bloc = np.ascontiguousarray(bloc.toarray(), dtype=np.float64)
+            plat = bloc.ravel()
+            noeuds = np.tile(self.racines, len(bloc))
+            # Position de la ligne du couple (client, arbre) dans la matrice aplatie
+            decalages = np.repeat(np.arange(len(bloc)) * self.num_feature, n_arbres)
+            actifs = np.flatnonzero(noeuds >= 0)
+            while actifs.size:
+                courants = noeuds[actifs]
+                valeurs = plat[decalages[actifs] + self.variables[courants]]
+                suivants = np.where(
+                    self._aller_a_gauche(valeurs, courants), self.gauches[courants], self.droits[courants]
+                )
+                noeuds[actifs] = suivants
+                actifs = actifs[suivants >= 0]
+            sorties[debut:debut + len(bloc)] = self.valeurs_feuilles[~noeuds].reshape(len(bloc), n_arbres).sum(axis=1)
+        return sorties
+
+    def predict(self, X):
+        """Probabilité de la classe 1 (sigmoïde des log-odds)."""
+        return 1 / (1 + np.exp(-self.sorties_brutes(X)))
+
+
+class BoosterContigu:
+    """
+    Booster LightGBM appelé sur une matrice numpy contiguë (sans DataFrame ni wrapper scikit-learn).
+    `num_threads` : threads OpenMP par appel (0 : valeur par défaut de LightGBM, tous les cœurs).
+    """
+
+    def __init__(self, model, num_threads=0):
+        self.booster = booster_natif(model)
+        self.num_threads = num_threads
+
+    def predict(self, X):
+        return self.booster.predict(matrice_contigue(X), num_threads=self.num_threads)
+
+
+MOTEURS_INFERENCE = {"booster": BoosterContigu, "foret": ForetCompilee}
+
+
+def creer_moteur_inference(model, moteur="booster", num_threads=0):
+    """
+    Moteur d'inférence du modèle : objet avec une méthode `predict(X)` → probabilités.
+    `num_threads` ne concerne que le booster (la forêt compilée est évaluée en numpy).
+    """
+    if moteur not in MOTEURS_INFERENCE:
+        raise ValueError(f"Moteur d'inférence inconnu : {moteur} ({', '.join(MOTEURS_INFERENCE)})")
+    if moteur == "booster":
+        return BoosterContigu(model, num_threads)
+    return MOTEURS_INFERENCE[moteur](model)
+
+
+def ecart_maximal(model, X, moteur):
+    """Écart maximal entre les probabilités de `moteur` et celles de predict_proba."""
+    return float(np.max(np.abs(moteur.predict(X) - predire_probas(model, X))))
+
+
+def chronometrer(fonction, repetitions):
+    fonction()
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) / repetitions
+
+
+if __name__ == "__main__":
+    import pickle
+    import pandas as pd
+
+    from src.modele import DOSSIER_MODELES, NOM_FICHIER_MODELE
+
+    parser = argparse.ArgumentParser(description="Compare les moteurs d'inférence du modèle")
+    parser.add_argument("--tailles", type=int, nargs="+", default=[1, 100, 100000])
+    args = parser.parse_args()
+
+    with open(f"{DOSSIER_MODELES}/{NOM_FICHIER_MODELE}", "rb") as f:
+        classifieur = pickle.load(f)
+    booster = booster_natif(classifieur)
+    debut = time.perf_counter()
+    foret = ForetCompilee(booster)
+    print(f"Forêt compilée : {len(foret.racines)} arbres, {len(foret.seuils)} nœuds, "
+          f"{len(foret.valeurs_feuilles)} feuilles, en {time.perf_counter() - debut:.2f}s")
+    moteurs = {"foret": foret, "booster": BoosterContigu(booster)}
+
+    rng = np.random.default_rng(0)
+    for taille in args.tailles:
+        X = pd.DataFrame(rng.normal(size=(taille, booster.num_feature())) * 1000, columns=booster.feature_name())
+        X = X.mask(rng.random(X.shape) < 0.1)
+        repetitions = max(1, min(200, 20000 // taille))
+        reference = chronometrer(lambda: classifieur.predict_proba(X)[:, 1], repetitions)
+        print(f"\n{taille} clients : predict_proba(DataFrame) {reference * 1000:.3f} ms")
+        for nom, moteur in moteurs.items():
+            matrice = X.to_numpy(dtype=np.float32)
+            duree = chronometrer(lambda: moteur.predict(matrice), repetitions)
+            print(f"  {nom:<8} {duree * 1000:10.3f} ms  (x{reference / duree:.1f}, "
+                  f"écart max {ecart_maximal(classifieur, X.astype(np.float32), moteur):.1e})")
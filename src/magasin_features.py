@@ -0,0 +1,273 @@
+"""
+Magasin de features : agrégats bureau / previous_application (BURO_*, PREV_*) précalculés
+par client et stockés dans une base SQLite indexée par SK_ID_CURR.
+
+Les historiques bureau et previous_application changent rarement et sont communs à de
+nombreux appels de scoring d'un même client : l'API peut alors ne recevoir que
+application_test et lire les agrégats dans le magasin au lieu de les recalculer.
+
+Mises à jour incrémentales : les lignes brutes reçues sont conservées (une ligne par
+SK_ID_BUREAU / SK_ID_PREV, une ligne déjà connue étant remplacée), et seuls les clients
+concernés par de nouvelles lignes voient leurs agrégats recalculés, à partir de toutes
+leurs lignes. Le prétraitement utilise les paramètres du préprocesseur ajusté : les
+agrégats d'un client ne dépendent que de ses propres lignes, ils sont donc identiques à
+ceux que calcule `fusionner_et_agreger_donnees` sur un lot contenant ces lignes.
+
+Usage :
+    python -m src.magasin_features <dossier_donnees> [--base chemin.sqlite] [--chunksize N]
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+
+from src.modele import DOSSIER_MODELES
+from src.pipeline import (
+    preparer_bureau,
+    preparer_previous,
+    BUREAU_COLONNES_A_CONSERVER,
+    PREV_COLONNES_A_CONSERVER
+)
+from src.feature_engineering import feature_engineering_bureau, feature_engineering_previous
+from src.preprocesseur import charger_preprocesseur
+from src.batch_scoring import types_lecture, CHUNKSIZE
+from src.preprocessing import chemin_table, lire_par_morceaux
+
+NOM_FICHIER_MAGASIN = "magasin_features.sqlite"
+
+# Nombre maximal d'identifiants par requête `IN (...)`
+TAILLE_REQUETE = 500
+
+# Pour chaque source : colonnes brutes conservées, identifiant d'une ligne,
+# préparation et agrégation par client
+SOURCES = {
+    'bureau': (BUREAU_COLONNES_A_CONSERVER, 'SK_ID_BUREAU', preparer_bureau, feature_engineering_bureau),
+    'previous': (PREV_COLONNES_A_CONSERVER, 'SK_ID_PREV', preparer_previous, feature_engineering_previous),
+}
+
+
+def nom_sql(colonne):
+    return '"' + colonne.replace('"', '""') + '"'
+
+
+class MagasinFeatures:
+    """
+    Agrégats par client de chaque source, stockés comme vecteurs float64 dans l'ordre de
+    la table `colonnes`. Une colonne apparue après l'enregistrement d'un client (nouvelle
+    modalité d'une variable catégorielle) vaut 0 pour ce client, comme la moyenne d'une
+    indicatrice qu'il n'a jamais prise.
+    """
+
+    def __init__(self, chemin, preprocesseur):
+        if preprocesseur is None:
+            raise ValueError("Le magasin de features nécessite le préprocesseur ajusté (models/preprocesseur.pkl)")
+        self.preprocesseur = preprocesseur
+        self.connexion = sqlite3.connect(chemin, check_same_thread=False)
+        self.verrou = threading.Lock()
+
+        with self.connexion:
+            self.connexion.execute(
+                "CREATE TABLE IF NOT EXISTS colonnes (source TEXT, position INTEGER, nom TEXT, "
+                "PRIMARY KEY (source, position))"
+            )
+            for source, (colonnes, cle_ligne, _, _) in SOURCES.items():
+                self.connexion.execute(
+                    f"CREATE TABLE IF NOT EXISTS lignes_{source} ({', '.join(map(nom_sql, colonnes))})"
+                )
+                self.connexion.execute(
+                    f"CREATE UNIQUE INDEX IF NOT EXISTS lignes_{source}_ligne ON lignes_{source} ({cle_ligne})"
+                )
+                self.connexion.execute(
+                    f"CREATE INDEX IF NOT EXISTS lignes_{source}_client ON lignes_{source} (SK_ID_CURR)"
+                )
+                self.connexion.execute(
+                    f"CREATE TABLE IF NOT EXISTS agregats_{source} (SK_ID_CURR INTEGER PRIMARY KEY, valeurs BLOB NOT NULL)"
+                )
+
+        self.colonnes = {
+            source: [nom for (nom,) in self.connexion.execute(
+                "SELECT nom FROM colonnes WHERE source = ? ORDER BY position", (source,)
+            )]
+            for source in SOURCES
+        }
+
+    # -------------------------------------------------------------------------
+    # Mise à jour
+    # -------------------------------------------------------------------------
+
+    def mettre_a_jour(self, df_bureau=None, df_prev=None):
+        """
+        Ajoute (ou remplace) des lignes brutes bureau / previous_application et recalcule
+        les agrégats des clients concernés. Retourne le nombre de clients mis à jour par source.
+        """
+        mis_a_jour = {}
+        with self.verrou, self.connexion:
+            for source, df in [('bureau', df_bureau), ('previous', df_prev)]:
+                if df is None or df.empty:
+                    continue
+                df = self._normaliser_lignes(source, df)
+                ids_clients = df['SK_ID_CURR'].unique()
+                connus = self._clients_connus(source, ids_clients)
+                self._enregistrer_lignes(source, df)
+                # Clients nouveaux : leurs lignes sont celles reçues ; clients connus : toutes leurs lignes
+                nouveaux = ~df['SK_ID_CURR'].isin(connus).to_numpy()
+                lignes = df.take(np.flatnonzero(nouveaux)).astype(self._types(source, df))
+                if len(connus):
+                    # Tables vides écartées (pd.concat les signale : FutureWarning sur le type résultant)
+                    tables = [t for t in (lignes, self._lire_lignes(source, connus)) if len(t)]
+                    if tables:
+                        lignes = pd.concat(tables, ignore_index=True)
+                self._enregistrer_agregats(source, self._agreger(source, lignes))
+                mis_a_jour[source] = len(ids_clients)
+        return mis_a_jour
+
+    def _normaliser_lignes(self, source, df):
+        colonnes, cle_ligne, _, _ = SOURCES[source]
+        return df.reindex(columns=colonnes).drop_duplicates(cle_ligne, keep='last')
+
+    def _clients_connus(self, source, ids_clients):
+        return np.array([
+            cle
+            for ids in self._par_paquets(ids_clients)
+            for (cle,) in self.connexion.execute(
+                f"SELECT SK_ID_CURR FROM agregats_{source} WHERE SK_ID_CURR IN ({', '.join('?' * len(ids))})",
+                [int(i) for i in ids]
+            )
+        ], dtype=np.int64)
+
+    def _enregistrer_lignes(self, source, df):
+        # Une ligne déjà connue est remplacée (et passe après les autres lignes du client)
+        colonnes = SOURCES[source][0]
+        valeurs = df.astype(object)
+        valeurs = valeurs.where(df.notna(), None)
+        self.connexion.executemany(
+            f"INSERT OR REPLACE INTO lignes_{source} ({', '.join(map(nom_sql, colonnes))}) "
+            f"VALUES ({', '.join('?' * len(colonnes))})",
+            valeurs.itertuples(index=False, name=None)
+        )
+
+    def _lire_lignes(self, source, ids_clients):
+        """Toutes les lignes brutes des clients, dans l'ordre d'enregistrement."""
+        colonnes = SOURCES[source][0]
+        morceaux = [
+            pd.read_sql_query(
+                f"SELECT {', '.join(map(nom_sql, colonnes))} FROM lignes_{source} "
+                f"WHERE SK_ID_CURR IN ({', '.join('?' * len(ids))}) ORDER BY rowid",
+                self.connexion, params=[int(i) for i in ids]
+            )
+            for ids in self._par_paquets(ids_clients)
+        ]
+        df = pd.concat(morceaux, ignore_index=True)
+        return df.astype(self._types(source, df))
+
+    def _types(self, source, df):
+        """Mêmes types qu'à la lecture des CSV : une colonne entièrement vide est un float."""
+        types = types_lecture(self.preprocesseur.parametres[source])
+        for col in df.columns:
+            if col not in types and df[col].dtype == object and df[col].isna().all():
+                types[col] = 'float64'
+        return types
+
+    def _agreger(self, source, df):
+        _, _, preparer, agreger = SOURCES[source]
+        parametres = self.preprocesseur.parametres[source]
+        df, _ = preparer(df, parametres, categoriel=True)
+        return agreger(df, parametres.get('modalites'))
+
+    def _enregistrer_agregats(self, source, agregats):
+        colonnes = self.colonnes[source]
+        nouvelles = [col for col in agregats.columns if col != 'SK_ID_CURR' and col not in colonnes]
+        self.connexion.executemany(
+            "INSERT INTO colonnes (source, position, nom) VALUES (?, ?, ?)",
+            [(source, len(colonnes) + i, nom) for i, nom in enumerate(nouvelles)]
+        )
+        colonnes.extend(nouvelles)
+
+        valeurs = agregats.reindex(columns=colonnes, fill_value=0).to_numpy(dtype=np.float64)
+        self.connexion.executemany(
+            f"INSERT OR REPLACE INTO agregats_{source} (SK_ID_CURR, valeurs) VALUES (?, ?)",
+            zip(agregats['SK_ID_CURR'].astype(int).tolist(), map(np.ndarray.tobytes, valeurs))
+        )
+
+    # -------------------------------------------------------------------------
+    # Lecture
+    # -------------------------------------------------------------------------
+
+    def lire(self, ids_clients):
+        """
+        Agrégats bureau et previous_application des clients demandés (mêmes colonnes que
+        `feature_engineering_bureau` / `feature_engineering_previous`). Les clients absents
+        du magasin n'ont pas de ligne, comme un client sans historique.
+        """
+        with self.verrou:
+            return tuple(self._lire_agregats(source, ids_clients) for source in SOURCES)
+
+    def _lire_agregats(self, source, ids_clients):
+        colonnes = self.colonnes[source]
+        lignes = [
+            ligne
+            for ids in self._par_paquets(pd.unique(np.asarray(ids_clients, dtype=np.int64)))
+            for ligne in self.connexion.execute(
+                f"SELECT SK_ID_CURR, valeurs FROM agregats_{source} WHERE SK_ID_CURR IN ({', '.join('?' * len(ids))})",
+                [int(i) for i in ids]
+            )
+        ]
+        valeurs = np.zeros((len(lignes), len(colonnes)))
+        for i, (_, blob) in enumerate(lignes):
+            vecteur = np.frombuffer(blob, dtype=np.float64)
+            valeurs[i, :len(vecteur)] = vecteur
+
+        agregats = pd.DataFrame(valeurs, columns=colonnes)
+        agregats.insert(0, 'SK_ID_CURR', np.array([cle for cle, _ in lignes], dtype=np.int64))
+        return agregats
+
+    def nombre_clients(self):
+        with self.verrou:
+            return {
+                source: self.connexion.execute(f"SELECT COUNT(*) FROM agregats_{source}").fetchone()[0]
+                for source in SOURCES
+            }
+
+    @staticmethod
+    def _par_paquets(ids_clients):
+        for debut in range(0, len(ids_clients), TAILLE_REQUETE):
+            yield ids_clients[debut:debut + TAILLE_REQUETE]
+
+    def fermer(self):
+        self.connexion.close()
+
+
+def charger_magasin(dossier_modeles, preprocesseur):
+    """Ouvre le magasin de `dossier_modeles` s'il existe et si le préprocesseur est disponible, sinon None."""
+    chemin = os.path.join(dossier_modeles, NOM_FICHIER_MAGASIN)
+    if preprocesseur is None or not os.path.exists(chemin):
+        return None
+    return MagasinFeatures(chemin, preprocesseur)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alimente le magasin de features à partir de bureau.csv et previous_application.csv.")
+    parser.add_argument("dossier_donnees", help="Dossier contenant bureau et previous_application (.parquet, .arrow ou .csv)")
+    parser.add_argument("--base", default=os.path.join(DOSSIER_MODELES, NOM_FICHIER_MAGASIN))
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="Lignes lues par morceau")
+    args = parser.parse_args()
+
+    preprocesseur = charger_preprocesseur(DOSSIER_MODELES)
+    magasin = MagasinFeatures(args.base, preprocesseur)
+    for source, nom_table in [('bureau', "bureau"), ('previous', "previous_application")]:
+        lecteur = lire_par_morceaux(
+            chemin_table(args.dossier_donnees, nom_table), SOURCES[source][0], args.chunksize,
+            types_lecture(preprocesseur.parametres[source])
+        )
+        for morceau in lecteur:
+            magasin.mettre_a_jour(**{'df_bureau' if source == 'bureau' else 'df_prev': morceau})
+
+    print(f"✅ Magasin de features {args.base} : {magasin.nombre_clients()} clients")
+    magasin.fermer()
+
+
+if __name__ == "__main__":
+    main()
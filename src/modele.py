@@ -0,0 +1,270 @@
+import os
+import sys
+import hashlib
+import pickle
+import threading
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+DOSSIER_MODELES = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "models"))
+
+NOM_FICHIER_MODELE = "best_model_lightgbm.pkl"
+# Booster LightGBM natif (format texte), exporté depuis le modèle picklé
+NOM_FICHIER_BOOSTER = "best_model_lightgbm.txt"
+
+# Seuil optimal choisi lors de l'entraînement (score métier)
+SEUIL_DECISION = 0.14
+
+# Calcul des valeurs SHAP : "natif" (contributions LightGBM, sans shap) ou "shap" (TreeExplainer)
+MOTEUR_EXPLICATION = "natif"
+# Calcul des probabilités servies : "booster" (matrice contiguë) ou "foret" (numpy), cf. src/inference.py
+MOTEUR_INFERENCE = "booster"
+
+
+def chemin_modele(dossier_modeles=DOSSIER_MODELES):
+    """Fichier du modèle servi : le booster natif s'il a été exporté, sinon le modèle picklé."""
+    chemin_booster = os.path.join(dossier_modeles, NOM_FICHIER_BOOSTER)
+    if os.path.exists(chemin_booster):
+        return chemin_booster
+    return os.path.join(dossier_modeles, NOM_FICHIER_MODELE)
+
+
+def version_modele(dossier_modeles=DOSSIER_MODELES):
+    """Version du modèle servi : empreinte (sha256, 16 caractères) de son fichier."""
+    with open(chemin_modele(dossier_modeles), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def charger_modele(dossier_modeles=DOSSIER_MODELES):
+    """
+    Charge le booster LightGBM natif s'il a été exporté (pas de désérialisation du
+    modèle scikit-learn), sinon le modèle picklé. Les probabilités sont identiques.
+    """
+    chemin = chemin_modele(dossier_modeles)
+    if chemin.endswith(".txt"):
+        import lightgbm as lgb
+        return lgb.Booster(model_file=chemin)
+    with open(chemin, "rb") as f:
+        return pickle.load(f)
+
+
+def charger_colonnes(dossier_modeles=DOSSIER_MODELES):
+    """Liste des colonnes utilisées par le modèle et leurs types."""
+    colonnes_utiles = joblib.load(os.path.join(dossier_modeles, "columns_used.pkl"))
+    colonnes_types = joblib.load(os.path.join(dossier_modeles, "columns_dtypes.pkl"))
+    return colonnes_utiles, colonnes_types
+
+
+def charger_artefacts(dossier_modeles=DOSSIER_MODELES):
+    """
+    Charge le modèle LightGBM, la liste des colonnes utilisées et leurs types.
+    """
+    model = charger_modele(dossier_modeles)
+    colonnes_utiles, colonnes_types = charger_colonnes(dossier_modeles)
+    return model, colonnes_utiles, colonnes_types
+
+
+def booster_natif(model):
+    """Booster LightGBM du modèle (le modèle lui-même s'il est déjà natif)."""
+    return getattr(model, "booster_", model)
+
+
+def matrice_contigue(X):
+    """
+    Matrice numpy contiguë des features (float32 si toutes les colonnes le sont, float64
+    sinon, comme la conversion d'un DataFrame par LightGBM), sans copie si X l'est déjà.
+    Une matrice creuse est passée en CSR, format lu directement par LightGBM.
+    """
+    if sparse.issparse(X):
+        X = X.tocsr()
+        return X if X.dtype in (np.float32, np.float64) else X.astype(np.float64)
+    if isinstance(X, pd.DataFrame):
+        float32 = all(dtype == np.float32 for dtype in X.dtypes)
+        X = X.to_numpy(dtype=np.float32 if float32 else np.float64)
+    X = np.asarray(X)
+    if X.dtype not in (np.float32, np.float64):
+        X = X.astype(np.float64)
+    return np.ascontiguousarray(X)
+
+
+def predire_probas(model, X):
+    """
+    Probabilité de la classe 1, pour un LGBMClassifier comme pour un booster natif
+    (appelé sur une matrice contiguë, sans validation du DataFrame).
+    """
+    if hasattr(model, "predict_proba"):
+        return model.predict_proba(X)[:, 1]
+    return model.predict(matrice_contigue(X))
+
+
+def scorer(model, ids_clients, X):
+    """Calcule les probabilités et les décisions pour chaque client de X."""
+    probas = predire_probas(model, X)
+    y_pred = (probas >= SEUIL_DECISION).astype(int)
+
+    return pd.DataFrame({
+        "SK_ID_CURR": ids_clients,
+        "Score_proba": probas,
+        "Decision": y_pred
+    })
+
+
+class ModeleServi:
+    """
+    Modèle et explicateur SHAP chargés à la demande (une seule fois, même si plusieurs
+    requêtes arrivent en même temps), avec les durées de chargement de chaque étape.
+
+    Le modèle peut être chargé en arrière-plan au démarrage de l'API ; l'explicateur
+    (cf. `creer_explicateur`) attend la première explication.
+
+    `threads_lightgbm` : threads OpenMP de chaque appel LightGBM du moteur d'inférence et de
+    l'explicateur natif (0 : tous les cœurs, valeur par défaut de LightGBM).
+    """
+
+    def __init__(self, dossier_modeles=DOSSIER_MODELES, moteur_explication=MOTEUR_EXPLICATION,
+                 moteur_inference=MOTEUR_INFERENCE, threads_lightgbm=0):
+        self.dossier_modeles = dossier_modeles
+        self.moteur_explication = moteur_explication
+        self.moteur_inference = moteur_inference
+        self.threads_lightgbm = threads_lightgbm
+        self.verrou = threading.Lock()
+        self.creation = time.perf_counter()
+        self.pret_apres = None
+        self.durees = {}
+        self.format = None
+        self._version = None
+        self._model = None
+        self._explainer = None
+        self._moteur = None
+
+    def mesurer(self, etape, fonction):
+        """Exécute `fonction` et enregistre sa durée sous le nom `etape`."""
+        debut = time.perf_counter()
+        resultat = fonction()
+        self.durees[etape] = round(time.perf_counter() - debut, 4)
+        return resultat
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self.verrou:
+                if self._model is None:
+                    model = self.mesurer("modele", lambda: charger_modele(self.dossier_modeles))
+                    self.format = "pickle" if hasattr(model, "predict_proba") else "booster natif"
+                    self._version = version_modele(self.dossier_modeles)
+                    self._model = model
+                    self.pret_apres = round(time.perf_counter() - self.creation, 4)
+        return self._model
+
+    @property
+    def explainer(self):
+        if self._explainer is None:
+            model = self.model
+            with self.verrou:
+                if self._explainer is None:
+                    self._explainer = self.mesurer(
+                        "explicateur", lambda: creer_explicateur(model, self.moteur_explication, self.threads_lightgbm)
+                    )
+        return self._explainer
+
+    @property
+    def moteur(self):
+        """Moteur d'inférence (`predict(X)` → probabilités), cf. src/inference.py."""
+        if self._moteur is None:
+            from src.inference import creer_moteur_inference
+
+            model = self.model
+            with self.verrou:
+                if self._moteur is None:
+                    self._moteur = creer_moteur_inference(model, self.moteur_inference, self.threads_lightgbm)
+        return self._moteur
+
+    @property
+    def version(self):
+        """Version du modèle servi (chargé si besoin), cf. `version_modele`."""
+        self.model
+        return self._version
+
+    @property
+    def pret(self):
+        return self._model is not None
+
+    def metriques(self):
+        return {
+            "pret": self.pret,
+            "format_modele": self.format,
+            "version_modele": self._version,
+            "explicateur_charge": self._explainer is not None,
+            "moteur_explication": self.moteur_explication,
+            "moteur_inference": self.moteur_inference,
+            "threads_lightgbm": self.threads_lightgbm,
+            "pret_apres_s": self.pret_apres,
+            "durees_chargement_s": dict(self.durees)
+        }
+
+
+class ExplicateurNatif:
+    """
+    Valeurs SHAP exactes (TreeSHAP) calculées par LightGBM lui-même avec
+    `predict(..., pred_contrib=True)` : mêmes valeurs que shap.TreeExplainer, sans importer
+    shap ni reconstruire les arbres. Même interface (`expected_value`, `shap_values`) que
+    le TreeExplainer d'un booster natif : une ligne de contributions (log-odds) par client.
+    """
+
+    def __init__(self, model, num_threads=0):
+        self.booster = booster_natif(model)
+        self.num_threads = num_threads
+        # Dernière colonne des contributions : valeur de base, identique pour toutes les lignes
+        ligne = np.zeros((1, self.booster.num_feature()))
+        self.expected_value = float(self.booster.predict(ligne, pred_contrib=True)[0, -1])
+
+    def shap_values(self, X, lignes=None):
+        """Contributions des lignes `lignes` de X (toutes si None), sans la valeur de base."""
+        if lignes is not None:
+            X = X.iloc[lignes] if hasattr(X, "iloc") else X[lignes]
+        return self.booster.predict(X, pred_contrib=True, num_threads=self.num_threads)[:, :-1]
+
+
+def creer_explicateur(model, moteur=MOTEUR_EXPLICATION, num_threads=0):
+    if moteur == "natif":
+        return ExplicateurNatif(model, num_threads)
+    import shap
+    return shap.TreeExplainer(model)
+
+
+def ecart_explicateurs(model, X):
+    """Écart maximal entre les valeurs SHAP natives et celles de shap.TreeExplainer sur X."""
+    import shap
+    reference = shap.TreeExplainer(booster_natif(model))
+    natif = ExplicateurNatif(model)
+    return max(
+        float(np.abs(natif.shap_values(X) - reference.shap_values(X)).max()),
+        abs(natif.expected_value - float(reference.expected_value))
+    )
+
+
+def exporter_booster(dossier_modeles=DOSSIER_MODELES):
+    """Exporte le booster du modèle picklé au format texte natif de LightGBM."""
+    with open(os.path.join(dossier_modeles, NOM_FICHIER_MODELE), "rb") as f:
+        model = pickle.load(f)
+    chemin = os.path.join(dossier_modeles, NOM_FICHIER_BOOSTER)
+    booster_natif(model).save_model(chemin)
+    return chemin
+
+
+if __name__ == "__main__":
+    # Usage : python -m src.modele [dossier_modeles]
+    # Exporte le booster puis vérifie que ses contributions natives sont celles de shap.TreeExplainer.
+    dossier_modeles = sys.argv[1] if len(sys.argv) > 1 else DOSSIER_MODELES
+    chemin = exporter_booster(dossier_modeles)
+    print(f"✅ Booster LightGBM exporté dans {chemin}")
+
+    booster = charger_modele(dossier_modeles)
+    X = pd.DataFrame(
+        np.random.default_rng(0).normal(size=(200, booster.num_feature())) * 1000,
+        columns=booster.feature_name()
+    )
+    print(f"✅ Valeurs SHAP natives / shap.TreeExplainer : écart maximal {ecart_explicateurs(booster, X):.2e}")
@@ -0,0 +1,428 @@
+# =============================================================================
+# 📁 IMPORTS
+# =============================================================================
+
+import threading
+from collections import Counter
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.preprocessing import (
+    calculer_valeurs_imputation,
+    imputer_valeurs_manquantes,
+    convertir_binaires_en_object,
+    reduire_types,
+    nettoyer_colonnes_categorielles_application,
+    nettoyer_colonnes_categorielles_bureau,
+    nettoyer_colonnes_categorielles_previous,
+    SEUILS_MODALITES_RARES_PREVIOUS
+)
+from src.feature_engineering import (
+    fusionner_et_agreger_donnees,
+    fusionner_agregats,
+    est_categorielle,
+    normaliser_categories,
+    EncodeurOneHot
+)
+
+# =============================================================================
+# 📋 COLONNES UTILISÉES
+# =============================================================================
+
+APP_COLONNES_A_CONSERVER = [
+    'AMT_ANNUITY', 'AMT_CREDIT', 'AMT_GOODS_PRICE', 'AMT_INCOME_TOTAL',
+    'AMT_REQ_CREDIT_BUREAU_DAY', 'AMT_REQ_CREDIT_BUREAU_HOUR', 'AMT_REQ_CREDIT_BUREAU_MON',
+    'AMT_REQ_CREDIT_BUREAU_QRT', 'AMT_REQ_CREDIT_BUREAU_WEEK', 'AMT_REQ_CREDIT_BUREAU_YEAR',
+    'CNT_CHILDREN', 'CNT_FAM_MEMBERS', 'CODE_GENDER', 'DAYS_BIRTH', 'DAYS_EMPLOYED',
+    'DAYS_ID_PUBLISH', 'DAYS_LAST_PHONE_CHANGE', 'DAYS_REGISTRATION',
+    'DEF_30_CNT_SOCIAL_CIRCLE', 'DEF_60_CNT_SOCIAL_CIRCLE', 'EXT_SOURCE_2', 'EXT_SOURCE_3',
+    'FLAG_CONT_MOBILE', 'FLAG_DOCUMENT_10', 'FLAG_DOCUMENT_11', 'FLAG_DOCUMENT_12',
+    'FLAG_DOCUMENT_13', 'FLAG_DOCUMENT_14', 'FLAG_DOCUMENT_15', 'FLAG_DOCUMENT_16',
+    'FLAG_DOCUMENT_17', 'FLAG_DOCUMENT_18', 'FLAG_DOCUMENT_19', 'FLAG_DOCUMENT_2',
+    'FLAG_DOCUMENT_20', 'FLAG_DOCUMENT_21', 'FLAG_DOCUMENT_3', 'FLAG_DOCUMENT_4',
+    'FLAG_DOCUMENT_5', 'FLAG_DOCUMENT_6', 'FLAG_DOCUMENT_7', 'FLAG_DOCUMENT_8',
+    'FLAG_DOCUMENT_9', 'FLAG_EMAIL', 'FLAG_EMP_PHONE', 'FLAG_MOBIL', 'FLAG_OWN_CAR',
+    'FLAG_OWN_REALTY', 'FLAG_PHONE', 'FLAG_WORK_PHONE', 'HOUR_APPR_PROCESS_START',
+    'LIVE_CITY_NOT_WORK_CITY', 'LIVE_REGION_NOT_WORK_REGION', 'NAME_CONTRACT_TYPE',
+    'NAME_EDUCATION_TYPE', 'NAME_FAMILY_STATUS', 'NAME_HOUSING_TYPE', 'NAME_INCOME_TYPE',
+    'NAME_TYPE_SUITE', 'OBS_30_CNT_SOCIAL_CIRCLE', 'OBS_60_CNT_SOCIAL_CIRCLE',
+    'OCCUPATION_TYPE', 'ORGANIZATION_TYPE', 'REGION_POPULATION_RELATIVE',
+    'REGION_RATING_CLIENT', 'REGION_RATING_CLIENT_W_CITY', 'REG_CITY_NOT_LIVE_CITY',
+    'REG_CITY_NOT_WORK_CITY', 'REG_REGION_NOT_LIVE_REGION', 'REG_REGION_NOT_WORK_REGION',
+    'SK_ID_CURR', 'WEEKDAY_APPR_PROCESS_START'
+]
+
+APP_COLONNES_A_CONVERTIR_EN_INT = [
+    'CNT_FAM_MEMBERS', 'OBS_30_CNT_SOCIAL_CIRCLE', 'DEF_30_CNT_SOCIAL_CIRCLE',
+    'OBS_60_CNT_SOCIAL_CIRCLE', 'DEF_60_CNT_SOCIAL_CIRCLE',
+    'AMT_REQ_CREDIT_BUREAU_HOUR', 'AMT_REQ_CREDIT_BUREAU_DAY',
+    'AMT_REQ_CREDIT_BUREAU_WEEK', 'AMT_REQ_CREDIT_BUREAU_MON',
+    'AMT_REQ_CREDIT_BUREAU_QRT', 'AMT_REQ_CREDIT_BUREAU_YEAR'
+]
+
+BUREAU_COLONNES_A_CONSERVER = [
+    'AMT_CREDIT_SUM', 'AMT_CREDIT_SUM_DEBT', 'AMT_CREDIT_SUM_LIMIT',
+    'AMT_CREDIT_SUM_OVERDUE', 'CNT_CREDIT_PROLONG', 'CREDIT_ACTIVE',
+    'CREDIT_CURRENCY', 'CREDIT_DAY_OVERDUE', 'CREDIT_TYPE', 'DAYS_CREDIT',
+    'DAYS_CREDIT_ENDDATE', 'DAYS_CREDIT_UPDATE', 'DAYS_ENDDATE_FACT',
+    'SK_ID_BUREAU', 'SK_ID_CURR'
+]
+
+PREV_COLONNES_A_CONSERVER = [
+    'AMT_ANNUITY', 'AMT_APPLICATION', 'AMT_CREDIT', 'AMT_GOODS_PRICE',
+    'CHANNEL_TYPE', 'CNT_PAYMENT', 'CODE_REJECT_REASON', 'DAYS_DECISION',
+    'DAYS_FIRST_DRAWING', 'DAYS_FIRST_DUE', 'DAYS_LAST_DUE', 'DAYS_LAST_DUE_1ST_VERSION',
+    'DAYS_TERMINATION', 'FLAG_LAST_APPL_PER_CONTRACT', 'HOUR_APPR_PROCESS_START',
+    'NAME_CASH_LOAN_PURPOSE', 'NAME_CLIENT_TYPE', 'NAME_CONTRACT_STATUS',
+    'NAME_CONTRACT_TYPE', 'NAME_GOODS_CATEGORY', 'NAME_PAYMENT_TYPE',
+    'NAME_PORTFOLIO', 'NAME_PRODUCT_TYPE', 'NAME_SELLER_INDUSTRY',
+    'NAME_YIELD_GROUP', 'NFLAG_INSURED_ON_APPROVAL', 'NFLAG_LAST_APPL_IN_DAY',
+    'PRODUCT_COMBINATION', 'SELLERPLACE_AREA', 'SK_ID_CURR', 'SK_ID_PREV',
+    'WEEKDAY_APPR_PROCESS_START'
+]
+
+PREV_COLONNES_A_CONVERTIR_INT = [
+    'CNT_PAYMENT', 'DAYS_DECISION', 'SELLERPLACE_AREA',
+    'NFLAG_LAST_APPL_IN_DAY', 'NFLAG_MICRO_CASH', 'NFLAG_INSURED_ON_APPROVAL'
+]
+
+# =============================================================================
+# 🧩 PRÉTRAITEMENT PAR TABLE
+# =============================================================================
+
+# Chaque fonction prend en entrée des `parametres` appris à l'entraînement
+# (cf. src/preprocesseur.py). S'ils sont absents, ils sont calculés sur `df`
+# lui-même, comme avant, et retournés pour pouvoir être sauvegardés.
+#
+# Mode `categoriel=True` : la sélection des colonnes est la seule copie des données,
+# toutes les étapes suivantes modifient ce DataFrame sur place, et les chaînes de
+# caractères comme les colonnes binaires sont gardées en 'category' au lieu d'objets
+# Python. Les features construites sont identiques à celles du mode par défaut.
+
+def selectionner_colonnes(df, colonnes, categoriel=False):
+    """
+    Garde les `colonnes` de `df`. En mode catégoriel, le résultat est une copie
+    modifiable sur place et les colonnes texte sont converties en 'category'.
+    """
+    if not categoriel:
+        return df[colonnes]
+
+    manquantes = [col for col in colonnes if col not in df.columns]
+    if manquantes:
+        raise KeyError(f"{manquantes} not in index")
+    df = df.reindex(columns=colonnes)
+    for col in colonnes:
+        if df[col].dtype == 'object':
+            df[col] = df[col].astype('category')
+    return df
+
+
+def convertir_types(df, types, copie=True):
+    """`df.astype(types)`, ou conversion colonne par colonne sur place avec `copie=False`."""
+    if copie:
+        return df.astype(types)
+    for col, dtype in types.items():
+        df[col] = df[col].astype(dtype)
+    return df
+
+
+def preparer_application(df, parametres=None, categoriel=False):
+    """
+    Prétraite application_{train|test} : sélection des colonnes, imputation,
+    conversions de types et regroupement des modalités.
+
+    Retourne le DataFrame prétraité + les paramètres utilisés.
+    """
+    copie = not categoriel
+    df = selectionner_colonnes(df, APP_COLONNES_A_CONSERVER, categoriel)
+    if parametres is None:
+        parametres = {'imputations': calculer_valeurs_imputation(df)}
+    df, _ = imputer_valeurs_manquantes(df, parametres['imputations'], copie=copie)
+    df = convertir_types(df, {col: int for col in APP_COLONNES_A_CONVERTIR_EN_INT}, copie)
+
+    df, colonnes_binaires = convertir_binaires_en_object(
+        df, colonnes=parametres.get('colonnes_binaires'), categoriel=categoriel, copie=copie
+    )
+    parametres.setdefault('colonnes_binaires', colonnes_binaires)
+    df = nettoyer_colonnes_categorielles_application(df, copie=copie)
+    df, _ = reduire_types(df, copie=copie)
+    return df, parametres
+
+
+def preparer_bureau(df, parametres=None, categoriel=False):
+    """
+    Prétraite bureau : sélection des colonnes, imputation, conversions de types
+    et regroupement des modalités.
+
+    Retourne le DataFrame prétraité + les paramètres utilisés.
+    """
+    copie = not categoriel
+    df = selectionner_colonnes(df, BUREAU_COLONNES_A_CONSERVER, categoriel)
+    if parametres is None:
+        parametres = {'imputations': calculer_valeurs_imputation(df)}
+    df, _ = imputer_valeurs_manquantes(df, parametres['imputations'], copie=copie)
+    df = convertir_types(df, {'DAYS_CREDIT_ENDDATE': 'int32', 'DAYS_ENDDATE_FACT': 'int32'}, copie)
+    df = nettoyer_colonnes_categorielles_bureau(df, copie=copie)
+    df, _ = reduire_types(df, copie=copie)
+    return df, parametres
+
+
+def preparer_previous(df, parametres=None, categoriel=False):
+    """
+    Prétraite previous_application : sélection des colonnes, imputation, conversions
+    de types et regroupement des modalités (y compris les modalités rares).
+
+    Retourne le DataFrame prétraité + les paramètres utilisés.
+    """
+    copie = not categoriel
+    df = selectionner_colonnes(df, PREV_COLONNES_A_CONSERVER, categoriel)
+    if parametres is None:
+        parametres = {'imputations': calculer_valeurs_imputation(df)}
+    df, _ = imputer_valeurs_manquantes(df, parametres['imputations'], copie=copie)
+
+    colonnes_int = [col for col in PREV_COLONNES_A_CONVERTIR_INT if col in df.columns]
+    if copie:
+        df = df.fillna({col: 0 for col in colonnes_int})
+    else:
+        df.fillna({col: 0 for col in colonnes_int}, inplace=True)
+    df = convertir_types(df, {col: int for col in colonnes_int}, copie)
+
+    df, colonnes_binaires = convertir_binaires_en_object(
+        df, colonnes=parametres.get('colonnes_binaires'), categoriel=categoriel, copie=copie
+    )
+    parametres.setdefault('colonnes_binaires', colonnes_binaires)
+
+    df = nettoyer_colonnes_categorielles_previous(df, parametres.get('modalites_frequentes'), copie=copie)
+    if 'modalites_frequentes' not in parametres:
+        parametres['modalites_frequentes'] = {
+            col: sorted(df[col].dropna().unique()) for col in SEUILS_MODALITES_RARES_PREVIOUS
+        }
+    df, _ = reduire_types(df, copie=copie)
+    return df, parametres
+
+
+def pretraiter(df_app, df_bureau, df_prev, preprocesseur=None, categoriel=False):
+    """
+    Prétraite les trois tables. Si un `preprocesseur` ajusté est fourni,
+    ses paramètres appris sont appliqués ; sinon ils sont calculés sur le lot.
+    """
+    if preprocesseur is not None:
+        return preprocesseur.transform(df_app, df_bureau, df_prev, categoriel=categoriel)
+
+    df_app, _ = preparer_application(df_app, categoriel=categoriel)
+    df_bureau, _ = preparer_bureau(df_bureau, categoriel=categoriel)
+    df_prev, _ = preparer_previous(df_prev, categoriel=categoriel)
+    return df_app, df_bureau, df_prev
+
+
+def memoire_mo(*dfs):
+    """Mémoire occupée par des DataFrames (objets Python compris), en Mo."""
+    return sum(df.memory_usage(deep=True).sum() for df in dfs) / 1024 ** 2
+
+# =============================================================================
+# 🧮 CONSTRUCTION DE LA MATRICE DU MODÈLE
+# =============================================================================
+
+def completer_par_zero(df):
+    """
+    `df.fillna(0)` sur place. Une colonne 'category' n'est complétée que si elle a des
+    valeurs manquantes, après ajout de la modalité 0 si besoin.
+    """
+    colonnes_categorielles = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+    if not colonnes_categorielles:
+        df.fillna(0, inplace=True)
+        return df
+
+    valeurs = dict.fromkeys(df.columns.difference(colonnes_categorielles), 0)
+    for col in colonnes_categorielles:
+        serie = df[col]
+        if serie.isna().any():
+            if 0 not in serie.cat.categories:
+                df[col] = serie.cat.add_categories([0])
+            valeurs[col] = 0
+    df.fillna(valeurs, inplace=True)
+    return df
+
+
+def construire_features(df_app, df_bureau, df_prev, drop_first=True, modalites=None):
+    """
+    Agrège bureau et previous_application par client, fusionne avec application
+    puis encode les colonnes catégorielles restantes.
+
+    Avec `drop_first=False`, toutes les modalités sont encodées : l'alignement sur les
+    colonnes du modèle retire alors la modalité de référence de l'entraînement, quel que
+    soit le contenu du lot (utile pour scorer des blocs de clients séparément).
+
+    Avec `modalites` (vocabulaires appris à l'entraînement, cf. `PreprocesseurCredit.modalites`),
+    les indicatrices sont celles du vocabulaire quel que soit le lot, et `drop_first` retire
+    la modalité de référence de l'entraînement.
+    """
+    df = fusionner_et_agreger_donnees(df_app, df_bureau, df_prev, modalites)
+    return finaliser_features(df, drop_first, modalites)
+
+
+def construire_features_depuis_agregats(df_app, bureau_agg, previous_agg, drop_first=True, modalites=None):
+    """
+    Comme `construire_features`, à partir d'agrégats bureau / previous_application
+    déjà calculés (par exemple lus dans le magasin de features, cf. src/magasin_features.py).
+    """
+    df = fusionner_agregats(df_app, bureau_agg, previous_agg)
+    return finaliser_features(df, drop_first, modalites)
+
+
+def finaliser_features(df, drop_first=True, modalites=None):
+    """Complète les valeurs manquantes, nettoie les noms de colonnes et encode les catégories."""
+    completer_par_zero(df)
+    df.columns = df.columns.str.strip().str.replace('[^A-Za-z0-9_]+', '_', regex=True)
+    if modalites is not None:
+        encodeur = EncodeurOneHot(modalites['application'], nan_as_category=False, drop_first=drop_first)
+        return encodeur.transform(df)[0]
+    colonnes_categorielles = [col for col in df.columns if est_categorielle(df[col])]
+    df = normaliser_categories(df, colonnes_categorielles)
+    return pd.get_dummies(df, columns=colonnes_categorielles, drop_first=drop_first)
+
+
+class SchemaFeatures:
+    """
+    Schéma compilé des features du modèle (columns_used.pkl / columns_dtypes.pkl) : position
+    de chaque colonne dans la matrice X, et colonnes indicatrices de modalités (booléennes).
+
+    `aligner` remplit en une seule passe une matrice float64 préallouée, chaque colonne de
+    `df` étant copiée directement à sa position, au lieu d'un reindex suivi d'un astype par
+    colonne. Les valeurs sont celles de `reindex(fill_value=0)` + `astype` ; seule la
+    représentation change (un seul bloc float64, converti tel quel par LightGBM).
+
+    Les colonnes de `df` inconnues du modèle (ignorées) et les colonnes du modèle absentes
+    de `df` (remplies avec 0) sont comptées dans `metriques` : une modalité absente du lot
+    est normale, une variable absente ou une colonne inconnue signale un écart de schéma.
+    """
+
+    def __init__(self, colonnes_utiles, colonnes_types):
+        self.colonnes = pd.Index(colonnes_utiles)
+        self.index = {col: i for i, col in enumerate(colonnes_utiles)}
+        self.indicatrices = np.array([
+            pd.api.types.is_bool_dtype(colonnes_types.get(col, float)) for col in colonnes_utiles
+        ])
+        self.verrou = threading.Lock()
+        self.compteurs = {"alignements": 0, "lignes": 0}
+        self.inconnues = Counter()
+        # Nombre d'alignements où chaque colonne du modèle était absente
+        self.absences = np.zeros(len(self.colonnes), dtype=np.int64)
+
+    def aligner(self, df, creuse=False):
+        """
+        Identifiants clients et matrice X (colonnes du modèle, dans son ordre).
+
+        Avec `creuse=True`, X est une matrice scipy.sparse CSR float64 (mêmes valeurs, zéros
+        non stockés), construite colonne par colonne sans matrice dense intermédiaire.
+        """
+        if creuse:
+            return df["SK_ID_CURR"], self._aligner_creuse(df)
+        # Ordre Fortran : chaque colonne copiée est contiguë, et le DataFrame la garde sans copie
+        X = np.zeros((len(df), len(self.colonnes)), dtype=np.float64, order="F")
+        for i, serie in self._colonnes_connues(df):
+            X[:, i] = serie.to_numpy(dtype=np.float64)
+        return df["SK_ID_CURR"], pd.DataFrame(X, columns=self.colonnes, index=df.index, copy=False)
+
+    def _aligner_creuse(self, df):
+        # Deux passes sur les colonnes, dans l'ordre du modèle : nombre de valeurs non nulles
+        # de chaque ligne, puis écriture directe dans les tableaux CSR préalloués (indices de
+        # colonnes triés dans chaque ligne). Pic mémoire : la matrice CSR et quelques vecteurs.
+        colonnes = sorted(self._colonnes_connues(df), key=lambda colonne: colonne[0])
+        non_nulles = np.zeros(len(df), dtype=np.int64)
+        for _, serie in colonnes:
+            non_nulles += serie.to_numpy(dtype=np.float64) != 0
+        indptr = np.concatenate([[0], np.cumsum(non_nulles)])
+        indices = np.empty(indptr[-1], dtype=np.int32)
+        donnees = np.empty(indptr[-1], dtype=np.float64)
+        curseurs = indptr[:-1].copy()
+        for i, serie in colonnes:
+            valeurs = serie.to_numpy(dtype=np.float64)
+            lignes = np.flatnonzero(valeurs)
+            positions = curseurs[lignes]
+            indices[positions] = i
+            donnees[positions] = valeurs[lignes]
+            curseurs[lignes] += 1
+        return sparse.csr_matrix((donnees, indices, indptr), shape=(len(df), len(self.colonnes)))
+
+    def _colonnes_connues(self, df):
+        """Position dans le modèle et colonne de `df` pour chaque colonne connue du modèle."""
+        remplies = np.zeros(len(self.colonnes), dtype=bool)
+        inconnues = []
+        for col, serie in df.items():
+            if col == "SK_ID_CURR":
+                continue
+            i = self.index.get(col)
+            if i is None:
+                inconnues.append(col)
+                continue
+            yield i, serie
+            remplies[i] = True
+        self._compter(len(df), inconnues, remplies)
+
+    def _compter(self, lignes, inconnues, remplies):
+        with self.verrou:
+            self.compteurs["alignements"] += 1
+            self.compteurs["lignes"] += lignes
+            self.inconnues.update(inconnues)
+            self.absences += ~remplies
+
+    def _plus_frequentes(self, masque, top):
+        positions = np.flatnonzero(masque & (self.absences > 0))
+        positions = positions[np.argsort(-self.absences[positions], kind="stable")][:top]
+        return {self.colonnes[i]: int(self.absences[i]) for i in positions}
+
+    def metriques(self, top=20):
+        """Compteurs d'alignement et colonnes inconnues / absentes les plus fréquentes (nombre d'alignements)."""
+        with self.verrou:
+            return {
+                **self.compteurs,
+                "colonnes_modele": len(self.colonnes),
+                "colonnes_inconnues": dict(self.inconnues.most_common(top)),
+                "variables_absentes": self._plus_frequentes(~self.indicatrices, top),
+                "modalites_absentes": self._plus_frequentes(self.indicatrices, top),
+                "nombre_colonnes_inconnues": len(self.inconnues),
+                "nombre_variables_absentes": int(((self.absences > 0) & ~self.indicatrices).sum()),
+                "nombre_modalites_absentes": int(((self.absences > 0) & self.indicatrices).sum())
+            }
+
+
+def aligner_colonnes(df, colonnes_utiles, colonnes_types, creuse=False):
+    """
+    Aligne les colonnes sur celles du modèle (colonnes manquantes remplies avec 0)
+    et applique les types sauvegardés à l'entraînement (cf. `SchemaFeatures`).
+
+    Retourne les identifiants clients et la matrice X (CSR avec `creuse=True`).
+    """
+    return SchemaFeatures(colonnes_utiles, colonnes_types).aligner(df, creuse)
+
+
+if __name__ == "__main__":
+    # Usage : python -m src.pipeline <dossier contenant application_test.csv, bureau.csv, previous_application.csv> [nrows]
+    # Compare la mémoire du mode par défaut et du mode catégoriel, et vérifie que les features sont identiques.
+    import os
+    import sys
+    import tracemalloc
+
+    dossier_donnees = sys.argv[1]
+    nrows = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    tables = [
+        pd.read_csv(os.path.join(dossier_donnees, nom), nrows=nrows)
+        for nom in ["application_test.csv", "bureau.csv", "previous_application.csv"]
+    ]
+    print(f"📦 Données en entrée : {memoire_mo(*tables):.1f} Mo")
+
+    features = {}
+    for categoriel in [False, True]:
+        tracemalloc.start()
+        tables_pretraitees = pretraiter(*tables, categoriel=categoriel)
+        features[categoriel] = construire_features(*tables_pretraitees)
+        _, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"📉 Mode {'catégoriel' if categoriel else 'par défaut'} : tables prétraitées "
+              f"{memoire_mo(*tables_pretraitees):.1f} Mo, pic {pic / 1024 ** 2:.1f} Mo")
+        del tables_pretraitees
+
+    pd.testing.assert_frame_equal(features[True][features[False].columns], features[False])
+    print("✅ Features identiques dans les deux modes")
@@ -0,0 +1,105 @@
+"""
+Pool borné de threads pour le travail CPU des requêtes de l'API (lecture et prétraitement
+pandas, scoring LightGBM, SHAP, graphiques), exécuté hors de la boucle asyncio : une
+requête lente ne bloque plus les autres connexions.
+
+Contrôle d'admission : au plus `travailleurs` calculs en cours et `file_max` en attente ;
+au-delà, la requête est refusée immédiatement (`PoolSature`, HTTP 503 côté API) plutôt que
+de s'accumuler sans limite.
+
+Chaque appel LightGBM lance par défaut autant de threads OpenMP que de cœurs : avec un
+travailleur par cœur, les calculs simultanés se disputeraient les cœurs (jusqu'à cœurs²
+threads actifs). Les appels faits depuis le pool sont donc limités à `THREADS_PAR_CALCUL`
+threads (cœurs / travailleurs, soit 1 par défaut). En contrepartie, un gros lot seul sur un
+serveur inactif n'utilise plus tous les cœurs.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+TRAVAILLEURS = os.cpu_count() or 1
+FILE_MAX = 4 * TRAVAILLEURS
+# Threads OpenMP de chaque appel LightGBM fait depuis le pool (cf. ModeleServi.threads_lightgbm)
+THREADS_PAR_CALCUL = max(1, (os.cpu_count() or 1) // TRAVAILLEURS)
+
+
+class PoolSature(Exception):
+    """Calcul refusé : tous les travailleurs sont occupés et la file d'attente est pleine."""
+
+
+class PoolCalcul:
+    """
+    Exécute des fonctions bloquantes dans `travailleurs` threads, avec au plus `file_max`
+    calculs en attente. Les opérations lourdes (LightGBM, numpy, lecture Arrow / CSV)
+    libèrent le GIL et se parallélisent sur les cœurs disponibles.
+    """
+
+    def __init__(self, travailleurs=TRAVAILLEURS, file_max=FILE_MAX):
+        self.travailleurs = travailleurs
+        self.file_max = file_max
+        self.executeur = ThreadPoolExecutor(max_workers=travailleurs, thread_name_prefix="calcul")
+        self.verrou = threading.Lock()
+        self.admis = 0
+        self.en_cours = 0
+        self.compteurs = {"terminees": 0, "erreurs": 0, "rejets": 0, "pic_admis": 0}
+        self.attente_totale_s = 0.0
+        self.calcul_total_s = 0.0
+
+    def admettre(self):
+        with self.verrou:
+            if self.admis >= self.travailleurs + self.file_max:
+                self.compteurs["rejets"] += 1
+                raise PoolSature(
+                    f"Serveur saturé ({self.travailleurs} calculs en cours, {self.file_max} en attente), réessayer plus tard"
+                )
+            self.admis += 1
+            self.compteurs["pic_admis"] = max(self.compteurs["pic_admis"], self.admis)
+
+    def _executer(self, fonction, soumis):
+        debut = time.perf_counter()
+        with self.verrou:
+            self.en_cours += 1
+            self.attente_totale_s += debut - soumis
+        try:
+            return fonction()
+        finally:
+            with self.verrou:
+                self.en_cours -= 1
+                self.calcul_total_s += time.perf_counter() - debut
+
+    def _liberer(self, future):
+        # Place libérée à la fin du calcul (ou à son annulation avant démarrage), même si la
+        # requête a été abandonnée entre-temps
+        with self.verrou:
+            self.admis -= 1
+            erreur = future.cancelled() or future.exception() is not None
+            self.compteurs["erreurs" if erreur else "terminees"] += 1
+
+    async def executer(self, fonction, *args, **kwargs):
+        """Résultat de `fonction(*args, **kwargs)` calculé dans le pool, sans bloquer la boucle asyncio."""
+        self.admettre()
+        try:
+            future = self.executeur.submit(self._executer, partial(fonction, *args, **kwargs), time.perf_counter())
+        except BaseException:
+            with self.verrou:
+                self.admis -= 1
+            raise
+        future.add_done_callback(self._liberer)
+        return await asyncio.wrap_future(future)
+
+    def metriques(self):
+        with self.verrou:
+            traitees = self.compteurs["terminees"] + self.compteurs["erreurs"]
+            return {
+                **self.compteurs,
+                "en_cours": self.en_cours,
+                "en_attente": self.admis - self.en_cours,
+                "travailleurs": self.travailleurs,
+                "file_max": self.file_max,
+                "attente_moyenne_s": round(self.attente_totale_s / traitees, 4) if traitees else None,
+                "calcul_moyen_s": round(self.calcul_total_s / traitees, 4) if traitees else None
+            }
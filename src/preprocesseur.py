@@ -0,0 +1,93 @@
+import os
+import sys
+import joblib
+
+from src.modele import DOSSIER_MODELES
+from src.pipeline import (
+    preparer_application,
+    preparer_bureau,
+    preparer_previous,
+    APP_COLONNES_A_CONSERVER,
+    BUREAU_COLONNES_A_CONSERVER,
+    PREV_COLONNES_A_CONSERVER
+)
+from src.preprocessing import chemin_table, lire_table
+from src.feature_engineering import vocabulaire_one_hot
+
+NOM_FICHIER_PREPROCESSEUR = "preprocesseur.pkl"
+
+
+class PreprocesseurCredit:
+    """
+    Prétraitement ajusté une seule fois sur les données d'entraînement.
+
+    Les paramètres appris pour chaque table (valeurs d'imputation, colonnes binaires,
+    modalités fréquentes de previous_application, vocabulaire des indicatrices one-hot)
+    sont ensuite appliqués tels quels à l'inférence, de sorte que les features ne
+    dépendent plus du lot envoyé.
+    """
+
+    def __init__(self, parametres=None):
+        self.parametres = parametres
+
+    def fit(self, df_app, df_bureau, df_prev):
+        df_app, parametres_app = preparer_application(df_app)
+        df_bureau, parametres_bureau = preparer_bureau(df_bureau)
+        df_prev, parametres_prev = preparer_previous(df_prev)
+        # Indicatrices de l'entraînement : application est encodée sans modalité NaN
+        # (après fillna), bureau et previous_application avec (avant agrégation)
+        parametres_app['modalites'] = vocabulaire_one_hot(df_app, nan_as_category=False)
+        parametres_bureau['modalites'] = vocabulaire_one_hot(df_bureau)
+        parametres_prev['modalites'] = vocabulaire_one_hot(df_prev)
+        self.parametres = {
+            'application': parametres_app,
+            'bureau': parametres_bureau,
+            'previous': parametres_prev
+        }
+        return self
+
+    def transform(self, df_app, df_bureau, df_prev, categoriel=False):
+        df_app, _ = preparer_application(df_app, self.parametres['application'], categoriel)
+        df_bureau, _ = preparer_bureau(df_bureau, self.parametres['bureau'], categoriel)
+        df_prev, _ = preparer_previous(df_prev, self.parametres['previous'], categoriel)
+        return df_app, df_bureau, df_prev
+
+    @property
+    def modalites(self):
+        """
+        Vocabulaires one-hot appris à l'entraînement, par table ('application', 'bureau',
+        'previous'), ou None pour un préprocesseur sauvegardé avant leur ajout.
+        """
+        if not all('modalites' in parametres for parametres in self.parametres.values()):
+            return None
+        return {table: parametres['modalites'] for table, parametres in self.parametres.items()}
+
+    def sauvegarder(self, chemin):
+        """Sauvegarde les paramètres appris (dictionnaire simple, comme columns_dtypes.pkl)."""
+        joblib.dump(self.parametres, chemin)
+
+    @classmethod
+    def charger(cls, chemin):
+        return cls(joblib.load(chemin))
+
+
+def charger_preprocesseur(dossier_modeles):
+    """Charge le préprocesseur ajusté s'il existe dans `dossier_modeles`, sinon retourne None."""
+    chemin = os.path.join(dossier_modeles, NOM_FICHIER_PREPROCESSEUR)
+    if not os.path.exists(chemin):
+        return None
+    return PreprocesseurCredit.charger(chemin)
+
+
+if __name__ == "__main__":
+    # Usage : python -m src.preprocesseur <dossier contenant application_train, bureau, previous_application (.parquet, .arrow ou .csv)>
+    dossier_donnees = sys.argv[1]
+    dossier_modeles = DOSSIER_MODELES
+
+    df_app = lire_table(chemin_table(dossier_donnees, "application_train"), APP_COLONNES_A_CONSERVER)
+    df_bureau = lire_table(chemin_table(dossier_donnees, "bureau"), BUREAU_COLONNES_A_CONSERVER)
+    df_prev = lire_table(chemin_table(dossier_donnees, "previous_application"), PREV_COLONNES_A_CONSERVER)
+
+    preprocesseur = PreprocesseurCredit().fit(df_app, df_bureau, df_prev)
+    preprocesseur.sauvegarder(os.path.join(dossier_modeles, NOM_FICHIER_PREPROCESSEUR))
+    print(f"✅ Préprocesseur sauvegardé dans {dossier_modeles}")
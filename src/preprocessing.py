@@ -3,38 +3,183 @@
 # =============================================================================
 
 import os
+import codecs
 import pandas as pd
 import numpy as np
 #import ipywidgets as widgets
 #from IPython.display import display
-import matplotlib.pyplot as plt
+# matplotlib est importé dans plot_missing_values : inutile pour le pipeline (API, scoring)
 
 # =============================================================================
 # 📂 CHARGEMENT DES FICHIERS
 # =============================================================================
 
-def load_all_data(directory_path):
+# Formats acceptés, du plus rapide au plus lent à lire : Parquet et Arrow IPC (Feather v2)
+# gardent les types des colonnes et permettent de ne lire que les colonnes utiles.
+EXTENSIONS_FORMATS = {'.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.csv': 'csv'}
+SIGNATURES_FORMATS = {b'PAR1': 'parquet', b'ARROW1': 'arrow'}
+
+
+def format_fichier(source):
+    """
+    Format d'un fichier ('parquet', 'arrow' ou 'csv') : d'après l'extension pour un chemin,
+    d'après les premiers octets pour un flux binaire (fichier envoyé à l'API).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return EXTENSIONS_FORMATS.get(os.path.splitext(source)[1].lower(), 'csv')
+    position = source.tell()
+    debut = source.read(6)
+    source.seek(position)
+    for signature, nom in SIGNATURES_FORMATS.items():
+        if debut.startswith(signature):
+            return nom
+    return 'csv'
+
+
+def chemin_table(dossier, nom):
+    """Chemin de la table `nom` dans `dossier`, en préférant une version Parquet / Arrow au CSV."""
+    for extension in EXTENSIONS_FORMATS:
+        chemin = os.path.join(dossier, nom + extension)
+        if os.path.exists(chemin):
+            return chemin
+    return os.path.join(dossier, nom + '.csv')
+
+
+def detecter_encodage(path, encodages=('utf-8', 'iso-8859-1', 'cp1252', 'utf-16')):
+    """
+    Premier encodage de `encodages` capable de décoder tout le fichier. Le décodage se fait
+    par blocs d'octets, sans parser le CSV ; un fichier avec BOM UTF-16 est lu en UTF-16.
+    """
+    with open(path, 'rb') as f:
+        if f.read(2) in (b'\xff\xfe', b'\xfe\xff'):
+            return 'utf-16'
+        for encodage in encodages:
+            f.seek(0)
+            decodeur = codecs.getincrementaldecoder(encodage)()
+            try:
+                while bloc := f.read(1 << 20):
+                    decodeur.decode(bloc)
+                decodeur.decode(b'', final=True)
+                return encodage
+            except UnicodeDecodeError:
+                continue
+    return None
+
+
+def table_arrow(source, fmt, colonnes=None):
+    """Table pyarrow d'un fichier Parquet / Arrow IPC, réduite aux `colonnes` présentes."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt == 'parquet':
+        fichier = pq.ParquetFile(source)
+        noms = fichier.schema_arrow.names
+        return fichier.read(columns=[c for c in noms if c in colonnes] if colonnes is not None else None)
+
+    if isinstance(source, (str, os.PathLike)):
+        source = pa.memory_map(os.fspath(source))
+    table = pa.ipc.open_file(source).read_all()
+    if colonnes is not None:
+        table = table.select([c for c in table.column_names if c in colonnes])
+    return table
+
+
+def vers_pandas(table, types=None):
+    """DataFrame d'une table pyarrow, avec les `types` imposés comme à la lecture d'un CSV."""
+    import pyarrow as pa
+
+    # Valeurs manquantes des colonnes texte : NaN comme avec pd.read_csv (et non None)
+    manquantes = {
+        champ.name: table.column(champ.name).is_null().to_numpy(zero_copy_only=False)
+        for champ in table.schema
+        if (pa.types.is_string(champ.type) or pa.types.is_large_string(champ.type))
+        and table.column(champ.name).null_count
+    }
+    df = table.to_pandas()
+    for col, masque in manquantes.items():
+        valeurs = df[col].to_numpy()
+        valeurs[masque] = np.nan
+        df[col] = valeurs
+    types = {col: t for col, t in (types or {}).items() if col in df.columns and df[col].dtype != t}
+    return df.astype(types) if types else df
+
+
+def lire_table(source, colonnes=None, types=None, ids_clients=None, encoding=None):
+    """
+    Lit une table CSV, Parquet ou Arrow IPC (chemin ou flux binaire) en ne gardant que les
+    `colonnes` présentes parmi celles demandées (toutes si None), avec les `types` imposés.
+
+    Pour Parquet / Arrow, seules les colonnes demandées sont lues et les types enregistrés
+    sont conservés ; avec `ids_clients`, les lignes des autres clients sont écartées avant
+    la conversion en DataFrame.
+    """
+    fmt = format_fichier(source)
+    if fmt == 'csv':
+        df = pd.read_csv(
+            source, usecols=(lambda col: col in colonnes) if colonnes is not None else None,
+            dtype=types, encoding=encoding
+        )
+        if ids_clients is not None:
+            df = df[df['SK_ID_CURR'].isin(list(ids_clients))].reset_index(drop=True)
+        return df
+
+    table = table_arrow(source, fmt, colonnes)
+    if ids_clients is not None:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        ids = pa.array(sorted(int(i) for i in ids_clients), type=table.schema.field('SK_ID_CURR').type)
+        table = table.filter(pc.is_in(table['SK_ID_CURR'], value_set=ids))
+    return vers_pandas(table, types)
+
+
+def lire_par_morceaux(chemin, colonnes, taille, types=None):
+    """Lit une table CSV, Parquet ou Arrow IPC par morceaux de `taille` lignes (colonnes `colonnes`)."""
+    fmt = format_fichier(chemin)
+    if fmt == 'csv':
+        yield from pd.read_csv(chemin, usecols=colonnes, chunksize=taille, dtype=types)
+        return
+
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        fichier = pq.ParquetFile(chemin)
+        # Colonnes dans l'ordre du fichier, comme avec usecols
+        lots = fichier.iter_batches(
+            batch_size=taille, columns=[c for c in fichier.schema_arrow.names if c in colonnes]
+        )
+    else:
+        lots = table_arrow(chemin, fmt, colonnes).to_batches(max_chunksize=taille)
+    for lot in lots:
+        yield vers_pandas(lot, types)
+
+
+def load_all_data(directory_path, colonnes=None):
     """
-    Charge tous les fichiers CSV du dossier dans un dictionnaire.
-    Essaie plusieurs encodages en cas d'erreur.
+    Charge tous les fichiers CSV, Parquet et Arrow IPC du dossier dans un dictionnaire
+    (version Parquet / Arrow préférée à un CSV de même nom).
+    Pour un CSV, l'encodage est détecté une seule fois avant la lecture.
+
+    `colonnes` : dictionnaire optionnel nom de table → colonnes à lire.
     """
-    encodings_to_try = ['utf-8', 'iso-8859-1', 'cp1252', 'utf-16']
     data = {}
+    colonnes = colonnes or {}
 
-    for filename in os.listdir(directory_path):
-        if filename.endswith(".csv"):
-            name = filename.replace(".csv", "")
-            path = os.path.join(directory_path, filename)
-            for encoding in encodings_to_try:
-                try:
-                    df = pd.read_csv(path, encoding=encoding)
-                    data[name] = df
-                    print(f"✅ Fichier {filename} chargé avec encodage {encoding}")
-                    break
-                except UnicodeDecodeError:
-                    continue
-            else:
+    for filename in sorted(os.listdir(directory_path)):
+        name, extension = os.path.splitext(filename)
+        fmt = EXTENSIONS_FORMATS.get(extension.lower())
+        if fmt is None or name in data:
+            continue
+        path = chemin_table(directory_path, name)
+        if path != os.path.join(directory_path, filename):
+            continue
+
+        encoding = None
+        if fmt == 'csv':
+            encoding = detecter_encodage(path)
+            if encoding is None:
                 print(f"❌ Impossible de lire {filename} avec les encodages testés.")
+                continue
+        data[name] = lire_table(path, colonnes.get(name), encoding=encoding)
+        print(f"✅ Fichier {filename} chargé" + (f" avec encodage {encoding}" if encoding else ""))
     return data
 
 # =============================================================================
@@ -144,6 +289,8 @@ def plot_missing_values(df, figsize=(10, 8)):
     Affiche un graphique des colonnes avec des valeurs manquantes,
     triées de la plus vide à la moins vide, avec couleur selon seuils.
     """
+    import matplotlib.pyplot as plt
+
     missing = df.isnull().mean() * 100
     missing = missing[missing > 0].sort_values(ascending=False)
 
@@ -215,15 +362,62 @@ def supprimer_lignes_trop_vides(df, seuil=40):
 
 # Imputation des valeurs manquantes
 
-def imputer_valeurs_manquantes(df):
+def calculer_valeurs_imputation(df):
+    """
+    Calcule, pour chaque colonne, la valeur d'imputation selon la même règle que
+    `imputer_valeurs_manquantes` (moyenne, moyenne arrondie vers le bas ou mode).
+
+    Contrairement à `imputer_valeurs_manquantes`, toutes les colonnes sont traitées,
+    même celles sans valeur manquante, afin de pouvoir réutiliser le dictionnaire
+    sur d'autres données (ex. à l'inférence).
+    """
+    valeurs = {}
+
+    for col in df.columns:
+        serie = df[col]
+        if serie.isnull().all():
+            continue
+        if serie.dtype == 'float64':
+            valeurs[col] = float(serie.mean())
+        elif serie.dtype == 'int64':
+            valeurs[col] = int(np.floor(serie.mean()))
+        elif serie.dtype == 'object' or isinstance(serie.dtype, pd.CategoricalDtype):
+            valeurs[col] = serie.mode()[0]
+
+    return valeurs
+
+
+def imputer_valeurs_manquantes(df, valeurs=None, copie=True):
     """
     Impute les valeurs manquantes :
     - Moyenne pour float
     - Moyenne arrondie vers le bas pour int
     - Valeur la plus fréquente (mode) pour les objets (catégories)
+
+    Si `valeurs` est fourni (dictionnaire colonne → valeur, cf. `calculer_valeurs_imputation`),
+    ces valeurs sont utilisées telles quelles en un seul `fillna`, sans recalcul sur `df`.
+    Avec `copie=False`, `df` est alors complété sur place.
     
     Retourne le DataFrame imputé + un dictionnaire des valeurs utilisées.
     """
+    if valeurs is not None:
+        valeurs = {col: val for col, val in valeurs.items() if col in df.columns}
+        if copie:
+            df = df.copy()
+        # Une colonne 'category' n'est complétée que si nécessaire, avec une valeur
+        # ajoutée au préalable à ses modalités
+        a_completer = {}
+        for col, valeur in valeurs.items():
+            serie = df[col]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                if not serie.isna().any():
+                    continue
+                if valeur not in serie.cat.categories:
+                    df[col] = serie.cat.add_categories([valeur])
+            a_completer[col] = valeur
+        df.fillna(a_completer, inplace=True)
+        return df, valeurs
+
     df = df.copy()
     imputations = {}
 
@@ -260,15 +454,32 @@ def imputer_valeurs_manquantes(df):
 
 # Conversion des binaires
 
-def convertir_binaires_en_object(df, exclude=['TARGET']):
+def convertir_binaires_en_object(df, exclude=['TARGET'], colonnes=None, categoriel=False, copie=True):
     """
     Convertit en type 'object' toutes les colonnes numériques (int ou float)
     contenant 1 ou 2 valeurs uniques (hors NaN), typiquement 0 et 1 ou constantes,
     sauf celles indiquées dans `exclude`.
 
+    Si `colonnes` est fourni (liste apprise à l'entraînement), seules ces colonnes
+    sont converties, sans analyser les valeurs de `df`.
+
+    Avec `categoriel=True`, les colonnes sont converties en 'category' plutôt qu'en
+    'object' (un code par ligne au lieu d'un objet Python) ; `copie=False` modifie
+    `df` sur place.
+
     Retourne le DataFrame modifié + la liste des colonnes converties.
     """
-    df = df.copy()
+    type_cible = 'category' if categoriel else 'object'
+    if colonnes is not None:
+        colonnes = [col for col in colonnes if col in df.columns and col not in exclude]
+        if copie:
+            return df.astype({col: type_cible for col in colonnes}), colonnes
+        for col in colonnes:
+            df[col] = df[col].astype(type_cible)
+        return df, colonnes
+
+    if copie:
+        df = df.copy()
     colonnes_converties = []
 
     for col in df.columns:
@@ -278,26 +489,28 @@ def convertir_binaires_en_object(df, exclude=['TARGET']):
         if pd.api.types.is_numeric_dtype(df[col]):
             uniques = df[col].dropna().unique()
             if len(uniques) <= 2:
-                df[col] = df[col].astype('object')
+                df[col] = df[col].astype(type_cible)
                 colonnes_converties.append(col)
 
-    print(f"🔁 Colonnes binaires ou constantes converties en 'object' (hors {exclude}) :")
+    print(f"🔁 Colonnes binaires ou constantes converties en '{type_cible}' (hors {exclude}) :")
     print(colonnes_converties)
     return df, colonnes_converties
 
 
 # Réduire les types
 
-def reduire_types(df):
+def reduire_types(df, copie=True):
     """
     Réduit les types des colonnes numériques si possible :
     - int64 → int8 / int16 selon les valeurs
     - float64 → float32
     Ne modifie pas les colonnes de type object ou category.
+    Avec `copie=False`, les colonnes de `df` sont remplacées sur place.
     
     Retourne le DataFrame modifié + un résumé des conversions.
     """
-    df = df.copy()
+    if copie:
+        df = df.copy()
     conversions = []
 
     for col in df.select_dtypes(include=['int64']).columns:
@@ -354,6 +567,64 @@ def afficher_valeurs_uniques_objet(df, seuil=2, nom_df='DataFrame'):
 
 # Regroupement des valeurs 
 
+# Moteur de regroupement : une règle est un dictionnaire (valeur d'origine → groupe, les
+# valeurs absentes sont conservées), une fonction valeur → groupe, ou une liste de règles
+# appliquées successivement.
+
+def compiler_regle(regle):
+    """Transforme une règle de regroupement en fonction valeur → groupe."""
+    if isinstance(regle, dict):
+        return lambda valeur: regle.get(valeur, valeur)
+    if isinstance(regle, (list, tuple)):
+        fonctions = [compiler_regle(r) for r in regle]
+
+        def composer(valeur):
+            for fonction in fonctions:
+                valeur = fonction(valeur)
+            return valeur
+        return composer
+    return regle
+
+
+def regrouper_valeurs(serie, regle):
+    """
+    Applique une règle de regroupement à une colonne en une seule passe vectorisée :
+    la règle n'est évaluée qu'une fois par modalité distincte (et une fois pour NaN),
+    puis chaque ligne est traduite par une table de correspondance indexée par le
+    code de sa modalité.
+
+    Une colonne de type 'category' n'est pas re-hachée (ses codes sont réutilisés)
+    et le résultat reste de type 'category'.
+    """
+    fonction = compiler_regle(regle)
+    categorielle = isinstance(serie.dtype, pd.CategoricalDtype)
+    if categorielle:
+        codes, modalites = serie.cat.codes.to_numpy(), serie.cat.categories.to_numpy()
+    else:
+        codes, modalites = pd.factorize(serie.to_numpy())
+
+    # Dernière case : groupe des valeurs manquantes (code -1)
+    table = np.empty(len(modalites) + 1, dtype=object)
+    table[:-1] = [fonction(modalite) for modalite in modalites]
+    table[-1] = fonction(np.nan)
+
+    inchangee = all(groupe == modalite for groupe, modalite in zip(table[:-1], modalites))
+    if inchangee and (pd.isna(table[-1]) or (codes >= 0).all()):
+        return serie
+    if categorielle:
+        codes_groupes, groupes = pd.factorize(table)
+        valeurs = pd.Categorical.from_codes(codes_groupes[codes], categories=groupes)
+        return pd.Series(valeurs, index=serie.index, name=serie.name)
+    return pd.Series(table[codes], index=serie.index, name=serie.name)
+
+
+def regrouper_colonnes(df, regles):
+    """Applique à chaque colonne présente de `df` sa règle de regroupement (colonne → règle)."""
+    for col, regle in regles.items():
+        if col in df.columns:
+            df[col] = regrouper_valeurs(df[col], regle)
+    return df
+
 # Application
 
 def regrouper_organisation(org):
@@ -378,51 +649,38 @@ def regrouper_organisation(org):
     else:
         return 'Other'
 
-def nettoyer_colonnes_categorielles_application(df):
-    """
-    Nettoie et regroupe les colonnes catégorielles de application_train.csv pour réduire la cardinalité
-    et supprimer les modalités très rares ou peu interprétables.
-    """
-    df = df.copy()
-
-    # Regroupement de NAME_TYPE_SUITE
-    df['NAME_TYPE_SUITE'] = df['NAME_TYPE_SUITE'].replace({
+# Regroupements de modalités de application_{train|test} (valeur d'origine → groupe)
+REGROUPEMENTS_APPLICATION = {
+    'NAME_TYPE_SUITE': {
         'Spouse, partner': 'Family',
         'Family': 'Family',
         'Children': 'Family',
         'Other_A': 'Other',
         'Other_B': 'Other',
         'Group of people': 'Other'
-    })
-
-    # Regroupement des modalités rares dans NAME_INCOME_TYPE
-    rares = ['Unemployed', 'Student', 'Businessman', 'Maternity leave']
-    df['NAME_INCOME_TYPE'] = df['NAME_INCOME_TYPE'].replace(rares, 'Other')
-
-    # Regroupement de NAME_EDUCATION_TYPE
-    df['NAME_EDUCATION_TYPE'] = df['NAME_EDUCATION_TYPE'].replace({
+    },
+    # Modalités rares de NAME_INCOME_TYPE
+    'NAME_INCOME_TYPE': {
+        'Unemployed': 'Other',
+        'Student': 'Other',
+        'Businessman': 'Other',
+        'Maternity leave': 'Other'
+    },
+    'NAME_EDUCATION_TYPE': {
         'Secondary / secondary special': 'Secondary',
         'Lower secondary': 'Secondary',
         'Incomplete higher': 'Some college',
         'Higher education': 'Higher',
         'Academic degree': 'Higher'
-    })
-
-    # Suppression des lignes avec valeurs incohérentes
-    df = df[df['CODE_GENDER'] != 'XNA']
-    df = df[df['NAME_FAMILY_STATUS'] != 'Unknown']
-
-    # Regroupement de NAME_HOUSING_TYPE
-    df['NAME_HOUSING_TYPE'] = df['NAME_HOUSING_TYPE'].replace({
+    },
+    'NAME_HOUSING_TYPE': {
         'With parents': 'Other',
         'Municipal apartment': 'Other',
         'Rented apartment': 'Other',
         'Office apartment': 'Other',
         'Co-op apartment': 'Other'
-    })
-
-    # Regroupement de OCCUPATION_TYPE
-    df['OCCUPATION_TYPE'] = df['OCCUPATION_TYPE'].replace({
+    },
+    'OCCUPATION_TYPE': {
         'Laborers': 'Labor',
         'Drivers': 'Labor',
         'Low-skill Laborers': 'Labor',
@@ -441,36 +699,56 @@ def nettoyer_colonnes_categorielles_application(df):
         'HR staff': 'Administrative',
         'Secretaries': 'Administrative',
         'Realty agents': 'Administrative'
-    })
+    }
+}
 
-    # Regroupement de ORGANIZATION_TYPE
-    df['ORGANIZATION_TYPE'] = df['ORGANIZATION_TYPE'].apply(regrouper_organisation)
+# Règles de regroupement de application, appliquées par `regrouper_colonnes`
+REGLES_APPLICATION = {
+    **REGROUPEMENTS_APPLICATION,
+    'ORGANIZATION_TYPE': regrouper_organisation
+}
 
-    return df
+# Valeurs incohérentes : les lignes concernées sont supprimées
+VALEURS_INCOHERENTES_APPLICATION = {
+    'CODE_GENDER': 'XNA',
+    'NAME_FAMILY_STATUS': 'Unknown'
+}
 
-# Bureau
 
-def nettoyer_colonnes_categorielles_bureau(df):
+def supprimer_lignes(df, masque, copie=True):
     """
-    Nettoie et simplifie les colonnes catégorielles du fichier bureau.csv :
-    - Supprime les lignes avec 'Bad debt' dans CREDIT_ACTIVE (trop rare)
-    - Regroupe les valeurs rares ou équivalentes dans CREDIT_ACTIVE, CREDIT_CURRENCY et CREDIT_TYPE
-    - Retourne le DataFrame nettoyé
+    Garde les lignes de `df` où `masque` est vrai. Avec `copie=False`, `df` est
+    retourné tel quel si aucune ligne n'est supprimée.
     """
+    if not copie:
+        return df if masque.all() else df.take(np.flatnonzero(masque))
+    return df[masque].copy()
 
-    df = df.copy()
 
-    # Supprimer les lignes avec CREDIT_ACTIVE == 'Bad debt' (trop rare)
-    df = df[df['CREDIT_ACTIVE'] != 'Bad debt']
+def nettoyer_colonnes_categorielles_application(df, copie=True):
+    """
+    Nettoie et regroupe les colonnes catégorielles de application_train.csv pour réduire la cardinalité
+    et supprimer les modalités très rares ou peu interprétables.
+    Avec `copie=False`, `df` est modifié sur place (hors suppression de lignes).
+    """
+    # Suppression des lignes avec valeurs incohérentes
+    masque = np.ones(len(df), dtype=bool)
+    for col, valeur in VALEURS_INCOHERENTES_APPLICATION.items():
+        masque &= (df[col] != valeur).to_numpy()
+    df = supprimer_lignes(df, masque, copie)
 
-    # Regrouper 'Sold' avec 'Closed'
-    df['CREDIT_ACTIVE'] = df['CREDIT_ACTIVE'].replace({'Sold': 'Closed'})
+    # Regroupement de NAME_TYPE_SUITE, NAME_INCOME_TYPE, NAME_EDUCATION_TYPE,
+    # NAME_HOUSING_TYPE, OCCUPATION_TYPE et ORGANIZATION_TYPE
+    return regrouper_colonnes(df, REGLES_APPLICATION)
 
-    # CREDIT_CURRENCY : regrouper toutes les devises sauf 'currency 1' en 'Other'
-    df['CREDIT_CURRENCY'] = df['CREDIT_CURRENCY'].apply(lambda x: x if x == 'currency 1' else 'Other')
+# Bureau
 
+# Regroupements de modalités de bureau (valeur d'origine → groupe)
+REGROUPEMENTS_BUREAU = {
+    # 'Sold' regroupé avec 'Closed'
+    'CREDIT_ACTIVE': {'Sold': 'Closed'},
     # CREDIT_TYPE : regrouper selon la logique discutée
-    regroupement_credit_type = {
+    'CREDIT_TYPE': {
         'Credit card': 'Consumer',
         'Microloan': 'Consumer',
         'Cash loan (non-earmarked)': 'Consumer',
@@ -486,51 +764,51 @@ def nettoyer_colonnes_categorielles_bureau(df):
         'Unknown type of loan': 'Other',
         'Another type of loan': 'Other'
     }
+}
 
-    df['CREDIT_TYPE'] = df['CREDIT_TYPE'].replace(regroupement_credit_type)
 
-    return df
+def regrouper_devise(devise):
+    # CREDIT_CURRENCY : toutes les devises sauf 'currency 1' deviennent 'Other'
+    return devise if devise == 'currency 1' else 'Other'
 
-# Previous application 
 
-def nettoyer_colonnes_categorielles_previous(df):
-    """
-    Nettoie et regroupe les colonnes catégorielles de previous_application
-    pour réduire la cardinalité et supprimer les valeurs incohérentes
-    sans supprimer de lignes ni introduire de NaN.
-    """
-    df = df.copy()
+# Règles de regroupement de bureau, appliquées par `regrouper_colonnes`
+REGLES_BUREAU = {
+    **REGROUPEMENTS_BUREAU,
+    # CREDIT_CURRENCY : regrouper toutes les devises sauf 'currency 1' en 'Other'
+    'CREDIT_CURRENCY': regrouper_devise
+}
 
-    # 🔁 Remplacer 'XNA' par 'Unknown' dans les colonnes suivantes
-    colonnes_xna = [
-        'NAME_CONTRACT_TYPE',
-        'NAME_PAYMENT_TYPE',
-        'NAME_CLIENT_TYPE',
-        'NAME_PRODUCT_TYPE',
-        'NAME_PORTFOLIO',
-        'NAME_SELLER_INDUSTRY',
-        'NAME_YIELD_GROUP'
-    ]
-    for col in colonnes_xna:
-        if col in df.columns:
-            df[col] = df[col].replace('XNA', 'Unknown')
 
-    # 🔁 NAME_CASH_LOAN_PURPOSE : 'XNA' et 'XAP' → 'Unknown', rares → 'Other'
-    df['NAME_CASH_LOAN_PURPOSE'] = df['NAME_CASH_LOAN_PURPOSE'].replace({'XNA': 'Unknown', 'XAP': 'Unknown'})
-    rares = df['NAME_CASH_LOAN_PURPOSE'].value_counts()[df['NAME_CASH_LOAN_PURPOSE'].value_counts() < 1000].index
-    df['NAME_CASH_LOAN_PURPOSE'] = df['NAME_CASH_LOAN_PURPOSE'].replace(rares, 'Other')
+def nettoyer_colonnes_categorielles_bureau(df, copie=True):
+    """
+    Nettoie et simplifie les colonnes catégorielles du fichier bureau.csv :
+    - Supprime les lignes avec 'Bad debt' dans CREDIT_ACTIVE (trop rare)
+    - Regroupe les valeurs rares ou équivalentes dans CREDIT_ACTIVE, CREDIT_CURRENCY et CREDIT_TYPE
+    - Retourne le DataFrame nettoyé (`df` modifié sur place avec `copie=False`)
+    """
+    # Supprimer les lignes avec CREDIT_ACTIVE == 'Bad debt' (trop rare)
+    df = supprimer_lignes(df, (df['CREDIT_ACTIVE'] != 'Bad debt').to_numpy(), copie)
 
-    # 🔁 NAME_GOODS_CATEGORY : 'XNA' → 'Unknown', rares → 'Other'
-    df['NAME_GOODS_CATEGORY'] = df['NAME_GOODS_CATEGORY'].replace('XNA', 'Unknown')
-    rares = df['NAME_GOODS_CATEGORY'].value_counts()[df['NAME_GOODS_CATEGORY'].value_counts() < 1000].index
-    df['NAME_GOODS_CATEGORY'] = df['NAME_GOODS_CATEGORY'].replace(rares, 'Other')
+    # Regrouper CREDIT_ACTIVE, CREDIT_TYPE et CREDIT_CURRENCY
+    return regrouper_colonnes(df, REGLES_BUREAU)
 
-    # 🔁 CHANNEL_TYPE : rares → 'Other'
-    rares = df['CHANNEL_TYPE'].value_counts()[df['CHANNEL_TYPE'].value_counts() < 10000].index
-    df['CHANNEL_TYPE'] = df['CHANNEL_TYPE'].replace(rares, 'Other')
+# Previous application 
 
-    # 🔁 CODE_REJECT_REASON : regroupements logiques
-    df['CODE_REJECT_REASON'] = df['CODE_REJECT_REASON'].replace({
+# Regroupements de modalités de previous_application (valeur d'origine → groupe)
+REGROUPEMENTS_PREVIOUS = {
+    # 'XNA' remplacé par 'Unknown'
+    'NAME_CONTRACT_TYPE': {'XNA': 'Unknown'},
+    'NAME_PAYMENT_TYPE': {'XNA': 'Unknown'},
+    'NAME_CLIENT_TYPE': {'XNA': 'Unknown'},
+    'NAME_PRODUCT_TYPE': {'XNA': 'Unknown'},
+    'NAME_PORTFOLIO': {'XNA': 'Unknown'},
+    'NAME_SELLER_INDUSTRY': {'XNA': 'Unknown'},
+    'NAME_YIELD_GROUP': {'XNA': 'Unknown'},
+    'NAME_CASH_LOAN_PURPOSE': {'XNA': 'Unknown', 'XAP': 'Unknown'},
+    'NAME_GOODS_CATEGORY': {'XNA': 'Unknown'},
+    # CODE_REJECT_REASON : regroupements logiques
+    'CODE_REJECT_REASON': {
         'XNA': 'Other',
         'XAP': 'Other',
         'HC': 'Client issue',
@@ -540,10 +818,9 @@ def nettoyer_colonnes_categorielles_previous(df):
         'LIMIT': 'Credit limit',
         'VERIF': 'Technical',
         'SYSTEM': 'Technical'
-    })
-
-    # 🔁 WEEKDAY_APPR_PROCESS_START : regrouper les jours en semaine/week-end
-    df['WEEKDAY_APPR_PROCESS_START'] = df['WEEKDAY_APPR_PROCESS_START'].replace({
+    },
+    # WEEKDAY_APPR_PROCESS_START : regrouper les jours en semaine/week-end
+    'WEEKDAY_APPR_PROCESS_START': {
         'SATURDAY': 'Weekend',
         'SUNDAY': 'Weekend',
         'MONDAY': 'Weekday',
@@ -551,26 +828,88 @@ def nettoyer_colonnes_categorielles_previous(df):
         'WEDNESDAY': 'Weekday',
         'THURSDAY': 'Weekday',
         'FRIDAY': 'Weekday'
-    })
+    },
+    # NAME_CONTRACT_STATUS : pas de XNA, mais on peut regrouper "Unused offer" et "Canceled"
+    'NAME_CONTRACT_STATUS': {'Unused offer': 'Canceled'}
+}
 
-    # 🔁 NAME_CONTRACT_STATUS : pas de XNA, mais on peut regrouper "Unused offer" et "Canceled"
-    df['NAME_CONTRACT_STATUS'] = df['NAME_CONTRACT_STATUS'].replace({
-        'Unused offer': 'Canceled',
-    })
+# Seuils d'effectif sous lesquels une modalité de previous_application est regroupée en 'Other'
+SEUILS_MODALITES_RARES_PREVIOUS = {
+    'NAME_CASH_LOAN_PURPOSE': 1000,
+    'NAME_GOODS_CATEGORY': 1000,
+    'CHANNEL_TYPE': 10000
+}
 
-    # 🔁 PRODUCT_COMBINATION : on peut simplifier les libellés en types généraux
-    df['PRODUCT_COMBINATION'] = df['PRODUCT_COMBINATION'].replace({
-        x: 'Cash' for x in df['PRODUCT_COMBINATION'].unique() if 'Cash' in str(x)
-    })
-    df['PRODUCT_COMBINATION'] = df['PRODUCT_COMBINATION'].replace({
-        x: 'Card' for x in df['PRODUCT_COMBINATION'].unique() if 'Card' in str(x)
-    })
-    df['PRODUCT_COMBINATION'] = df['PRODUCT_COMBINATION'].replace({
-        x: 'POS' for x in df['PRODUCT_COMBINATION'].unique() if 'POS' in str(x)
-    })
+# PRODUCT_COMBINATION : un libellé contenant l'un de ces mots devient ce mot (testés dans l'ordre)
+MOTS_CLES_PRODUCT_COMBINATION = ['Cash', 'Card', 'POS']
 
-    return df
 
+def regrouper_product_combination(produit):
+    for mot in MOTS_CLES_PRODUCT_COMBINATION:
+        if mot in str(produit):
+            return mot
+    return produit
+
+# Règles de regroupement de previous_application (hors modalités rares)
+REGLES_PREVIOUS = {
+    **REGROUPEMENTS_PREVIOUS,
+    # PRODUCT_COMBINATION : on peut simplifier les libellés en types généraux
+    'PRODUCT_COMBINATION': regrouper_product_combination
+}
 
 
+def garder_modalites(modalites_frequentes):
+    """Règle : toute modalité absente de `modalites_frequentes` devient 'Other' (NaN conservés)."""
+    modalites_frequentes = set(modalites_frequentes)
+    return lambda valeur: valeur if valeur in modalites_frequentes or pd.isna(valeur) else 'Other'
+
+
+def regrouper_modalites_rares(serie, seuil=None, modalites_frequentes=None):
+    """
+    Remplace par 'Other' les modalités dont l'effectif est inférieur à `seuil`,
+    ou, si `modalites_frequentes` est fourni, toutes celles qui n'y figurent pas.
+    """
+    if modalites_frequentes is None:
+        effectifs = serie.value_counts()
+        modalites_frequentes = effectifs[effectifs >= seuil].index
+    return regrouper_valeurs(serie, garder_modalites(modalites_frequentes))
 
+
+def regles_previous(modalites_frequentes):
+    """
+    Règles de previous_application complétées par le regroupement des modalités rares
+    apprises (colonne → modalités conservées), appliqué après le regroupement de la colonne.
+    """
+    regles = dict(REGLES_PREVIOUS)
+    for col, modalites in modalites_frequentes.items():
+        regles[col] = [regles.get(col, {}), garder_modalites(modalites)]
+    return regles
+
+
+def nettoyer_colonnes_categorielles_previous(df, modalites_frequentes=None, copie=True):
+    """
+    Nettoie et regroupe les colonnes catégorielles de previous_application
+    pour réduire la cardinalité et supprimer les valeurs incohérentes
+    sans supprimer de lignes ni introduire de NaN.
+
+    `modalites_frequentes` (colonne → modalités conservées) permet de réutiliser les
+    modalités apprises à l'entraînement au lieu de compter les effectifs sur `df` :
+    chaque colonne est alors regroupée en une seule passe.
+    Avec `copie=False`, les colonnes de `df` sont remplacées sur place.
+    """
+    modalites_frequentes = modalites_frequentes or {}
+    # Copie superficielle : les colonnes regroupées sont remplacées, jamais modifiées sur place
+    if copie:
+        df = df.copy(deep=False)
+
+    # 🔁 Remplacement de 'XNA' / 'XAP', regroupements logiques, PRODUCT_COMBINATION
+    # et modalités rares apprises
+    regrouper_colonnes(df, regles_previous(modalites_frequentes))
+
+    # 🔁 NAME_CASH_LOAN_PURPOSE, NAME_GOODS_CATEGORY, CHANNEL_TYPE : rares → 'Other'
+    # (effectifs comptés sur `df` pour les colonnes sans modalités apprises)
+    for col, seuil in SEUILS_MODALITES_RARES_PREVIOUS.items():
+        if col not in modalites_frequentes:
+            df[col] = regrouper_modalites_rares(df[col], seuil)
+
+    return df
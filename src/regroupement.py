@@ -0,0 +1,120 @@
+"""
+Regroupement (micro-batching) des scorings simultanés : les vecteurs de features envoyés
+par des requêtes arrivées à quelques millisecondes d'intervalle sont empilés en une seule
+matrice, scorée en un seul appel au modèle, puis chaque requête reçoit ses probabilités.
+
+Pour un seul client, le coût fixe d'un appel LightGBM (conversion, lancement des threads)
+domine : le regrouper avec les requêtes voisines l'amortit, au prix d'une attente bornée
+par `fenetre_s`.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+FENETRE_S = 0.002
+TAILLE_MAX = 256
+
+
+class Demande:
+    def __init__(self, X):
+        self.X = X
+        self.soumise = time.perf_counter()
+        self.future = Future()
+
+
+class Regroupeur:
+    """
+    Thread de scoring qui prend la première demande en attente, attend au plus `fenetre_s`
+    d'autres demandes (ou que le lot atteigne `taille_max` lignes), score le lot avec
+    `predire` (matrice numpy → probabilités) et répartit les résultats.
+
+    Une demande arrivée pendant le scoring d'un lot attend le suivant : sous charge, les lots
+    grossissent d'eux-mêmes.
+    """
+
+    def __init__(self, predire, fenetre_s=FENETRE_S, taille_max=TAILLE_MAX):
+        self.predire = predire
+        self.fenetre_s = fenetre_s
+        self.taille_max = taille_max
+        self.file = queue.Queue()
+        self.verrou = threading.Lock()
+        self.thread = None
+        self.compteurs = {"lots": 0, "demandes": 0, "lignes": 0, "taille_max_observee": 0}
+        self.attente_totale_s = 0.0
+        self.attente_max_s = 0.0
+        self.scoring_total_s = 0.0
+
+    def soumettre(self, X):
+        """Future des probabilités des lignes de X, calculées avec celles des demandes voisines."""
+        demande = Demande(np.asarray(X, dtype=np.float64))
+        with self.verrou:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._boucle, name="regroupement", daemon=True)
+                self.thread.start()
+        self.file.put(demande)
+        return demande.future
+
+    async def scorer(self, X):
+        """Probabilités des lignes de X, attendues sans bloquer la boucle asyncio."""
+        return await asyncio.wrap_future(self.soumettre(X))
+
+    def _boucle(self):
+        while True:
+            lot = [self.file.get()]
+            lignes = len(lot[0].X)
+            echeance = lot[0].soumise + self.fenetre_s
+            while lignes < self.taille_max:
+                try:
+                    # Demandes déjà en file prises sans attendre, même après l'échéance
+                    demande = self.file.get(timeout=max(echeance - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                lot.append(demande)
+                lignes += len(demande.X)
+            self._scorer(lot)
+
+    def _scorer(self, lot):
+        # Demandes abandonnées (requête annulée) retirées du lot
+        lot = [demande for demande in lot if demande.future.set_running_or_notify_cancel()]
+        if not lot:
+            return
+        debut = time.perf_counter()
+        try:
+            probas = np.asarray(self.predire(np.vstack([demande.X for demande in lot])))
+        except Exception as e:
+            for demande in lot:
+                demande.future.set_exception(e)
+            return
+        fin = time.perf_counter()
+
+        bornes = np.cumsum([0] + [len(demande.X) for demande in lot])
+        for demande, a, b in zip(lot, bornes[:-1], bornes[1:]):
+            demande.future.set_result(probas[a:b])
+
+        attentes = [debut - demande.soumise for demande in lot]
+        with self.verrou:
+            self.compteurs["lots"] += 1
+            self.compteurs["demandes"] += len(lot)
+            self.compteurs["lignes"] += int(bornes[-1])
+            self.compteurs["taille_max_observee"] = max(self.compteurs["taille_max_observee"], len(lot))
+            self.attente_totale_s += sum(attentes)
+            self.attente_max_s = max(self.attente_max_s, max(attentes))
+            self.scoring_total_s += fin - debut
+
+    def metriques(self):
+        with self.verrou:
+            lots, demandes = self.compteurs["lots"], self.compteurs["demandes"]
+            return {
+                **self.compteurs,
+                "demandes_par_lot": round(demandes / lots, 2) if lots else None,
+                "latence_ajoutee_moyenne_s": round(self.attente_totale_s / demandes, 5) if demandes else None,
+                "latence_ajoutee_max_s": round(self.attente_max_s, 5),
+                "scoring_moyen_par_lot_s": round(self.scoring_total_s / lots, 5) if lots else None,
+                "fenetre_s": self.fenetre_s,
+                "taille_max": self.taille_max
+            }
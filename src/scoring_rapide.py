@@ -0,0 +1,344 @@
+import csv
+import io
+import re
+import numpy as np
+import pandas as pd
+
+from src.pipeline import (
+    APP_COLONNES_A_CONSERVER,
+    APP_COLONNES_A_CONVERTIR_EN_INT,
+    BUREAU_COLONNES_A_CONSERVER,
+    PREV_COLONNES_A_CONSERVER,
+    PREV_COLONNES_A_CONVERTIR_INT
+)
+from src.preprocessing import (
+    REGLES_APPLICATION,
+    VALEURS_INCOHERENTES_APPLICATION,
+    REGLES_BUREAU,
+    compiler_regle,
+    regles_previous
+)
+from src.feature_engineering import AGREGATIONS_BUREAU, AGREGATIONS_PREVIOUS_COLONNES
+
+# Valeurs interprétées comme manquantes par pd.read_csv
+VALEURS_MANQUANTES_CSV = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+
+
+def nettoyer_nom(nom):
+    """Même nettoyage des noms de colonnes que `construire_features`."""
+    return re.sub('[^A-Za-z0-9_]+', '_', nom.strip())
+
+
+def est_manquant(valeur):
+    if valeur is None:
+        return True
+    if isinstance(valeur, str):
+        return valeur in VALEURS_MANQUANTES_CSV
+    return isinstance(valeur, float) and np.isnan(valeur)
+
+
+def meme_identifiant(champ, cle, sk_id_curr):
+    """Champ SK_ID_CURR égal à l'identifiant, écrit tel quel ou comme un nombre (102545.0)."""
+    if champ == cle:
+        return True
+    try:
+        return float(champ) == sk_id_curr
+    except ValueError:
+        return False
+
+
+def extraire_enregistrements(contenu, sk_id_curr):
+    """
+    Extrait d'un fichier CSV (bytes) les seules lignes du client `sk_id_curr`,
+    sous forme de dictionnaires colonne → valeur brute. Le fichier est découpé par
+    csv.reader (champs entre guillemets sur plusieurs lignes compris) ; les lignes trop
+    courtes pour contenir SK_ID_CURR sont ignorées, un fichier vide ne donne aucune ligne.
+    """
+    # utf-8-sig : BOM éventuel retiré, comme pour pd.read_csv et `filtrer_csv`
+    lecteur = csv.reader(io.StringIO(contenu.decode("utf-8-sig")))
+    entete = next(lecteur, None)
+    if entete is None:
+        return []
+    position = entete.index("SK_ID_CURR")
+    cle = str(sk_id_curr)
+
+    return [
+        dict(zip(entete, valeurs))
+        for valeurs in lecteur
+        if len(valeurs) > position and meme_identifiant(valeurs[position], cle, sk_id_curr)
+    ]
+
+
+def filtrer_csv(flux, ids_clients, colonnes, types=None):
+    """
+    Lit un fichier CSV (flux binaire) ligne à ligne en ne gardant que les lignes des
+    clients `ids_clients`, puis parse ces seules lignes avec pd.read_csv, restreintes aux
+    `colonnes` conservées par le pipeline. Seul le champ SK_ID_CURR des autres lignes est lu.
+    """
+    entete = next(flux).removeprefix(b'\xef\xbb\xbf')
+    position = next(csv.reader([entete.decode("utf-8")])).index("SK_ID_CURR")
+    cles = {str(int(i)).encode() for i in ids_clients}
+
+    gardees = [entete]
+    for ligne in flux:
+        debut = ligne.split(b',', position + 1)
+        if len(debut) <= position:
+            continue
+        if b'"' in ligne:
+            # Champ entre guillemets (virgules possibles) : découpage CSV complet
+            champs = next(csv.reader([ligne.decode("utf-8")]))
+            valeur = champs[position].encode() if len(champs) > position else b''
+        else:
+            valeur = debut[position]
+        if valeur.strip() in cles:
+            gardees.append(ligne if ligne.endswith(b'\n') else ligne + b'\n')
+
+    colonnes = set(colonnes)
+    return pd.read_csv(io.BytesIO(b''.join(gardees)), usecols=lambda col: col in colonnes, dtype=types)
+
+
+class PlanScoring:
+    """
+    Plan de scoring compilé une seule fois à partir des colonnes du modèle
+    (columns_used.pkl / columns_dtypes.pkl) et des paramètres du préprocesseur ajusté.
+
+    Il transforme directement les enregistrements bruts d'un client (sa ligne
+    application et ses lignes bureau / previous_application) en un vecteur numpy
+    dans l'ordre des colonnes du modèle, en reproduisant pas à pas le pipeline
+    pandas (imputation, regroupements, réduction en float32, agrégations, encodage).
+
+    Les modalités catégorielles d'application sont encodées avec celles présentes
+    dans les colonnes du modèle (première modalité retirée à l'entraînement), comme
+    le fait le pipeline sur un lot contenant toutes les modalités.
+    """
+
+    def __init__(self, colonnes_utiles, colonnes_types, preprocesseur):
+        self.colonnes_utiles = list(colonnes_utiles)
+        self.index = {col: i for i, col in enumerate(self.colonnes_utiles)}
+        parametres = preprocesseur.parametres
+
+        # === application ===
+        params_app = parametres['application']
+        self.app_numeriques = []
+        self.app_categorielles = []
+        for col in APP_COLONNES_A_CONSERVER:
+            if col == 'SK_ID_CURR':
+                continue
+            imputation = params_app['imputations'].get(col)
+            nature = self._nature(col, imputation, APP_COLONNES_A_CONVERTIR_EN_INT,
+                                  defaut='cat' if col not in colonnes_types else 'float')
+            if col in params_app['colonnes_binaires'] or nature == 'cat':
+                self.app_categorielles.append((col, nature, imputation, self._regroupement(REGLES_APPLICATION, col)))
+            elif col in self.index:
+                self.app_numeriques.append((col, nature, imputation, self.index[col]))
+
+        # === bureau ===
+        params_bureau = parametres['bureau']
+        self.bureau_colonnes = self._compiler_table(
+            BUREAU_COLONNES_A_CONSERVER, params_bureau, ['DAYS_CREDIT_ENDDATE', 'DAYS_ENDDATE_FACT'],
+            lambda col: self._regroupement(REGLES_BUREAU, col)
+        )
+        self.bureau_agregations = self._compiler_agregations('BURO_', AGREGATIONS_BUREAU, self.bureau_colonnes)
+
+        # === previous_application ===
+        params_prev = parametres['previous']
+        regles_prev = regles_previous(params_prev.get('modalites_frequentes', {}))
+        self.prev_colonnes = self._compiler_table(
+            PREV_COLONNES_A_CONSERVER, params_prev, PREV_COLONNES_A_CONVERTIR_INT,
+            lambda col: self._regroupement(regles_prev, col)
+        )
+        agregations_prev = {col: ['min', 'max', 'mean'] for col in AGREGATIONS_PREVIOUS_COLONNES}
+        self.prev_agregations = self._compiler_agregations('PREV_', agregations_prev, self.prev_colonnes)
+
+    # -------------------------------------------------------------------------
+    # Compilation
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _nature(col, imputation, colonnes_int, defaut='float'):
+        """'int', 'float' ou 'cat' selon le type de la colonne à l'entraînement."""
+        if col in colonnes_int:
+            return 'int'
+        if isinstance(imputation, str):
+            return 'cat'
+        if isinstance(imputation, (int, np.integer)):
+            return 'int'
+        if isinstance(imputation, (float, np.floating)):
+            return 'float'
+        return defaut
+
+    @staticmethod
+    def _regroupement(regles, col):
+        """Fonction valeur → groupe de la colonne (mêmes règles que les nettoyer_colonnes_categorielles_*)."""
+        regle = regles.get(col)
+        return compiler_regle(regle) if regle is not None else None
+
+    def _compiler_table(self, colonnes, parametres, colonnes_int, regroupement):
+        """Liste (colonne, nature, imputation, catégorielle, regroupement) pour une table agrégée."""
+        compilees = []
+        for col in colonnes:
+            if col == 'SK_ID_CURR':
+                continue
+            imputation = parametres['imputations'].get(col)
+            nature = self._nature(col, imputation, colonnes_int)
+            categorielle = nature == 'cat' or col in parametres.get('colonnes_binaires', [])
+            compilees.append((col, nature, imputation, categorielle, regroupement(col) if categorielle else None))
+        return compilees
+
+    def _compiler_agregations(self, prefixe, agregations, colonnes):
+        """Liste (colonne, nature, [(fonction, index)]) des agrégations utilisées par le modèle."""
+        natures = {col: nature for col, nature, _, categorielle, _ in colonnes if not categorielle}
+        compilees = []
+        for col, fonctions in agregations.items():
+            if col not in natures:
+                continue
+            sorties = [(f, self.index[f"{prefixe}{col}_{f.upper()}"]) for f in fonctions
+                       if f"{prefixe}{col}_{f.upper()}" in self.index]
+            if sorties:
+                compilees.append((col, natures[col], sorties))
+        return compilees
+
+    # -------------------------------------------------------------------------
+    # Transformation d'un client
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _valeur(brute, nature, imputation):
+        """Valeur après imputation et conversion de type (None si manquante)."""
+        valeur = imputation if est_manquant(brute) else brute
+        if valeur is None:
+            return None
+        if nature == 'cat':
+            return str(valeur)
+        valeur = float(valeur)
+        return int(valeur) if nature == 'int' else valeur
+
+    @staticmethod
+    def _float32(valeur, nature):
+        # reduire_types : float64 → float32
+        return float(np.float32(valeur)) if nature == 'float' and valeur is not None else valeur
+
+    def _preparer_lignes(self, lignes, colonnes):
+        """Applique imputation, conversions et regroupements à chaque ligne d'une table agrégée."""
+        preparees = []
+        for ligne in lignes:
+            preparee = {}
+            for col, nature, imputation, categorielle, regrouper in colonnes:
+                valeur = self._valeur(ligne.get(col), nature, imputation)
+                if categorielle:
+                    # get_dummies(dummy_na=True) nomme les modalités numériques en float ('1.0')
+                    if valeur is not None:
+                        valeur = str(valeur) if nature == 'cat' else str(float(valeur))
+                    if regrouper is not None:
+                        valeur = regrouper(valeur)
+                else:
+                    valeur = self._float32(valeur, nature)
+                preparee[col] = valeur
+            preparees.append(preparee)
+        return preparees
+
+    @staticmethod
+    def _somme_kahan(valeurs, type_flottant):
+        # Sommation compensée, comme les noyaux groupby de pandas
+        somme = compensation = type_flottant(0)
+        for valeur in valeurs:
+            y = type_flottant(type_flottant(valeur) - compensation)
+            t = type_flottant(somme + y)
+            compensation = type_flottant(type_flottant(t - somme) - y)
+            somme = t
+        return somme
+
+    @staticmethod
+    def _variance_welford(valeurs, type_flottant):
+        # Variance (ddof=1) par l'algorithme de Welford, comme groupby().var()
+        n = moyenne = ssqdm = type_flottant(0)
+        for valeur in valeurs:
+            valeur = type_flottant(valeur)
+            n = type_flottant(n + 1)
+            ancienne = moyenne
+            moyenne = type_flottant(moyenne + type_flottant(valeur - ancienne) / n)
+            ssqdm = type_flottant(ssqdm + type_flottant(valeur - moyenne) * type_flottant(valeur - ancienne))
+        return ssqdm / type_flottant(n - 1)
+
+    @classmethod
+    def _agreger(cls, valeurs, fonction, nature):
+        """
+        Reproduit groupby().agg sur un seul client : NaN ignorés, calculs en float32
+        pour les colonnes réduites en float32, en float64 sinon.
+        """
+        valeurs = [v for v in valeurs if v is not None]
+        type_flottant = np.float32 if nature == 'float' else np.float64
+        if fonction == 'sum':
+            return float(cls._somme_kahan(valeurs, type_flottant) if nature == 'float' else sum(valeurs))
+        if len(valeurs) == 0 or (fonction == 'var' and len(valeurs) < 2):
+            return 0.0
+        if fonction == 'min':
+            return float(min(valeurs))
+        if fonction == 'max':
+            return float(max(valeurs))
+        if fonction == 'mean':
+            return float(cls._somme_kahan(valeurs, type_flottant) / type_flottant(len(valeurs)))
+        return float(cls._variance_welford(valeurs, type_flottant))
+
+    def _remplir_agregats(self, x, prefixe, lignes, colonnes, agregations):
+        if not lignes:
+            return
+        for col, nature, sorties in agregations:
+            valeurs = [ligne[col] for ligne in lignes]
+            for fonction, i in sorties:
+                x[i] = self._agreger(valeurs, fonction, nature)
+
+        n = len(lignes)
+        for col, _, _, categorielle, _ in colonnes:
+            if not categorielle:
+                continue
+            effectifs = {}
+            for ligne in lignes:
+                modalite = 'nan' if ligne[col] is None else ligne[col]
+                effectifs[modalite] = effectifs.get(modalite, 0) + 1
+            for modalite, effectif in effectifs.items():
+                i = self.index.get(nettoyer_nom(f"{prefixe}{col}_{modalite}_MEAN"))
+                if i is not None:
+                    x[i] = effectif / n
+
+    def vecteur(self, client, bureau=(), previous=()):
+        """
+        Construit le vecteur de features d'un client.
+
+        - client : dictionnaire colonne → valeur de sa ligne application
+        - bureau / previous : listes de dictionnaires pour ses lignes bureau et previous_application
+        """
+        x = np.zeros(len(self.colonnes_utiles), dtype=np.float64)
+
+        for col, valeur_incoherente in VALEURS_INCOHERENTES_APPLICATION.items():
+            if client.get(col) == valeur_incoherente:
+                raise ValueError(f"Client exclu par le prétraitement ({col} = {valeur_incoherente})")
+
+        for col, nature, imputation, i in self.app_numeriques:
+            valeur = self._float32(self._valeur(client.get(col), nature, imputation), nature)
+            x[i] = 0.0 if valeur is None else valeur
+
+        for col, nature, imputation, regrouper in self.app_categorielles:
+            valeur = self._valeur(client.get(col), nature, imputation)
+            if valeur is None:
+                continue
+            valeur = str(valeur)
+            if regrouper is not None:
+                valeur = regrouper(valeur)
+            i = self.index.get(f"{col}_{valeur}")
+            if i is not None:
+                x[i] = 1.0
+
+        lignes_bureau = [
+            ligne for ligne in self._preparer_lignes(bureau, self.bureau_colonnes)
+            if ligne['CREDIT_ACTIVE'] != 'Bad debt'
+        ]
+        self._remplir_agregats(x, 'BURO_', lignes_bureau, self.bureau_colonnes, self.bureau_agregations)
+
+        lignes_prev = self._preparer_lignes(previous, self.prev_colonnes)
+        self._remplir_agregats(x, 'PREV_', lignes_prev, self.prev_colonnes, self.prev_agregations)
+
+        return x
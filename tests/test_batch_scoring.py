@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+from src.batch_scoring import scorer_fichiers
+from src.conversion import convertir_fichier
+from src.modele import charger_artefacts, scorer
+from src.pipeline import pretraiter, construire_features, aligner_colonnes
+from src.preprocesseur import PreprocesseurCredit
+
+CHEMIN_APP = "tests/sample_data/application_test_sample.csv"
+CHEMIN_BUREAU = "tests/sample_data/bureau_sample.csv"
+CHEMIN_PREV = "tests/sample_data/previous_application_sample.csv"
+
+
+@pytest.fixture(scope="module")
+def preprocesseur():
+    return PreprocesseurCredit().fit(
+        pd.read_csv(CHEMIN_APP), pd.read_csv(CHEMIN_BUREAU), pd.read_csv(CHEMIN_PREV)
+    )
+
+
+def scores_en_memoire(preprocesseur):
+    df_app, df_bureau, df_prev = pretraiter(
+        pd.read_csv(CHEMIN_APP), pd.read_csv(CHEMIN_BUREAU), pd.read_csv(CHEMIN_PREV), preprocesseur
+    )
+    df = construire_features(df_app, df_bureau, df_prev, drop_first=False)
+    model, colonnes_utiles, colonnes_types = charger_artefacts()
+    ids_clients, X = aligner_colonnes(df, colonnes_utiles, colonnes_types)
+    return scorer(model, ids_clients.to_numpy(), X)
+
+
+def test_scoring_par_blocs_identique_au_calcul_en_memoire(tmp_path, preprocesseur):
+    sortie = tmp_path / "scores.csv"
+
+    n = scorer_fichiers(CHEMIN_APP, CHEMIN_BUREAU, CHEMIN_PREV, str(sortie),
+                        taille_bloc=3, chunksize=7, preprocesseur=preprocesseur)
+
+    obtenus = pd.read_csv(sortie)
+    attendus = scores_en_memoire(preprocesseur)
+    assert n == len(attendus)
+    assert obtenus["SK_ID_CURR"].tolist() == attendus["SK_ID_CURR"].tolist()
+    pd.testing.assert_series_equal(obtenus["Score_proba"], attendus["Score_proba"], rtol=1e-9)
+    assert obtenus["Decision"].tolist() == attendus["Decision"].tolist()
+
+
+def test_scoring_par_blocs_parquet(tmp_path, preprocesseur):
+    sortie = tmp_path / "scores.parquet"
+
+    n = scorer_fichiers(CHEMIN_APP, CHEMIN_BUREAU, CHEMIN_PREV, str(sortie),
+                        taille_bloc=4, preprocesseur=preprocesseur)
+
+    assert len(pd.read_parquet(sortie)) == n
+
+
+def test_scoring_parallele_identique_au_scoring_sequentiel(tmp_path, preprocesseur):
+    sequentiel, parallele = tmp_path / "sequentiel.csv", tmp_path / "parallele.csv"
+
+    scorer_fichiers(CHEMIN_APP, CHEMIN_BUREAU, CHEMIN_PREV, str(sequentiel),
+                    taille_bloc=3, chunksize=7, preprocesseur=preprocesseur)
+    n = scorer_fichiers(CHEMIN_APP, CHEMIN_BUREAU, CHEMIN_PREV, str(parallele),
+                        taille_bloc=3, chunksize=7, preprocesseur=preprocesseur, processus=2)
+
+    assert n == len(pd.read_csv(CHEMIN_APP))
+    pd.testing.assert_frame_equal(pd.read_csv(parallele), pd.read_csv(sequentiel), check_exact=True)
+
+
+def test_scoring_par_blocs_matrice_creuse(tmp_path, preprocesseur):
+    dense, creuse = tmp_path / "dense.csv", tmp_path / "creuse.csv"
+
+    scorer_fichiers(CHEMIN_APP, CHEMIN_BUREAU, CHEMIN_PREV, str(dense),
+                    taille_bloc=3, chunksize=7, preprocesseur=preprocesseur)
+    scorer_fichiers(CHEMIN_APP, CHEMIN_BUREAU, CHEMIN_PREV, str(creuse),
+                    taille_bloc=3, chunksize=7, preprocesseur=preprocesseur, creuse=True)
+
+    pd.testing.assert_frame_equal(pd.read_csv(creuse), pd.read_csv(dense), check_exact=True)
+
+
+def test_scoring_par_blocs_entrees_parquet_et_arrow(tmp_path, preprocesseur):
+    reference = tmp_path / "reference.csv"
+    scorer_fichiers(CHEMIN_APP, CHEMIN_BUREAU, CHEMIN_PREV, str(reference),
+                    taille_bloc=3, chunksize=7, preprocesseur=preprocesseur)
+
+    for format, extension in [("parquet", ".parquet"), ("arrow", ".arrow")]:
+        chemins = []
+        for chemin_csv in [CHEMIN_APP, CHEMIN_BUREAU, CHEMIN_PREV]:
+            chemin = tmp_path / (chemin_csv.split("/")[-1][:-len(".csv")] + extension)
+            convertir_fichier(chemin_csv, str(chemin), format)
+            chemins.append(str(chemin))
+        sortie = tmp_path / f"scores_{format}.csv"
+        scorer_fichiers(*chemins, str(sortie), taille_bloc=3, chunksize=7, preprocesseur=preprocesseur)
+
+        pd.testing.assert_frame_equal(pd.read_csv(sortie), pd.read_csv(reference))
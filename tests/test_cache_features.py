@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+import src.cache_features
+from src.cache_features import matrice_features, construire_matrice
+from src.modele import charger_modele, predire_probas
+
+CHEMINS = [
+    "tests/sample_data/application_test_sample.csv",
+    "tests/sample_data/bureau_sample.csv",
+    "tests/sample_data/previous_application_sample.csv"
+]
+
+
+def test_matrice_relue_sans_pipeline(tmp_path, monkeypatch):
+    ids_attendus, X_attendu = construire_matrice(*CHEMINS)
+
+    ids, X, trouve = matrice_features(*CHEMINS, dossier_cache=str(tmp_path))
+    assert not trouve
+
+    def pipeline_interdit(*args, **kwargs):
+        raise AssertionError("le pipeline ne doit pas être relancé")
+
+    monkeypatch.setattr(src.cache_features, "construire_matrice", pipeline_interdit)
+    ids_relus, X_relu, trouve = matrice_features(*CHEMINS, dossier_cache=str(tmp_path))
+
+    assert trouve
+    # Vue en lecture seule sur le fichier : aucune copie
+    assert not X_relu.to_numpy().flags.writeable
+    assert ids_relus.tolist() == ids_attendus.tolist()
+    assert X_relu.columns.tolist() == X_attendu.columns.tolist()
+    # Aucune valeur arrondie : les colonnes float64 ne sont pas réduites en float32
+    assert (X_attendu.dtypes == np.float64).any() and X_relu.dtypes.iloc[0] == np.float64
+    np.testing.assert_array_equal(X_relu.to_numpy(), X_attendu.to_numpy(dtype=np.float64))
+
+    model = charger_modele()
+    np.testing.assert_array_equal(predire_probas(model, X_relu), predire_probas(model, X_attendu))
+
+
+def test_empreinte_change_avec_les_entrees(tmp_path):
+    copie = tmp_path / "application.csv"
+    df = pd.read_csv(CHEMINS[0])
+    df.to_csv(copie, index=False)
+    cle = src.cache_features.empreinte([str(copie), *CHEMINS[1:]])
+
+    df.loc[0, "AMT_CREDIT"] += 1
+    df.to_csv(copie, index=False)
+    assert src.cache_features.empreinte([str(copie), *CHEMINS[1:]]) != cle
+    assert src.cache_features.empreinte([str(copie), *CHEMINS[1:]], drop_first=False) != cle
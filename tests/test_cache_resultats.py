@@ -0,0 +1,49 @@
+import io
+
+from src.cache_resultats import CacheLRU, empreinte_flux
+
+
+class Horloge:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_eviction_lru_par_nombre_et_par_taille():
+    cache = CacheLRU(max_entrees=2, ttl_s=60, max_octets=10, taille=len)
+    cache.put("a", "xxx")
+    cache.put("b", "xxx")
+    assert cache.get("a") == "xxx"
+    cache.put("c", "xxx")
+    assert cache.get("b") is None
+    assert cache.get("a") == "xxx"
+
+    cache.put("d", "xxxxxxxx")
+    assert cache.get("a") is None and cache.get("c") is None
+    metriques = cache.metriques()
+    assert metriques["entrees"] == 1 and metriques["octets"] == 8
+    assert metriques["evictions"] == 3
+
+
+def test_expiration_ttl():
+    horloge = Horloge()
+    cache = CacheLRU(ttl_s=10, horloge=horloge)
+    cache.put("a", 1)
+    horloge.t = 5
+    assert cache.get("a") == 1
+    horloge.t = 11
+    assert cache.get("a") is None
+    assert cache.metriques()["expirations"] == 1
+    assert cache.metriques()["hits"] == 1 and cache.metriques()["misses"] == 1
+
+
+def test_empreinte_flux():
+    flux = io.BytesIO(b"SK_ID_CURR\n1\n")
+    cle = empreinte_flux(flux, None, extra=("v1",))
+    assert flux.tell() == 0
+    assert empreinte_flux(io.BytesIO(b"SK_ID_CURR\n1\n"), None, extra=("v1",)) == cle
+    assert empreinte_flux(io.BytesIO(b"SK_ID_CURR\n2\n"), None, extra=("v1",)) != cle
+    assert empreinte_flux(flux, None, extra=("v2",)) != cle
+    assert empreinte_flux(None, flux, extra=("v1",)) != cle
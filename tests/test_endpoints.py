@@ -0,0 +1,338 @@
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main
+from api.main import app
+from src.cache_features import construire_matrice
+from src.explication_globale import calculer_explication_globale
+from src.pool_calcul import PoolCalcul
+from src.preprocesseur import PreprocesseurCredit
+from src.scoring_rapide import PlanScoring
+
+client = TestClient(app)
+
+SK_ID_CURR = 102545
+
+
+@pytest.fixture(autouse=True)
+def cache_vide():
+    # Certains tests remplacent le préprocesseur : pas de lot préparé par un autre test
+    api.main.cache_lots.vider()
+
+
+@pytest.fixture(scope="module")
+def preprocesseur_ajuste():
+    return PreprocesseurCredit().fit(*[
+        pd.read_csv(f"tests/sample_data/{nom}_sample.csv")
+        for nom in ["application_test", "bureau", "previous_application"]
+    ])
+
+
+def fichiers():
+    return {
+        "application_test": open("tests/sample_data/application_test_sample.csv", "rb"),
+        "bureau": open("tests/sample_data/bureau_sample.csv", "rb"),
+        "previous_application": open("tests/sample_data/previous_application_sample.csv", "rb")
+    }
+
+
+def test_score_sans_shap():
+    response = client.post("/score", files=fichiers())
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {"predictions"}
+    assert len(body["predictions"]) == 10
+
+
+def test_schema_compte_les_lignes_alignees():
+    avant = client.get("/schema").json()
+    assert client.post("/score", files=fichiers()).status_code == 200
+    apres = client.get("/schema").json()
+
+    assert apres["lignes"] - avant["lignes"] == 10
+    assert apres["colonnes_modele"] == len(api.main.colonnes_utiles)
+    assert apres["nombre_variables_absentes"] + apres["nombre_modalites_absentes"] > 0
+
+
+def test_explain_coherent_avec_upload():
+    upload = client.post("/upload", files=fichiers(), data={"sk_id_curr": SK_ID_CURR, "graphiques": "png"}).json()
+    explain = client.post("/explain", files=fichiers(), data={"sk_id_curr": SK_ID_CURR, "graphiques": "png"})
+    assert explain.status_code == 200
+    body = explain.json()
+
+    attendu = next(p for p in upload["predictions"] if p["SK_ID_CURR"] == SK_ID_CURR)
+    assert np.isclose(body["prediction"]["Score_proba"], attendu["Score_proba"])
+    assert body["prediction"]["Decision"] == attendu["Decision"]
+    assert body["shap_force_plot"] is not None
+    assert body["infos_contextuelles"] == upload["infos_contextuelles"]
+
+
+def test_explain_sk_id_invalide():
+    response = client.post("/explain", files=fichiers(), data={"sk_id_curr": 999999999})
+    assert response.status_code == 400
+
+
+def test_score_un_client():
+    complet = client.post("/score", files=fichiers()).json()
+    response = client.post("/score", files=fichiers(), data={"sk_id_curr": SK_ID_CURR})
+    assert response.status_code == 200
+    predictions = response.json()["predictions"]
+    assert len(predictions) == 1
+    attendu = next(p for p in complet["predictions"] if p["SK_ID_CURR"] == SK_ID_CURR)
+    assert np.isclose(predictions[0]["Score_proba"], attendu["Score_proba"])
+
+
+def test_ready_apres_chargement_du_modele():
+    with TestClient(app) as client_demarre:
+        api.main.modele_servi.model
+        response = client_demarre.get("/ready")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["pret"] is True
+    assert "modele" in body["durees_chargement_s"]
+
+
+def demandeurs_json():
+    """Demandeurs de l'échantillon au format JSON de /score/json (valeurs manquantes → null)."""
+    tables = [
+        json.loads(pd.read_csv(f"tests/sample_data/{nom}_sample.csv").to_json(orient="records"))
+        for nom in ["application_test", "bureau", "previous_application"]
+    ]
+    return [
+        {
+            "application": app,
+            "bureau": [ligne for ligne in tables[1] if ligne["SK_ID_CURR"] == app["SK_ID_CURR"]],
+            "previous_application": [ligne for ligne in tables[2] if ligne["SK_ID_CURR"] == app["SK_ID_CURR"]]
+        }
+        for app in tables[0]
+    ]
+
+
+def test_score_json_lot_identique_au_csv(monkeypatch, preprocesseur_ajuste):
+    # Pipeline pandas (sans plan compilé), avec les paramètres du préprocesseur ajusté
+    monkeypatch.setattr(api.main, "preprocesseur", preprocesseur_ajuste)
+    monkeypatch.setattr(api.main, "plan_scoring", None)
+    attendu = client.post("/score", files=fichiers()).json()
+    response = client.post("/score/json/lot", json={"demandeurs": demandeurs_json()})
+    assert response.status_code == 200
+    assert response.json() == attendu
+
+    # Un seul demandeur : mêmes features que dans le lot complet
+    demandeur = next(d for d in demandeurs_json() if d["application"]["SK_ID_CURR"] == SK_ID_CURR)
+    seul = client.post("/score/json", json=demandeur).json()["predictions"]
+    assert seul == [p for p in attendu["predictions"] if p["SK_ID_CURR"] == SK_ID_CURR]
+
+
+def test_score_json_un_demandeur_plan_compile(monkeypatch, preprocesseur_ajuste):
+    monkeypatch.setattr(api.main, "preprocesseur", preprocesseur_ajuste)
+    monkeypatch.setattr(
+        api.main, "plan_scoring", PlanScoring(api.main.colonnes_utiles, api.main.colonnes_types, preprocesseur_ajuste)
+    )
+    demandeur = next(d for d in demandeurs_json() if d["application"]["SK_ID_CURR"] == SK_ID_CURR)
+
+    avant = client.get("/micro-batching").json()
+    attendu = client.post("/score", files=fichiers(), data={"sk_id_curr": SK_ID_CURR}).json()
+    response = client.post("/score/json", json=demandeur)
+    assert response.status_code == 200
+    assert response.json() == attendu
+    # Les deux vecteurs construits par le plan passent par le regroupeur
+    assert client.get("/micro-batching").json()["demandes"] - avant["demandes"] == 2
+
+
+def test_score_un_client_sans_plan_par_le_regroupeur(monkeypatch):
+    monkeypatch.setattr(api.main, "plan_scoring", None)
+    avant = client.get("/micro-batching").json()
+
+    # Pipeline pandas, puis lot en cache sans probabilités calculées : ligne du client regroupée
+    seul = client.post("/score", files=fichiers(), data={"sk_id_curr": SK_ID_CURR}).json()["predictions"]
+    client.post("/explain", files=fichiers(), data={"sk_id_curr": SK_ID_CURR})
+    autre = client.post("/score", files=fichiers(), data={"sk_id_curr": 111343}).json()["predictions"]
+    assert client.get("/micro-batching").json()["demandes"] - avant["demandes"] == 2
+
+    # Probabilités du lot déjà calculées : lues sans nouveau scoring
+    complet = client.post("/score", files=fichiers()).json()["predictions"]
+    assert seul == [p for p in complet if p["SK_ID_CURR"] == SK_ID_CURR]
+    assert autre == [p for p in complet if p["SK_ID_CURR"] == 111343]
+    assert client.post("/score", files=fichiers(), data={"sk_id_curr": SK_ID_CURR}).json()["predictions"] == seul
+    assert client.get("/micro-batching").json()["demandes"] - avant["demandes"] == 2
+
+
+def test_score_json_sans_preprocesseur(monkeypatch):
+    monkeypatch.setattr(api.main, "preprocesseur", None)
+    monkeypatch.setattr(api.main, "plan_scoring", None)
+    demandeurs = demandeurs_json()
+    demandeur = next(d for d in demandeurs if d["application"]["SK_ID_CURR"] == SK_ID_CURR)
+
+    response = client.post("/score/json", json=demandeur)
+    assert response.status_code == 503
+    assert "préprocesseur ajusté requis" in response.json()["detail"]
+    assert client.post("/score/json/lot", json={"demandeurs": demandeurs[:2]}).status_code == 503
+
+
+def test_score_json_type_invalide():
+    demandeur = demandeurs_json()[0]
+    demandeur["application"]["AMT_CREDIT"] = "beaucoup"
+    assert client.post("/score/json", json=demandeur).status_code == 422
+
+
+def test_filtrage_sans_preprocesseur(monkeypatch):
+    monkeypatch.setattr(api.main, "preprocesseur", None)
+    complet = client.post("/upload", files=fichiers(), data={"sk_id_curr": SK_ID_CURR}).json()["predictions"]
+    attendu = next(p for p in complet if p["SK_ID_CURR"] == SK_ID_CURR)
+
+    response = client.post("/upload", files=fichiers(), data={"sk_id_curr": SK_ID_CURR, "filtrer": True})
+    assert response.status_code == 200
+    assert response.json()["predictions"] == [attendu]
+
+    response = client.post("/score", files=fichiers(), data={"ids_clients": f"{SK_ID_CURR},111343"})
+    assert response.status_code == 200
+    attendus = [p for p in complet if p["SK_ID_CURR"] in (SK_ID_CURR, 111343)]
+    assert sorted(response.json()["predictions"], key=lambda p: p["SK_ID_CURR"]) == \
+        sorted(attendus, key=lambda p: p["SK_ID_CURR"])
+
+
+def test_upload_filtre_sur_le_client(monkeypatch, preprocesseur_ajuste):
+    monkeypatch.setattr(api.main, "preprocesseur", preprocesseur_ajuste)
+    monkeypatch.setattr(
+        api.main, "plan_scoring", PlanScoring(api.main.colonnes_utiles, api.main.colonnes_types, preprocesseur_ajuste)
+    )
+
+    attendu = client.post("/score", files=fichiers(), data={"sk_id_curr": SK_ID_CURR}).json()["predictions"][0]
+    response = client.post("/upload", files=fichiers(), data={"sk_id_curr": SK_ID_CURR, "filtrer": True})
+    assert response.status_code == 200
+    predictions = response.json()["predictions"]
+    assert [p["SK_ID_CURR"] for p in predictions] == [SK_ID_CURR]
+    assert np.isclose(predictions[0]["Score_proba"], attendu["Score_proba"])
+
+    autres = client.post("/score", files=fichiers(), data={"ids_clients": f"{SK_ID_CURR},111343"}).json()["predictions"]
+    assert sorted(p["SK_ID_CURR"] for p in autres) == sorted([SK_ID_CURR, 111343])
+
+
+def fichiers_parquet():
+    contenus = {}
+    for nom, fichier in fichiers().items():
+        tampon = io.BytesIO()
+        pd.read_csv(fichier).to_parquet(tampon, index=False)
+        contenus[nom] = tampon.getvalue()
+    return contenus
+
+
+def test_score_parquet_identique_au_csv():
+    attendu = client.post("/score", files=fichiers()).json()["predictions"]
+    response = client.post("/score", files=fichiers_parquet())
+    assert response.status_code == 200
+    predictions = response.json()["predictions"]
+    assert [p["SK_ID_CURR"] for p in predictions] == [p["SK_ID_CURR"] for p in attendu]
+    assert np.allclose([p["Score_proba"] for p in predictions], [p["Score_proba"] for p in attendu])
+
+    un_client = client.post("/score", files=fichiers_parquet(), data={"ids_clients": str(SK_ID_CURR)})
+    assert [p["SK_ID_CURR"] for p in un_client.json()["predictions"]] == [SK_ID_CURR]
+
+
+def test_meme_fichiers_autre_client_servi_par_le_cache(monkeypatch):
+    avant = client.get("/cache").json()
+    premier = client.post("/explain", files=fichiers(), data={"sk_id_curr": SK_ID_CURR}).json()
+
+    def pipeline_interdit(*args, **kwargs):
+        raise AssertionError("le lot doit être lu dans le cache")
+
+    monkeypatch.setattr(api.main, "preparer_donnees", pipeline_interdit)
+    identique = client.post("/explain", files=fichiers(), data={"sk_id_curr": SK_ID_CURR}).json()
+    autre = client.post("/explain", files=fichiers(), data={"sk_id_curr": 111343})
+    upload = client.post("/upload", files=fichiers(), data={"sk_id_curr": 111343})
+
+    assert identique == premier
+    assert autre.status_code == 200 and upload.status_code == 200
+    attendu = next(p for p in upload.json()["predictions"] if p["SK_ID_CURR"] == 111343)
+    assert np.isclose(autre.json()["prediction"]["Score_proba"], attendu["Score_proba"])
+    metriques = client.get("/cache").json()
+    assert metriques["misses"] - avant["misses"] == 1
+    assert metriques["hits"] - avant["hits"] == 3
+
+
+def test_explications_json_sans_png(monkeypatch):
+    monkeypatch.setattr(api.main, "explication_globale", None)
+    upload = client.post("/upload", files=fichiers(), data={"sk_id_curr": SK_ID_CURR, "top_k": 5})
+    explain = client.post("/explain", files=fichiers(), data={"sk_id_curr": SK_ID_CURR, "top_k": 5}).json()
+    assert upload.status_code == 200
+    body = upload.json()
+    assert body["shap_summary_plot"] is None and body["shap_force_plot"] is None
+    assert len(body["resume_global"]["features"]) == 5
+    assert body["resume_global"]["nombre_clients"] == len(body["predictions"])
+    assert body["resume_global"]["source"] == "lot"
+
+    explication = explain["explication"]
+    assert explication == body["explication"]
+    assert len(explication["contributions"]) == 5
+    total = sum(c["contribution"] for c in explication["contributions"]) + explication["autres_contributions"]
+    assert np.isclose(total, sum(explain["shap_values"].values()))
+    proba = explain["prediction"]["Score_proba"]
+    assert np.isclose(explication["valeur_base"] + total, np.log(proba / (1 - proba)))
+
+    assert client.post("/explain", files=fichiers(), data={"sk_id_curr": SK_ID_CURR, "graphiques": "svg"}).status_code == 400
+
+
+def test_explication_globale_precalculee(monkeypatch):
+    _, X = construire_matrice(*[
+        f"tests/sample_data/{nom}_sample.csv" for nom in ["application_test", "bureau", "previous_application"]
+    ])
+    modele_servi = api.main.modele_servi
+    reference = calculer_explication_globale(
+        modele_servi.model, X, modele_servi.version, population={"table": "application_test_sample.csv"}
+    )
+    monkeypatch.setattr(api.main, "explication_globale", reference)
+
+    globale = client.get("/global-explanation", params={"top_k": 3}).json()
+    assert [f["feature"] for f in globale["features"]] == [f["feature"] for f in reference["features"][:3]]
+    assert sum(b["effectif"] for b in globale["features"][0]["distribution"]) == len(X)
+
+    upload = client.post("/upload", files=fichiers(), data={"sk_id_curr": SK_ID_CURR, "top_k": 3}).json()
+    assert upload["resume_global"]["source"] == "reference"
+    assert upload["resume_global"]["features"][0] == {
+        cle: valeur for cle, valeur in globale["features"][0].items() if cle not in ("quantiles_contribution", "distribution")
+    }
+
+    monkeypatch.setattr(api.main, "explication_globale", {**reference, "version_modele": "autre"})
+    assert client.get("/global-explanation").status_code == 404
+
+
+def test_pool_sature_503(monkeypatch):
+    pool = PoolCalcul(travailleurs=1, file_max=0)
+    monkeypatch.setattr(api.main, "pool_calcul", pool)
+    pool.admis = 1  # seul travailleur occupé
+
+    reponse = client.post("/score", files=fichiers(), data={"sk_id_curr": SK_ID_CURR})
+    assert reponse.status_code == 503 and reponse.headers["retry-after"] == "1"
+    assert client.get("/pool").json()["rejets"] == 1
+
+    pool.admis = 0
+    assert client.post("/score", files=fichiers(), data={"sk_id_curr": SK_ID_CURR}).status_code == 200
+
+
+
+def test_lot_partage_shap_calcule_une_seule_fois(monkeypatch):
+    appels = []
+
+    class Explicateur:
+        def shap_values(self, X):
+            appels.append(len(X))
+            time.sleep(0.05)
+            return np.zeros(X.shape)
+
+    class Servi:
+        explainer = Explicateur()
+
+    monkeypatch.setattr(api.main, "modele_servi", Servi())
+    lot = api.main.LotPrepare(pd.DataFrame(), pd.Series([1, 2]), pd.DataFrame(np.ones((2, 3))))
+    with ThreadPoolExecutor(max_workers=4) as executeur:
+        resumes = list(executeur.map(lambda _: lot.memoriser("resume", lambda: lot.shap_tous().sum()), range(4)))
+
+    assert appels == [2]
+    assert resumes == [0.0] * 4
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from src.explications import explication_locale, resume_global
+
+
+def test_explication_locale_top_k_et_reste():
+    contributions = np.array([0.1, -0.5, 0.02, 0.3, -0.01])
+    explication = explication_locale(contributions, [1.0, np.nan, 3.0, 4.5, 0.0], list("abcde"), -2.0, k=2)
+
+    assert [c["feature"] for c in explication["contributions"]] == ["b", "d"]
+    assert explication["contributions"][0]["valeur"] is None
+    assert explication["contributions"][1] == {"feature": "d", "valeur": 4.5, "contribution": 0.3}
+    total = sum(c["contribution"] for c in explication["contributions"]) + explication["autres_contributions"]
+    assert np.isclose(total, contributions.sum())
+    assert explication["nombre_features"] == 5
+
+
+def test_resume_global_importance_et_sens():
+    X = pd.DataFrame({"a": [1.0, 2.0, 3.0], "b": [5.0, 5.0, 5.0], "c": [3.0, 2.0, 1.0]})
+    contributions = np.array([[0.1, 0.0, 1.0], [0.2, 0.0, 0.0], [0.3, 0.0, -1.0]])
+
+    resume = resume_global(contributions, X, k=2)
+
+    assert resume["nombre_clients"] == 3
+    assert [f["feature"] for f in resume["features"]] == ["c", "a"]
+    assert np.isclose(resume["features"][0]["correlation_valeur_contribution"], 1.0)
+    assert np.isclose(resume["features"][1]["contribution_moyenne_abs"], 0.2)
+
+
+def test_resume_global_distributions():
+    X = pd.DataFrame({"a": [1.0, 2.0, np.nan, 4.0], "b": [0.0, 0.0, 0.0, 0.0]})
+    contributions = np.array([[-1.0, 0.0], [-0.5, 0.0], [0.0, 0.0], [1.0, 0.0]])
+
+    resume = resume_global(contributions, X, k=None, distributions=True, n_intervalles=2)
+
+    assert [f["feature"] for f in resume["features"]] == ["a", "b"]
+    a = resume["features"][0]
+    assert a["quantiles_contribution"]["p50"] == -0.25
+    assert [b["effectif"] for b in a["distribution"]] == [2, 2]
+    # Valeurs basses dans l'intervalle des contributions négatives, la valeur manquante ignorée
+    assert a["distribution"][0]["valeur_relative_moyenne"] < a["distribution"][1]["valeur_relative_moyenne"]
+    assert resume["features"][1]["distribution"] == [{"contribution": 0.0, "effectif": 4, "valeur_relative_moyenne": 0.5}]
+
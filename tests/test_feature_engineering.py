@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from src.feature_engineering import (
+    agreger_par_client, tri_stable, feature_engineering_bureau, AGREGATIONS_BUREAU, one_hot_encoder,
+    vocabulaire_one_hot
+)
+from src.pipeline import pretraiter
+
+
+def test_tri_stable_identique_a_argsort():
+    rng = np.random.default_rng(0)
+    for cles in [rng.integers(0, 5, 1000), rng.integers(-2 ** 40, 2 ** 40, 5000), np.array([], dtype=np.int64)]:
+        np.testing.assert_array_equal(tri_stable(cles), np.argsort(cles, kind='stable'))
+
+
+def test_agreger_par_client_identique_a_groupby():
+    rng = np.random.default_rng(0)
+    n = 5000
+    df = pd.DataFrame({
+        'SK_ID_CURR': rng.integers(0, 700, n),
+        'f32': (rng.normal(size=n) * 1e5).astype('float32'),
+        'f64': rng.normal(size=n) * 1e3,
+        'i16': rng.integers(-3000, 0, n).astype('int16'),
+        'b': rng.random(n) < 0.3,
+    })
+    df.loc[rng.random(n) < 0.1, 'f32'] = np.nan
+    df.loc[rng.random(n) < 0.05, 'f64'] = np.nan
+    df.loc[3, 'f64'] = np.inf
+    # Sommes int8 dépassant 127 pour les clients qui ont beaucoup de lignes
+    df['i8'] = rng.integers(0, 40, n).astype('int8')
+    df['i8_petit'] = (rng.random(n) < 0.01).astype('int8')
+    toutes = ['min', 'max', 'mean', 'var', 'sum']
+    agregations = {'f32': toutes, 'f64': toutes, 'i16': toutes, 'b': ['mean'], 'i8': ['sum'], 'i8_petit': ['sum']}
+
+    attendu = df.groupby('SK_ID_CURR').agg(agregations)
+    assert attendu[('i8', 'sum')].max() > 127 and attendu[('i8', 'sum')].dtype == np.int64
+    assert attendu[('i8_petit', 'sum')].dtype == np.int8
+    pd.testing.assert_frame_equal(agreger_par_client(df, agregations), attendu, check_exact=True)
+
+
+def test_feature_engineering_bureau_identique_a_groupby():
+    _, bureau_df, _ = pretraiter(
+        pd.read_csv("tests/sample_data/application_test_sample.csv"),
+        pd.read_csv("tests/sample_data/bureau_sample.csv"),
+        pd.read_csv("tests/sample_data/previous_application_sample.csv")
+    )
+    obtenu = feature_engineering_bureau(bureau_df)
+
+    df, categories = one_hot_encoder(bureau_df)
+    attendu = df.groupby('SK_ID_CURR').agg({**AGREGATIONS_BUREAU, **{cat: ['mean'] for cat in categories}})
+    attendu.columns = pd.Index(['BURO_' + e[0] + '_' + e[1].upper() for e in attendu.columns.tolist()])
+    pd.testing.assert_frame_equal(obtenu, attendu.reset_index(), check_exact=True)
+
+
+def test_one_hot_vocabulaire_fige_independant_du_lot():
+    _, _, previous_df = pretraiter(
+        pd.read_csv("tests/sample_data/application_test_sample.csv"),
+        pd.read_csv("tests/sample_data/bureau_sample.csv"),
+        pd.read_csv("tests/sample_data/previous_application_sample.csv"),
+        categoriel=True
+    )
+    vocabulaire = vocabulaire_one_hot(previous_df)
+    attendu, colonnes_lot = one_hot_encoder(previous_df)
+
+    # Même encodage que get_dummies sur le lot complet
+    obtenu, colonnes = one_hot_encoder(previous_df, vocabulaire=vocabulaire)
+    assert colonnes == colonnes_lot
+    pd.testing.assert_frame_equal(obtenu, attendu)
+
+    # Une seule ligne : toutes les colonnes du vocabulaire, valeurs de la ligne du lot complet
+    ligne, colonnes_ligne = one_hot_encoder(previous_df.iloc[[3]], vocabulaire=vocabulaire)
+    assert colonnes_ligne == colonnes and len(one_hot_encoder(previous_df.iloc[[3]])[1]) < len(colonnes)
+    pd.testing.assert_frame_equal(ligne, attendu.iloc[[3]])
+
+    # Modalité inconnue du vocabulaire : aucune indicatrice
+    inconnue = previous_df.iloc[[3]].copy()
+    inconnue['NAME_PORTFOLIO'] = pd.Categorical(['Inconnue'])
+    encodee, _ = one_hot_encoder(inconnue, vocabulaire=vocabulaire)
+    assert not encodee[vocabulaire['NAME_PORTFOLIO']].to_numpy().any()
+
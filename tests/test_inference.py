@@ -0,0 +1,52 @@
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from src.cache_features import construire_matrice
+from src.inference import BoosterContigu, ForetCompilee, creer_moteur_inference, ecart_maximal
+from src.modele import DOSSIER_MODELES, NOM_FICHIER_MODELE, charger_modele
+
+
+@pytest.fixture(scope="module")
+def classifieur():
+    import pickle
+    with open(f"{DOSSIER_MODELES}/{NOM_FICHIER_MODELE}", "rb") as f:
+        return pickle.load(f)
+
+
+def test_moteurs_identiques_a_predict_proba(classifieur):
+    _, X = construire_matrice(*[
+        f"tests/sample_data/{nom}_sample.csv" for nom in ["application_test", "bureau", "previous_application"]
+    ])
+    rng = np.random.default_rng(0)
+    aleatoire = pd.DataFrame(rng.normal(size=(300, X.shape[1])) * 1000, columns=X.columns)
+    aleatoire = aleatoire.mask(rng.random(aleatoire.shape) < 0.2)
+
+    for moteur in [ForetCompilee(classifieur), BoosterContigu(classifieur), BoosterContigu(classifieur, num_threads=1)]:
+        assert ecart_maximal(classifieur, X, moteur) < 1e-6
+        assert ecart_maximal(classifieur, aleatoire, moteur) < 1e-6
+        assert ecart_maximal(classifieur, X.iloc[[0]], moteur) < 1e-6
+        assert ecart_maximal(classifieur, sparse.csr_matrix(X.to_numpy()), moteur) < 1e-6
+
+
+def test_foret_valeurs_manquantes_nan_et_zero():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(2000, 4))
+    y = (X[:, 0] + np.where(np.isnan(X[:, 1]), 1, X[:, 1]) > 0).astype(int)
+    X[rng.random(X.shape) < 0.2] = np.nan
+    X[rng.random(X.shape) < 0.1] = 0.0
+    test = np.vstack([X[:200], [[np.nan, np.nan, 0.0, 0.0]]])
+
+    for zero_as_missing in [False, True]:
+        booster = lgb.train(
+            {"objective": "binary", "num_leaves": 8, "verbose": -1, "zero_as_missing": zero_as_missing},
+            lgb.Dataset(X, y), num_boost_round=20
+        )
+        np.testing.assert_allclose(ForetCompilee(booster).predict(test), booster.predict(test), atol=1e-12)
+
+
+def test_moteur_inconnu():
+    with pytest.raises(ValueError, match="inconnu"):
+        creer_moteur_inference(charger_modele(), "onnx")
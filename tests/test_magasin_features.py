@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import api.main
+from src.feature_engineering import feature_engineering_bureau, feature_engineering_previous
+from src.magasin_features import MagasinFeatures
+from src.pipeline import pretraiter
+from src.preprocesseur import PreprocesseurCredit
+
+
+def charger_echantillons():
+    return (
+        pd.read_csv("tests/sample_data/application_test_sample.csv"),
+        pd.read_csv("tests/sample_data/bureau_sample.csv"),
+        pd.read_csv("tests/sample_data/previous_application_sample.csv")
+    )
+
+
+def comparer_agregats(obtenu, attendu):
+    attendu = attendu.set_index('SK_ID_CURR').astype('float64')
+    obtenu = obtenu.set_index('SK_ID_CURR').loc[attendu.index.astype(np.int64)]
+    assert set(obtenu.columns) == set(attendu.columns)
+    np.testing.assert_array_equal(obtenu[attendu.columns].to_numpy(), attendu.to_numpy())
+
+
+def test_mises_a_jour_incrementales_identiques_au_calcul_complet(tmp_path):
+    df_app, df_bureau, df_prev = charger_echantillons()
+    preprocesseur = PreprocesseurCredit().fit(df_app, df_bureau, df_prev)
+    magasin = MagasinFeatures(tmp_path / "magasin.sqlite", preprocesseur)
+
+    # Les lignes arrivent en deux fois : les clients déjà connus sont recalculés
+    moitie_bureau, tiers_prev = len(df_bureau) // 2, len(df_prev) // 3
+    magasin.mettre_a_jour(df_bureau.iloc[:moitie_bureau], df_prev.iloc[:tiers_prev])
+    magasin.mettre_a_jour(df_bureau.iloc[moitie_bureau:], df_prev.iloc[tiers_prev:])
+
+    _, bureau_pretraite, prev_pretraite = pretraiter(df_app, df_bureau, df_prev, preprocesseur)
+    bureau_agg, previous_agg = magasin.lire(df_app['SK_ID_CURR'])
+    comparer_agregats(bureau_agg, feature_engineering_bureau(bureau_pretraite))
+    comparer_agregats(previous_agg, feature_engineering_previous(prev_pretraite))
+
+
+def test_ligne_remplacee_par_son_identifiant(tmp_path):
+    df_app, df_bureau, df_prev = charger_echantillons()
+    preprocesseur = PreprocesseurCredit().fit(df_app, df_bureau, df_prev)
+    magasin = MagasinFeatures(tmp_path / "magasin.sqlite", preprocesseur)
+    magasin.mettre_a_jour(df_bureau)
+
+    ligne = df_bureau.iloc[[0]].copy()
+    ligne['AMT_CREDIT_SUM'] += 1000
+    magasin.mettre_a_jour(ligne)
+
+    bureau_modifie = pd.concat([df_bureau.iloc[1:], ligne], ignore_index=True)
+    _, bureau_pretraite, _ = pretraiter(df_app, bureau_modifie, df_prev, preprocesseur)
+    comparer_agregats(magasin.lire(df_app['SK_ID_CURR'])[0], feature_engineering_bureau(bureau_pretraite))
+
+
+def test_score_depuis_le_magasin(tmp_path, monkeypatch):
+    df_app, df_bureau, df_prev = charger_echantillons()
+    preprocesseur = PreprocesseurCredit().fit(df_app, df_bureau, df_prev)
+    magasin = MagasinFeatures(tmp_path / "magasin.sqlite", preprocesseur)
+    magasin.mettre_a_jour(df_bureau, df_prev)
+    monkeypatch.setattr(api.main, "preprocesseur", preprocesseur)
+    monkeypatch.setattr(api.main, "plan_scoring", None)
+    monkeypatch.setattr(api.main, "magasin_features", magasin)
+
+    client = TestClient(api.main.app)
+    fichiers = {
+        "application_test": open("tests/sample_data/application_test_sample.csv", "rb"),
+        "bureau": open("tests/sample_data/bureau_sample.csv", "rb"),
+        "previous_application": open("tests/sample_data/previous_application_sample.csv", "rb")
+    }
+    complet = client.post("/score", files=fichiers).json()
+    response = client.post("/score", files={"application_test": open("tests/sample_data/application_test_sample.csv", "rb")})
+    assert response.status_code == 200
+    assert response.json() == complet
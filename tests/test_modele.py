@@ -0,0 +1,50 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from src.cache_features import construire_matrice
+from src.modele import (
+    DOSSIER_MODELES, NOM_FICHIER_MODELE, charger_modele, creer_explicateur, ecart_explicateurs,
+    exporter_booster, predire_probas, ModeleServi
+)
+
+
+def test_booster_natif_identique_au_modele_pickle(tmp_path):
+    shutil.copy(f"{DOSSIER_MODELES}/{NOM_FICHIER_MODELE}", tmp_path / NOM_FICHIER_MODELE)
+    model = charger_modele(tmp_path)
+    exporter_booster(tmp_path)
+    booster = charger_modele(tmp_path)
+    assert not hasattr(booster, "predict_proba")
+
+    X = pd.DataFrame(
+        np.random.default_rng(0).normal(size=(50, booster.num_feature())) * 1000,
+        columns=booster.feature_name()
+    )
+    np.testing.assert_array_equal(predire_probas(booster, X), predire_probas(model, X))
+
+
+def test_explicateur_charge_a_la_demande():
+    modele_servi = ModeleServi()
+    assert not modele_servi.pret
+    modele_servi.model
+    assert modele_servi.pret and not modele_servi.metriques()["explicateur_charge"]
+    modele_servi.explainer
+    assert set(modele_servi.metriques()["durees_chargement_s"]) == {"modele", "explicateur"}
+
+
+def test_explicateur_natif_identique_a_tree_explainer():
+    booster = charger_modele()
+    _, X = construire_matrice(
+        "tests/sample_data/application_test_sample.csv",
+        "tests/sample_data/bureau_sample.csv",
+        "tests/sample_data/previous_application_sample.csv"
+    )
+    assert ecart_explicateurs(booster, X) < 1e-9
+
+    natif = creer_explicateur(booster)
+    tous = natif.shap_values(X)
+    np.testing.assert_array_equal(natif.shap_values(X, lignes=[3]), tous[[3]])
+    # Valeur de base + contributions = log-odds de la probabilité
+    probas = predire_probas(booster, X)
+    np.testing.assert_allclose(natif.expected_value + tous.sum(axis=1), np.log(probas / (1 - probas)), rtol=1e-9)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from src.modele import charger_colonnes
+from src.pipeline import pretraiter, construire_features, memoire_mo, SchemaFeatures
+from src.preprocesseur import PreprocesseurCredit
+
+
+def charger_echantillons():
+    return (
+        pd.read_csv("tests/sample_data/application_test_sample.csv"),
+        pd.read_csv("tests/sample_data/bureau_sample.csv"),
+        pd.read_csv("tests/sample_data/previous_application_sample.csv")
+    )
+
+
+def test_mode_categoriel_features_identiques():
+    tables = charger_echantillons()
+    preprocesseur = PreprocesseurCredit().fit(*tables)
+
+    for prep in [None, preprocesseur]:
+        attendu = construire_features(*pretraiter(*tables, prep))
+        tables_categorielles = pretraiter(*tables, prep, categoriel=True)
+        obtenu = construire_features(*tables_categorielles)
+
+        assert set(obtenu.columns) == set(attendu.columns)
+        pd.testing.assert_frame_equal(obtenu[attendu.columns], attendu)
+        assert memoire_mo(*tables_categorielles) < memoire_mo(*pretraiter(*tables, prep))
+
+
+def test_mode_categoriel_ne_modifie_pas_les_entrees():
+    tables = charger_echantillons()
+    copies = [df.copy() for df in tables]
+
+    pretraiter(*tables, categoriel=True)
+    for df, copie in zip(tables, copies):
+        pd.testing.assert_frame_equal(df, copie)
+
+
+def test_schema_features_identique_a_reindex_astype():
+    colonnes_utiles, colonnes_types = charger_colonnes()
+    df = construire_features(*pretraiter(*charger_echantillons(), categoriel=True))
+    df["COLONNE_INCONNUE"] = 1.0
+
+    attendu = df.drop(columns=["SK_ID_CURR"]).reindex(columns=colonnes_utiles, fill_value=0)
+    for col, dtype in colonnes_types.items():
+        attendu[col] = attendu[col].astype(dtype)
+
+    schema = SchemaFeatures(colonnes_utiles, colonnes_types)
+    ids_clients, X = schema.aligner(df)
+
+    pd.testing.assert_series_equal(ids_clients, df["SK_ID_CURR"])
+    assert list(X.columns) == list(colonnes_utiles) and X.index.equals(df.index)
+    np.testing.assert_array_equal(X.to_numpy(), attendu.to_numpy(dtype=np.float64))
+
+    metriques = schema.metriques(top=None)
+    assert metriques["alignements"] == 1 and metriques["lignes"] == len(df)
+    assert metriques["colonnes_inconnues"]["COLONNE_INCONNUE"] == 1
+    absentes = set(colonnes_utiles) - set(df.columns)
+    assert set(metriques["variables_absentes"]) | set(metriques["modalites_absentes"]) == absentes
+    assert all(pd.api.types.is_bool_dtype(colonnes_types[col]) for col in metriques["modalites_absentes"])
+
+
+def test_schema_features_matrice_creuse():
+    colonnes_utiles, colonnes_types = charger_colonnes()
+    df = construire_features(*pretraiter(*charger_echantillons(), categoriel=True))
+    df.loc[df.index[0], "AMT_CREDIT"] = np.nan
+
+    dense_ids, dense = SchemaFeatures(colonnes_utiles, colonnes_types).aligner(df)
+    schema = SchemaFeatures(colonnes_utiles, colonnes_types)
+    ids_clients, X = schema.aligner(df, creuse=True)
+
+    pd.testing.assert_series_equal(ids_clients, dense_ids)
+    assert X.format == "csr" and X.shape == dense.shape and X.has_sorted_indices
+    np.testing.assert_array_equal(X.toarray(), dense.to_numpy())
+    assert X.nnz == np.count_nonzero(dense.to_numpy())
+    assert schema.metriques()["lignes"] == len(df)
+
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.pool_calcul import PoolCalcul, PoolSature
+
+
+def test_file_bornee_et_rejet():
+    async def scenario():
+        pool = PoolCalcul(travailleurs=1, file_max=1)
+        libere = threading.Event()
+        premier = asyncio.ensure_future(pool.executer(libere.wait, 5))
+        second = asyncio.ensure_future(pool.executer(lambda: "ok"))
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(PoolSature):
+            await pool.executer(lambda: None)
+        metriques = pool.metriques()
+        assert (metriques["en_cours"], metriques["en_attente"], metriques["rejets"]) == (1, 1, 1)
+
+        libere.set()
+        assert await premier is True and await second == "ok"
+        return pool.metriques()
+
+    metriques = asyncio.run(scenario())
+    assert (metriques["terminees"], metriques["en_cours"], metriques["en_attente"]) == (2, 0, 0)
+    assert metriques["pic_admis"] == 2
+
+
+def test_boucle_libre_pendant_le_calcul():
+    async def scenario():
+        pool = PoolCalcul(travailleurs=2, file_max=0)
+        calcul = asyncio.ensure_future(pool.executer(time.sleep, 0.3))
+        debut = time.perf_counter()
+        await asyncio.sleep(0.01)
+        reactivite = time.perf_counter() - debut
+        await calcul
+        return reactivite
+
+    assert asyncio.run(scenario()) < 0.1
+
+
+def test_erreur_liberee_et_comptee():
+    async def scenario():
+        pool = PoolCalcul(travailleurs=1, file_max=0)
+        with pytest.raises(ZeroDivisionError):
+            await pool.executer(lambda: 1 / 0)
+        assert await pool.executer(lambda: 2) == 2
+        return pool.metriques()
+
+    metriques = asyncio.run(scenario())
+    assert (metriques["erreurs"], metriques["terminees"]) == (1, 1)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from src.modele import charger_colonnes
+from src.pipeline import pretraiter, construire_features, aligner_colonnes
+from src.preprocesseur import PreprocesseurCredit, charger_preprocesseur, NOM_FICHIER_PREPROCESSEUR
+
+
+def charger_echantillons():
+    return (
+        pd.read_csv("tests/sample_data/application_test_sample.csv"),
+        pd.read_csv("tests/sample_data/bureau_sample.csv"),
+        pd.read_csv("tests/sample_data/previous_application_sample.csv")
+    )
+
+
+def test_transform_identique_au_calcul_par_lot():
+    df_app, df_bureau, df_prev = charger_echantillons()
+    preprocesseur = PreprocesseurCredit().fit(df_app, df_bureau, df_prev)
+
+    attendus = pretraiter(df_app, df_bureau, df_prev)
+    obtenus = preprocesseur.transform(df_app, df_bureau, df_prev)
+    for attendu, obtenu in zip(attendus, obtenus):
+        pd.testing.assert_frame_equal(obtenu, attendu)
+
+
+def test_un_seul_client_utilise_les_parametres_appris():
+    df_app, df_bureau, df_prev = charger_echantillons()
+    preprocesseur = PreprocesseurCredit().fit(df_app, df_bureau, df_prev)
+
+    ligne = df_app.iloc[[0]].copy()
+    ligne["EXT_SOURCE_3"] = None
+    app_client, _, _ = preprocesseur.transform(ligne, df_bureau, df_prev)
+
+    valeur_apprise = preprocesseur.parametres["application"]["imputations"]["EXT_SOURCE_3"]
+    assert app_client["EXT_SOURCE_3"].iloc[0] == pd.Series([valeur_apprise], dtype="float32").iloc[0]
+    # Sur une seule ligne, toutes les colonnes numériques seraient "binaires" si on les recalculait
+    assert pd.api.types.is_numeric_dtype(app_client["AMT_CREDIT"])
+
+
+def test_sauvegarde_et_chargement(tmp_path):
+    df_app, df_bureau, df_prev = charger_echantillons()
+    PreprocesseurCredit().fit(df_app, df_bureau, df_prev).sauvegarder(tmp_path / NOM_FICHIER_PREPROCESSEUR)
+
+    preprocesseur = charger_preprocesseur(tmp_path)
+    assert set(preprocesseur.parametres) == {"application", "bureau", "previous"}
+    assert set(preprocesseur.modalites) == {"application", "bureau", "previous"}
+    assert charger_preprocesseur(tmp_path / "absent") is None
+
+
+def test_un_seul_client_encode_avec_le_vocabulaire_appris():
+    df_app, df_bureau, df_prev = charger_echantillons()
+    preprocesseur = PreprocesseurCredit().fit(df_app, df_bureau, df_prev)
+    colonnes_utiles, colonnes_types = charger_colonnes()
+
+    def matrice(app, bureau, prev, modalites):
+        tables = pretraiter(app, bureau, prev, preprocesseur, categoriel=True)
+        df = construire_features(*tables, drop_first=True, modalites=modalites)
+        return aligner_colonnes(df, colonnes_utiles, colonnes_types)[1].to_numpy()
+
+    # Sur le lot d'entraînement, drop_first retire la même modalité avec ou sans vocabulaire
+    attendu = matrice(df_app, df_bureau, df_prev, None)
+    np.testing.assert_array_equal(matrice(df_app, df_bureau, df_prev, preprocesseur.modalites), attendu)
+
+    sk_id_curr = df_app["SK_ID_CURR"].iloc[0]
+    client = [df[df["SK_ID_CURR"] == sk_id_curr] for df in (df_app, df_bureau, df_prev)]
+    np.testing.assert_array_equal(matrice(*client, preprocesseur.modalites), attendu[:1])
+    # Sans vocabulaire, drop_first retire la seule modalité présente dans le lot d'un client
+    assert (matrice(*client, None) != attendu[:1]).any()
+
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from src.preprocessing import (
+    regrouper_valeurs,
+    regrouper_devise,
+    regrouper_organisation,
+    nettoyer_colonnes_categorielles_previous,
+    detecter_encodage,
+    load_all_data,
+    REGROUPEMENTS_BUREAU
+)
+
+
+def test_regroupement_identique_a_apply_et_replace():
+    organisations = pd.Series(['Business Entity Type 3', 'School', np.nan, 'XNA', 'Police', 'School'])
+    pd.testing.assert_series_equal(
+        regrouper_valeurs(organisations, regrouper_organisation),
+        organisations.apply(regrouper_organisation)
+    )
+
+    devises = pd.Series(['currency 1', 'currency 3', np.nan])
+    assert regrouper_valeurs(devises, regrouper_devise).tolist() == ['currency 1', 'Other', 'Other']
+
+    types = pd.Series(['Microloan', 'Consumer credit', np.nan], name='CREDIT_TYPE')
+    pd.testing.assert_series_equal(
+        regrouper_valeurs(types, REGROUPEMENTS_BUREAU['CREDIT_TYPE']),
+        types.replace(REGROUPEMENTS_BUREAU['CREDIT_TYPE'])
+    )
+
+
+def test_regroupement_colonne_category():
+    serie = pd.Series(['Microloan', 'Mortgage', np.nan, 'Car loan'], dtype='category')
+    resultat = regrouper_valeurs(serie, REGROUPEMENTS_BUREAU['CREDIT_TYPE'])
+
+    assert isinstance(resultat.dtype, pd.CategoricalDtype)
+    assert resultat.astype(object).tolist()[:2] == ['Consumer', 'Secured property']
+    assert pd.isna(resultat.iloc[2])
+
+
+def test_previous_category_identique_a_object():
+    df = pd.DataFrame({
+        'NAME_CONTRACT_TYPE': ['XNA', 'Cash loans', 'XNA'],
+        'NAME_CASH_LOAN_PURPOSE': ['XAP', 'Repairs', 'Journey'],
+        'NAME_GOODS_CATEGORY': ['Mobile', 'XNA', 'Mobile'],
+        'CHANNEL_TYPE': ['Stone', 'Stone', 'Country-wide'],
+        'PRODUCT_COMBINATION': ['Cash X-Sell: low', 'POS mobile', np.nan]
+    })
+    modalites = {'NAME_CASH_LOAN_PURPOSE': ['Unknown'], 'NAME_GOODS_CATEGORY': ['Mobile'], 'CHANNEL_TYPE': ['Stone']}
+
+    attendu = nettoyer_colonnes_categorielles_previous(df, modalites)
+    obtenu = nettoyer_colonnes_categorielles_previous(df.astype('category'), modalites)
+    pd.testing.assert_frame_equal(obtenu.astype(object), attendu)
+    assert attendu['NAME_CASH_LOAN_PURPOSE'].tolist() == ['Unknown', 'Other', 'Other']
+    assert attendu['PRODUCT_COMBINATION'].tolist()[:2] == ['Cash', 'POS']
+
+
+def test_load_all_data_prefere_parquet_et_projette_les_colonnes(tmp_path):
+    pd.DataFrame({'SK_ID_CURR': [1, 2], 'NOM': ['é', None], 'X': [0.5, 1.5]}).to_csv(
+        tmp_path / "a.csv", index=False, encoding='iso-8859-1'
+    )
+    bureau = pd.DataFrame({'SK_ID_CURR': [1, 1, 2], 'CREDIT_ACTIVE': ['Active', None, 'Closed']})
+    bureau.to_csv(tmp_path / "bureau.csv", index=False)
+    bureau.to_parquet(tmp_path / "bureau.parquet", index=False)
+
+    data = load_all_data(str(tmp_path), colonnes={'a': ['SK_ID_CURR', 'NOM']})
+
+    assert detecter_encodage(str(tmp_path / "a.csv")) == 'iso-8859-1'
+    assert data['a'].columns.tolist() == ['SK_ID_CURR', 'NOM']
+    assert data['a']['NOM'].iloc[0] == 'é'
+    pd.testing.assert_frame_equal(data['bureau'], pd.read_csv(tmp_path / "bureau.csv"))
+    assert data['bureau']['CREDIT_ACTIVE'].iloc[1] is np.nan
@@ -0,0 +1,55 @@
+import threading
+
+import numpy as np
+import pytest
+
+from src.regroupement import Regroupeur
+
+
+def somme_lignes(appels):
+    def predire(X):
+        appels.append(len(X))
+        return X.sum(axis=1)
+    return predire
+
+
+def test_demandes_simultanees_scorees_en_un_appel():
+    appels = []
+    regroupeur = Regroupeur(somme_lignes(appels), fenetre_s=0.2, taille_max=100)
+    depart = threading.Barrier(5)
+
+    def soumettre(i):
+        depart.wait()
+        return regroupeur.soumettre(np.full((i + 1, 3), i)).result(timeout=5)
+
+    resultats = [None] * 5
+    threads = [threading.Thread(target=lambda i=i: resultats.__setitem__(i, soumettre(i))) for i in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert appels == [15]
+    for i, probas in enumerate(resultats):
+        np.testing.assert_array_equal(probas, np.full(i + 1, 3 * i))
+    metriques = regroupeur.metriques()
+    assert (metriques["lots"], metriques["demandes"], metriques["lignes"]) == (1, 5, 15)
+    assert metriques["latence_ajoutee_max_s"] < 1
+
+
+def test_taille_max_limite_le_lot():
+    appels = []
+    regroupeur = Regroupeur(somme_lignes(appels), fenetre_s=0.2, taille_max=2)
+    futures = [regroupeur.soumettre(np.ones((1, 2))) for _ in range(3)]
+    assert [f.result(timeout=5)[0] for f in futures] == [2, 2, 2]
+    assert appels == [2, 1]
+
+
+def test_erreur_transmise_a_chaque_demande():
+    def predire(X):
+        raise ValueError("modèle indisponible")
+
+    regroupeur = Regroupeur(predire, fenetre_s=0)
+    with pytest.raises(ValueError, match="indisponible"):
+        regroupeur.soumettre(np.ones((1, 2))).result(timeout=5)
+    assert regroupeur.metriques()["lots"] == 0
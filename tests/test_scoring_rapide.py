@@ -0,0 +1,94 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.pipeline import pretraiter, construire_features, aligner_colonnes
+from src.preprocesseur import PreprocesseurCredit
+from src.scoring_rapide import PlanScoring, extraire_enregistrements
+
+FICHIERS = [
+    "tests/sample_data/application_test_sample.csv",
+    "tests/sample_data/bureau_sample.csv",
+    "tests/sample_data/previous_application_sample.csv"
+]
+
+
+@pytest.fixture(scope="module")
+def contexte():
+    colonnes_utiles = joblib.load("models/columns_used.pkl")
+    colonnes_types = joblib.load("models/columns_dtypes.pkl")
+    dfs = [pd.read_csv(chemin) for chemin in FICHIERS]
+    preprocesseur = PreprocesseurCredit().fit(*dfs)
+
+    df = construire_features(*pretraiter(*dfs, preprocesseur))
+    ids_clients, X = aligner_colonnes(df, colonnes_utiles, colonnes_types)
+    plan = PlanScoring(colonnes_utiles, colonnes_types, preprocesseur)
+    contenus = [open(chemin, "rb").read() for chemin in FICHIERS]
+    return plan, ids_clients, X, contenus, colonnes_types
+
+
+def test_vecteur_identique_au_pipeline(contexte):
+    plan, ids_clients, X, contenus, colonnes_types = contexte
+    # Les indicatrices application dépendent du lot (drop_first) : comparées à part
+    numeriques = [i for i, col in enumerate(X.columns) if colonnes_types[col] != 'bool']
+
+    for position, sk_id_curr in enumerate(ids_clients):
+        client = extraire_enregistrements(contenus[0], sk_id_curr)[0]
+        x = plan.vecteur(
+            client,
+            extraire_enregistrements(contenus[1], sk_id_curr),
+            extraire_enregistrements(contenus[2], sk_id_curr)
+        )
+        attendu = X.iloc[position].to_numpy(dtype=float)
+        np.testing.assert_array_equal(x[numeriques], attendu[numeriques])
+
+
+def test_indicatrices_application(contexte):
+    plan, ids_clients, _, contenus, _ = contexte
+    client = extraire_enregistrements(contenus[0], ids_clients.iloc[0])[0]
+    client.update({"CODE_GENDER": "M", "OCCUPATION_TYPE": "Drivers", "ORGANIZATION_TYPE": "Trade: type 7"})
+    x = plan.vecteur(client)
+
+    for col in ["CODE_GENDER_M", "OCCUPATION_TYPE_Labor", "ORGANIZATION_TYPE_Trade"]:
+        assert x[plan.index[col]] == 1.0
+    assert x[plan.index["OCCUPATION_TYPE_Service"]] == 0.0
+
+
+def test_client_exclu(contexte):
+    plan, ids_clients, _, contenus, _ = contexte
+    client = extraire_enregistrements(contenus[0], ids_clients.iloc[0])[0]
+    client["CODE_GENDER"] = "XNA"
+    with pytest.raises(ValueError):
+        plan.vecteur(client)
+
+
+def test_extraire_enregistrements_avec_bom(contexte):
+    _, ids_clients, _, contenus, _ = contexte
+    for contenu in contenus:
+        sk_id_curr = ids_clients.iloc[0]
+        attendus = extraire_enregistrements(contenu, sk_id_curr)
+        assert attendus
+        assert extraire_enregistrements(b"\xef\xbb\xbf" + contenu, sk_id_curr) == attendus
+
+
+
+def test_extraire_enregistrements_fichier_vide():
+    assert extraire_enregistrements(b"", 100001) == []
+    assert extraire_enregistrements(b"SK_ID_CURR,AMT_CREDIT\n", 100001) == []
+
+
+def test_extraire_enregistrements_lignes_courtes_et_guillemets():
+    contenu = (
+        b"NAME,SK_ID_CURR,AMT_CREDIT\n"
+        b"seul\n"
+        b"\n"
+        b'"sur deux\nlignes",100001.0,5000\n'
+        b"autre,100002,6000\n"
+    )
+    assert extraire_enregistrements(contenu, 100001) == [
+        {"NAME": "sur deux\nlignes", "SK_ID_CURR": "100001.0", "AMT_CREDIT": "5000"}
+    ]
+    assert extraire_enregistrements(contenu, 100002) == [
+        {"NAME": "autre", "SK_ID_CURR": "100002", "AMT_CREDIT": "6000"}
+    ]
@@ -0,0 +1,47 @@
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def port_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_workers_forkes_partagent_le_modele():
+    port = port_libre()
+    serveur = subprocess.Popen(
+        [sys.executable, "-m", "api.serveur", "--workers", "2", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(150):
+            try:
+                if httpx.get(url + "/ready", timeout=1).status_code == 200:
+                    break
+            except httpx.TransportError:
+                time.sleep(0.2)
+
+        pids = set()
+        for _ in range(40):
+            fichiers = {
+                nom: open(f"tests/sample_data/{nom}_sample.csv", "rb")
+                for nom in ["application_test", "bureau", "previous_application"]
+            }
+            reponse = httpx.post(url + "/score", files=fichiers, data={"sk_id_curr": 102545}, timeout=30)
+            assert reponse.status_code == 200
+            memoire = httpx.get(url + "/memory").json()
+            pids.add(memoire["pid"])
+            # Modèle chargé avant le fork : déjà prêt, et pages partagées avec le maître
+            assert httpx.get(url + "/ready").json()["durees_chargement_s"].keys() >= {"modele", "explicateur"}
+            assert memoire["partagee_mo"] > memoire["uss_mo"]
+        assert len(pids) == 2
+    finally:
+        serveur.terminate()
+        assert serveur.wait(timeout=30) == 0